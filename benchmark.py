@@ -0,0 +1,375 @@
+'''Time parking log processing steps on a sample log.
+
+Each benchmark takes an Excel parking log and prints the best of a few
+runs for each of the variants it compares (or, for the memory
+benchmark, the memory used), e.g.
+
+    python benchmark.py ingest test/sample_log_reaL20170202.xlsx
+'''
+
+from __future__ import print_function
+import argparse
+import gc
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import timeit
+
+import csv_parking_log
+import csv_reader
+from log_column_manager import ColumnManager
+import xlsx_reader
+
+
+FILENAME = os.path.split(__file__)[-1]
+
+DEFAULT_REPEAT = 3
+
+# The number of rows to scale a sample log up to, for benchmarks of
+# per-row costs.
+LARGE_LOG_ROWS = 100000
+
+# The number of worksheets to split a log across, for the sheets
+# benchmark.
+SHEET_COUNT = 4
+
+# The number of rows appended to a log since its checkpoint was saved,
+# for the checkpoint benchmark.
+APPENDED_ROWS = 300
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def _best_time(func, repeat, setup='pass'):
+    '''Return the shortest of repeat runs of func, in seconds.
+
+    setup, if given, is run before each run, and isn't timed.
+    '''
+    return min(timeit.repeat(func, setup=setup, number=1, repeat=repeat))
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def _parse(filepath):
+    '''Parse a log file with default LogParser settings.'''
+    csv_parking_log.LogParser(filepath).parse()
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def benchmark_ingest(xlsx_path, repeat=DEFAULT_REPEAT):
+    '''Compare reading and parsing a log as xlsx and as CSV.'''
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        # Keep the log's name, since a date in it bounds valid dates.
+        csv_path = os.path.join(tmp_dir, '%s.csv' % (
+            os.path.splitext(os.path.basename(xlsx_path))[0]
+            ))
+        csv_reader.write_csv_rows(
+            xlsx_reader.iter_sheet_rows(xlsx_path), csv_path
+            )
+
+        results = [
+            ('read rows', [
+                lambda: list(xlsx_reader.iter_sheet_rows(xlsx_path)),
+                lambda: list(csv_reader.iter_csv_rows(csv_path)),
+                ]),
+            ('LogParser.parse', [
+                lambda: _parse(xlsx_path),
+                lambda: _parse(csv_path),
+                ]),
+            ]
+
+        print('{:<20}{:>10}{:>10}{:>10}'.format('', 'xlsx', 'csv', 'ratio'))
+        for label, (xlsx_func, csv_func) in results:
+            xlsx_time = _best_time(xlsx_func, repeat)
+            csv_time = _best_time(csv_func, repeat)
+            print('{:<20}{:>9.3f}s{:>9.3f}s{:>9.1f}x'.format(
+                label, xlsx_time, csv_time, xlsx_time / csv_time
+                ))
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def _large_log_rows(xlsx_path):
+    '''Repeat a log's data rows until there are LARGE_LOG_ROWS rows.'''
+    rows = list(xlsx_reader.iter_sheet_rows(xlsx_path))
+    header_row, data_rows = rows[0], rows[1:]
+    copies = LARGE_LOG_ROWS // len(data_rows) + 1
+    return [header_row] + (data_rows * copies)[:LARGE_LOG_ROWS - 1]
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def _ingest(xlsx_path, rows, columnar):
+    '''Create log records from rows, as LogParser.parse does.'''
+    # pylint: disable=protected-access
+    log_parser = csv_parking_log.LogParser(xlsx_path, columnar=columnar)
+    log_parser.column_manager = ColumnManager()
+    log_parser.column_manager.determine_column_map(rows[0])
+    if columnar:
+        log_parser._parse_columns(iter(rows))
+    else:
+        log_parser._parse_rows(iter(rows))
+    return log_parser
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def benchmark_columnar(xlsx_path, repeat=DEFAULT_REPEAT):
+    '''Compare row and columnar ingest of a log scaled up to 100k rows.
+
+    Only the step from rows to log records is timed, not reading the
+    file or matching plates.
+    '''
+
+    rows = _large_log_rows(xlsx_path)
+
+    row_time = _best_time(lambda: _ingest(xlsx_path, rows, False), repeat)
+    column_time = _best_time(lambda: _ingest(xlsx_path, rows, True), repeat)
+
+    print('{:<20}{:>10}{:>10}{:>10}'.format(
+        '', 'rows', 'columnar', 'ratio'
+        ))
+    print('{:<20}{:>9.3f}s{:>9.3f}s{:>9.1f}x'.format(
+        '%s rows' % len(rows), row_time, column_time, row_time / column_time
+        ))
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def _resident_set_size():
+    '''Return the current resident set size of this process, in bytes.
+
+    Where /proc isn't available, this is the peak size instead.
+    '''
+    try:
+        with open('/proc/self/statm') as fptr:
+            return int(fptr.read().split()[1]) * resource.getpagesize()
+    except IOError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def _object_size(obj, seen):
+    '''Return the size of obj and the objects it holds, not yet seen.
+
+    Only LogRecord-like objects are followed: their __dict__ or slot
+    values, one level down from any object they share.
+    '''
+
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    attrs = getattr(obj, '__dict__', None)
+    if attrs is not None:
+        size += sys.getsizeof(attrs)
+        values = attrs.values()
+    else:
+        values = [
+            getattr(obj, name)
+            for cls in type(obj).__mro__
+            for name in getattr(cls, '__slots__', ())
+            if hasattr(obj, name)
+            ]
+
+    for value in values:
+        if isinstance(value, (basestring, int, long, float)):
+            if id(value) not in seen:
+                seen.add(id(value))
+                size += sys.getsizeof(value)
+        elif value is not None and hasattr(value, '__slots__'):
+            size += _object_size(value, seen)
+
+    return size
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def benchmark_memory(xlsx_path, repeat=DEFAULT_REPEAT):
+    '''Measure the memory used per log record, for a 100k row log.
+
+    Two measures are given: the growth in resident set size while log
+    records are created (which includes LogParser's indexes of them),
+    and the size of the records themselves and the values they hold,
+    counting values shared between records once.
+    '''
+    # pylint: disable=unused-argument
+
+    rows = _large_log_rows(xlsx_path)
+
+    gc.collect()
+    rss_before = _resident_set_size()
+    log_parser = _ingest(xlsx_path, rows, False)
+    gc.collect()
+    rss_after = _resident_set_size()
+
+    log_records = log_parser.log_records
+    seen = set()
+    record_bytes = sum(_object_size(record, seen) for record in log_records)
+
+    print('{:<20}{:>10}'.format('records', len(log_records)))
+    print('{:<20}{:>10.0f}'.format(
+        'RSS bytes/record', float(rss_after - rss_before) / len(log_records)
+        ))
+    print('{:<20}{:>10.0f}'.format(
+        'bytes/record', float(record_bytes) / len(log_records)
+        ))
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def benchmark_sheets(xlsx_path, repeat=DEFAULT_REPEAT):
+    '''Compare parsing a log split across worksheets with 1 and more jobs.
+
+    The log's data rows are split into SHEET_COUNT sheets of about the
+    same size, each with the header row. Parsing with a job per sheet
+    reads the sheets in parallel; records are still created, and
+    plates matched, in this process.
+    '''
+
+    rows = list(xlsx_reader.iter_sheet_rows(xlsx_path))
+    header_row, data_rows = rows[0], rows[1:]
+    sheet_size = len(data_rows) // SHEET_COUNT + 1
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        # Keep the log's name, since a date in it bounds valid dates.
+        sheets_path = os.path.join(tmp_dir, os.path.basename(xlsx_path))
+        xlsx_reader.write_workbook(sheets_path, [
+            ('Sheet%d' % (sheet_num + 1), [header_row] + data_rows[
+                sheet_num * sheet_size:(sheet_num + 1) * sheet_size
+                ])
+            for sheet_num in range(SHEET_COUNT)
+            ])
+
+        print('{:<20}{:>10}'.format('', 'parse'))
+        print('{:<20}{:>9.3f}s'.format(
+            'one sheet', _best_time(lambda: _parse(xlsx_path), repeat)
+            ))
+        for jobs in [1, SHEET_COUNT]:
+            print('{:<20}{:>9.3f}s'.format(
+                '%d sheets, jobs=%d' % (SHEET_COUNT, jobs),
+                _best_time(
+                    lambda: csv_parking_log.LogParser(
+                        sheets_path, jobs=jobs
+                        ).parse(),
+                    repeat
+                    )
+                ))
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def benchmark_checkpoint(xlsx_path, repeat=DEFAULT_REPEAT):
+    '''Compare parsing a log in full with parsing it from a checkpoint.
+
+    The checkpoint is saved from the log without its last APPENDED_ROWS
+    rows, as for last week's log, and each checkpointed run starts from
+    it. Both the xlsx log and the log as CSV are timed.
+    '''
+
+    rows = list(xlsx_reader.iter_sheet_rows(xlsx_path))
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        checkpoint_path = os.path.join(tmp_dir, 'log.checkpoint')
+        saved_path = checkpoint_path + '.saved'
+
+        print('{:<20}{:>10}{:>12}{:>10}'.format(
+            '', 'full', 'checkpoint', 'ratio'
+            ))
+        for extension, write_rows in [
+                ('xlsx', lambda path, rows: xlsx_reader.write_workbook(
+                    path, [('Sheet1', rows)]
+                    )),
+                ('csv', lambda path, rows: csv_reader.write_csv_rows(
+                    rows, path
+                    )),
+                ]:  # pylint: disable=bad-continuation
+            # Keep the log's name, since a date in it bounds valid dates.
+            log_path = os.path.join(tmp_dir, '%s.%s' % (
+                os.path.splitext(os.path.basename(xlsx_path))[0], extension
+                ))
+
+            write_rows(log_path, rows[:-APPENDED_ROWS])
+            csv_parking_log.LogParser(
+                log_path, checkpoint_path=checkpoint_path
+                ).parse()
+            shutil.move(checkpoint_path, saved_path)
+            write_rows(log_path, rows)
+
+            full_time = _best_time(lambda: _parse(log_path), repeat)
+            checkpoint_time = _best_time(
+                lambda: csv_parking_log.LogParser(
+                    log_path, checkpoint_path=checkpoint_path
+                    ).parse(),
+                repeat,
+                setup=lambda: shutil.copy(saved_path, checkpoint_path)
+                )
+            print('{:<20}{:>9.3f}s{:>11.3f}s{:>9.1f}x'.format(
+                '%s, %s new rows' % (extension, APPENDED_ROWS),
+                full_time, checkpoint_time, full_time / checkpoint_time
+                ))
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+BENCHMARKS = {
+    'checkpoint': benchmark_checkpoint,
+    'columnar': benchmark_columnar,
+    'ingest': benchmark_ingest,
+    'memory': benchmark_memory,
+    'sheets': benchmark_sheets,
+    }
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def argument_parser():
+    '''Define command line arguments.'''
+
+    parser = argparse.ArgumentParser(
+        description='''
+            Time parking log processing steps on a sample log.
+        '''
+        )
+
+    parser.add_argument(
+        '-r', '--repeat',
+        type=int,
+        default=DEFAULT_REPEAT,
+        help='''
+            number of runs to take the best time from (default: %s).
+            ''' % DEFAULT_REPEAT
+        )
+
+    parser.add_argument(
+        'benchmark',
+        metavar='BENCHMARK',
+        choices=sorted(BENCHMARKS),
+        help='''
+            benchmark to run, one of %s.
+            ''' % ', '.join(sorted(BENCHMARKS))
+        )
+
+    parser.add_argument(
+        'input_file',
+        metavar='INPUT_FILE',
+        help='''
+            Excel parking log file to benchmark with.
+            '''
+        )
+
+    return parser
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def main():
+    '''Main program entry point.'''
+
+    args = argument_parser().parse_args()
+    BENCHMARKS[args.benchmark](args.input_file, repeat=args.repeat)
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,11 @@ import uuid
 import boto3
 
 import csv_parking_log
+import log_corpus
+import matchiness
+import parse_cache
+import parse_checkpoint
+import window_totals
 
 
 FILENAME = os.path.split(__file__)[-1]
@@ -31,6 +36,11 @@ DEFAULT_OUTGOING_S3_BUCKET = 'creekside-parking'
 
 DEFAULT_OUTGONG_ARCHIVE_PREFIX = 'archive'
 
+# Where lambda keeps parsed logs' dashboard data, so an s3 event that
+# is delivered again, or a log uploaded again, isn't parsed again while
+# the container's /tmp lasts.
+DEFAULT_LAMBDA_CACHE_DIR = os.path.join(os.sep, 'tmp', 'parse_cache')
+
 
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
 def argument_parser():
@@ -42,6 +52,27 @@ def argument_parser():
         '''
         )
 
+    parser.add_argument(
+        '-C', '--cache',
+        metavar='DIR',
+        help='''
+            directory of cached dashboard data, keyed by the input files'
+            contents and the parsing options; a log already processed
+            with the same options isn't parsed again (cannot be used
+            with --plate-store).
+            '''
+        )
+
+    parser.add_argument(
+        '-c', '--columnar',
+        default=False,
+        action='store_true',
+        help='''
+            read the log a column at a time rather than a row at a time,
+            which is faster for large logs.
+            '''
+        )
+
     parser.add_argument(
         '-d', '--days',
         type=int,
@@ -58,6 +89,38 @@ def argument_parser():
         help='''latest date for which to process parking records. '''
         )
 
+    parser.add_argument(
+        '-i', '--incremental',
+        default=False,
+        action='store_true',
+        help='''
+            canonicalize plates as records are read, instead of after
+            reading the whole log (cannot be used with --plate-store).
+            '''
+        )
+
+    parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        default=1,
+        help='''
+            number of worker processes to use for plate matching, and
+            for reading a log split across worksheets or several log
+            files (default: 1).
+            '''
+        )
+
+    parser.add_argument(
+        '-k', '--checkpoint',
+        default=False,
+        action='store_true',
+        help='''
+            keep a parse checkpoint next to the output file, so that the
+            next run on the same, appended to, log only parses the new
+            rows (requires --output_file).
+            '''
+        )
+
     parser.add_argument(
         '-l', '--log-path',
         default=DEFAULT_LOG_PATH,
@@ -73,6 +136,17 @@ def argument_parser():
         help='''write a log file (default: False).'''
         )
 
+    parser.add_argument(
+        '-n', '--normalize',
+        metavar='RULE',
+        action='append',
+        choices=matchiness.NORMALIZATION_RULES,
+        help='''
+            plate normalization rule to apply before matching plates, one
+            of %s; may be repeated.
+            ''' % ', '.join(matchiness.NORMALIZATION_RULES)
+        )
+
     parser.add_argument(
         '-o', '--output_file',
         # nargs='*',
@@ -81,6 +155,15 @@ def argument_parser():
             '''
         )
 
+    parser.add_argument(
+        '-p', '--plate-store',
+        metavar='PATH',
+        help='''
+            plate canonicalization store file, used to keep canonical
+            plates consistent between runs (created if missing).
+            '''
+        )
+
     parser.add_argument(
         '-s', '--start-date',
         metavar='YYYY-MM-DD',
@@ -95,12 +178,27 @@ def argument_parser():
         help='''show more output.'''
         )
 
+    parser.add_argument(
+        '-w', '--window',
+        metavar='KEY:DAYS[:MIN_FIVE_DAY_TOTAL]',
+        action='append',
+        type=window_totals.parse_window,
+        help='''
+            guest parking window total for the dashboard: the number of
+            record sets in the last DAYS days with a five day total of at
+            least MIN_FIVE_DAY_TOTAL (default: 0), shown as KEY; may be
+            repeated, and replaces the default windows.
+            '''
+        )
+
     parser.add_argument(
         'input_file',
         metavar="INPUT_FILE",
-        # nargs='*',
+        nargs='+',
         help='''
-            Excel parking log file to process.
+            Excel, CSV or TSV parking log file to process; several
+            files, oldest first, are merged into one log, dropping
+            records that repeat (plate, date, record type, location).
             '''
         )
 
@@ -163,10 +261,41 @@ def log_startup_configuration(args):
 def process_workbook(args):
     '''Carry out workbook processing.'''
 
-    log_parser = csv_parking_log.LogParser(args.input_file, days=args.days)
+    parser_options = dict(
+        days=args.days,
+        plate_store_path=args.plate_store,
+        jobs=args.jobs,
+        incremental=args.incremental,
+        normalization=args.normalize,
+        columnar=args.columnar,
+        windows=args.window
+        )
+
+    cache = cache_key = None
+    if args.cache:
+        cache = parse_cache.ParseCache(args.cache)
+        cache_key = parse_cache.cache_key(args.input_file, parser_options)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            dashboard_data, _ = cached
+            return dashboard_data
+
+    if len(args.input_file) > 1:
+        log_parser = log_corpus.LogCorpus(args.input_file, **parser_options)
+    else:
+        if args.checkpoint:
+            parser_options['checkpoint_path'] = (
+                args.output_file + parse_checkpoint.CHECKPOINT_SUFFIX
+                )
+        log_parser = csv_parking_log.LogParser(
+            args.input_file[0], **parser_options
+            )
     log_parser.parse()
     dashboard_data = log_parser.dashboard_data()
 
+    if cache is not None:
+        cache.put(cache_key, dashboard_data)
+
     return dashboard_data
 
 
@@ -209,6 +338,7 @@ def s3_event_handler(event, _):  # unused context parameter.
         args = parser.parse_args(
             [
                 '-d', '91',
+                '-C', DEFAULT_LAMBDA_CACHE_DIR,
                 '-o', dashboard_data_upload_path,
                 download_path
                 ]
@@ -299,6 +429,14 @@ def main():
 
     parser = argument_parser()
     args = parser.parse_args()
+    if args.incremental and args.plate_store:
+        parser.error('--incremental cannot be used with --plate-store')
+    if args.checkpoint and not args.output_file:
+        parser.error('--checkpoint requires --output_file')
+    if args.checkpoint and len(args.input_file) > 1:
+        parser.error('--checkpoint takes a single input file')
+    if args.cache and args.plate_store:
+        parser.error('--cache cannot be used with --plate-store')
 
     initialize_logging(args)
     log_startup_configuration(args)
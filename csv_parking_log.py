@@ -1,5 +1,6 @@
 '''CLasses for working with Creekside Village parking logs.'''
 
+import collections
 from datetime import datetime
 from datetime import timedelta
 # import json
@@ -12,21 +13,30 @@ except ImportError:
         '''Placeholder handler.'''
         def emit(self, record):
             pass
+import functools
+import itertools
+import math
+import multiprocessing
+import operator
 import os
 import re
 
-import xlrd
-
 from log_column_manager import ColumnManager
+import csv_reader
+import date_codec
 import matchiness
+import parse_checkpoint
+from record_table import RecordTable
+import window_totals
+import xlsx_reader
 
 logging.getLogger(__name__).addHandler(NullHandler())
 
 # Date comparison is easier when we use "days since ref date" to compare.
-REF_DATETIME = datetime(2000, 01, 01)
+REF_DATETIME = date_codec.REF_DATETIME
 
 # This is the Excel vslue for offset to January 1, 2000.
-EXCEL_OFFSET_TO_REF_DATETIME = 36526
+EXCEL_OFFSET_TO_REF_DATETIME = date_codec.EXCEL_OFFSET_TO_REF_DATETIME
 
 # The name of the key for the days-since-REF_DATETIME, so we encode the
 # REF_DATETIME in the key.
@@ -35,29 +45,100 @@ REF_DATETIME_KEY = 'days_since_{}'.format(REF_DATETIME.strftime('%Y%m%d'))
 DEFAULT_START_REFDT_OFFSET = 0
 DEFAULT_END_REFDT_OFFSET = 2 ** 16  # ~180 years in the future.
 
-STANDARD_DATE_FORMAT = '%Y-%m-%d'
-LOG_DATE_FORMAT = '%m.%d.%y'
+STANDARD_DATE_FORMAT = date_codec.STANDARD_DATE_FORMAT
+LOG_DATE_FORMAT = date_codec.LOG_DATE_FORMAT
 FILENAME_DATE_FORMAT = '%Y%m%d'
 
+# Text that float() accepts as a finite number, e.g. a numeric plate
+# or model year stored as text.
+NUMERIC_TEXT_PATTERN = re.compile(
+    r'\s*[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?\s*\Z', re.UNICODE
+    )
+
+# The most distinct strings _intern_text() shares before starting over.
+INTERNED_TEXT_LIMIT = 2 ** 16
+
+# Shared copies of record text, by text.
+_INTERNED_TEXT = {}
+
+# The number of rows at a time the columnar ingest mode turns into
+# columns, so the rows read aren't held alongside the columns.
+COLUMN_CHUNK_ROWS = 4096
+
+# The LogRecord values kept when records are saved or passed between
+# processes, in order; see record_values().
+RECORD_FIELDS = (
+    'plate', 'date', 'record_type', 'refdt_offset',
+    'make', 'model', 'color', 'location',
+    )
+
+# The number of days in the trailing window for five day totals.
+FIVE_DAY_WINDOW_DAYS = 5
+
 # The number of days per block for summarizing total log entries for
 # a plate.
 WINDOW_DAYS = 30
-WINDOWS = {
-    'log1-long': WINDOW_DAYS * 3,
-    'log1-medium': WINDOW_DAYS * 2,
-    'log1-short': WINDOW_DAYS * 1,
-    'log5-long': WINDOW_DAYS * 3,
-    'log5-medium': WINDOW_DAYS * 2,
-    'log5-short': WINDOW_DAYS * 1,
-    }
+
+# The least five day total for a record set to count in a log5 window.
+LOG5_MIN_FIVE_DAY_TOTAL = 3
+
+# The guest parking window totals for the dashboard, unless LogParser is
+# given others, in the order the dashboard has always shown them.
+DEFAULT_WINDOWS = [
+    window_totals.Window(
+        'log5-short', WINDOW_DAYS * 1, LOG5_MIN_FIVE_DAY_TOTAL
+        ),
+    window_totals.Window(
+        'log5-medium', WINDOW_DAYS * 2, LOG5_MIN_FIVE_DAY_TOTAL
+        ),
+    window_totals.Window('log1-long', WINDOW_DAYS * 3, 0),
+    window_totals.Window('log1-short', WINDOW_DAYS * 1, 0),
+    window_totals.Window('log1-medium', WINDOW_DAYS * 2, 0),
+    window_totals.Window(
+        'log5-long', WINDOW_DAYS * 3, LOG5_MIN_FIVE_DAY_TOTAL
+        ),
+    ]
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def _intern_text(value):
+    '''Return unicode(value), sharing one copy of each distinct text.
+
+    Makes, models, colors, dates and so on repeat across thousands of
+    records, so records share these rather than each keeping a copy.
+    (The intern() builtin doesn't take unicode.)
+    '''
+    text = unicode(value)
+    try:
+        return _INTERNED_TEXT[text]
+    except KeyError:
+        if len(_INTERNED_TEXT) >= INTERNED_TEXT_LIMIT:
+            _INTERNED_TEXT.clear()
+        _INTERNED_TEXT[text] = text
+        return text
 
 
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
 def _most_common_element(a_list):
-    '''Find the most common element of a list.'''
-    counts = [(x, a_list.count(x)) for x in set(a_list)]
-    max_count = max([c[1] for c in counts])
-    return [c[0] for c in counts if c[1] == max_count][0]
+    '''Find the most common element of a list.
+
+    Ties go to the element that sorts first; see
+    matchiness.most_common_plate().
+    '''
+    return matchiness.most_common_plate(
+        collections.Counter(a_list).iteritems()
+        )
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def _canonical_record_order(log_record):
+    '''Return the sort key of a record among its canonical plate's.
+
+    Records are sorted by date, and records of the same date by plate.
+    Records with the same plate stay in log order, however the plates'
+    classes were merged.
+    '''
+    return log_record.refdt_offset, log_record.plate
 
 
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
@@ -69,44 +150,47 @@ def _force_float_to_int(record_row, column_num):
     added after, say, a plate value).
     '''
     try:
-        record_row[column_num].value = (
-            int(float(record_row[column_num].value))
-            )
+        record_row[column_num] = int(float(record_row[column_num]))
     except (ValueError, OverflowError):
         pass
 
 
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
-def _log_date_to_datetime(log_date):
-    '''Convert a parking log date to a datetime object.
+def _coerce_float_to_int(value):
+    '''Return value as _force_float_to_int would leave it.
+
+    This goes by the value's type rather than by catching exceptions:
+    numbers become ints unless they're infinite or NaN, and text does
+    only if it is a finite number.
     '''
-    log_date_pattern = (
-        r'(?P<log_mon>\d{1,2})\.(?P<log_day>\d{1,2})\.(?P<log_year>\d{1,2})'
-        )
+    if isinstance(value, basestring):
+        if not NUMERIC_TEXT_PATTERN.match(value):
+            return value
+        value_as_float = float(value)
+        return value if math.isinf(value_as_float) else int(value_as_float)
 
-    # Handle both the m.dd.yy dot separated format and Excel date value.
-    if isinstance(log_date, float):
-        # It's Excel's offset from "January 0, 1900". Also, Excel incorrectly
-        # treats 1900 as a leap year. Argh.
+    if isinstance(value, float):
+        if math.isinf(value) or math.isnan(value):
+            return value
+        return int(value)
 
-        log_date_as_datetime = (
-            REF_DATETIME + timedelta(log_date - EXCEL_OFFSET_TO_REF_DATETIME)
-            )
-        # print('{}:\t{}'.format(log_date, log_date_as_datetime))
-        return log_date_as_datetime
+    if isinstance(value, (int, long)):
+        return int(value)
 
-    else:
-        matches = re.match(log_date_pattern, log_date)
-        if matches:
-            log_date = '{:0>2}.{:0>2}.{:0>2}'.format(
-                matches.group('log_mon'),
-                matches.group('log_day'),
-                matches.group('log_year')
-                )
-        else:
-            raise ValueError('No log date found in %s' % log_date)
+    return value
 
-        return datetime.strptime(log_date, LOG_DATE_FORMAT)
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def _coerce_column(column):
+    '''Apply _coerce_float_to_int to a column of values.
+
+    Columns repeat a lot of values, so each distinct value is only
+    coerced once.
+    '''
+    coerced = dict(
+        (value, _coerce_float_to_int(value)) for value in set(column)
+        )
+    return [coerced[value] for value in column]
 
 
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
@@ -123,14 +207,11 @@ def _to_yyyy_mm_dd(date_rep, date_format=None):
             date_rep.
 
     '''
-    # Convert any date_rep to a datetime.
-    converter = {
-        datetime: lambda x: x,
-        int: _refdt_offset_to_datetime,
-        str: lambda x: datetime.strptime(x, date_format)
-        }
-    as_datetime = converter[type(date_rep)](date_rep)
-    return as_datetime.strftime(STANDARD_DATE_FORMAT)
+    if isinstance(date_rep, (int, long)):
+        return date_codec.refdt_offset_to_yyyy_mm_dd(date_rep)
+    if not isinstance(date_rep, datetime):
+        date_rep = datetime.strptime(date_rep, date_format)
+    return date_rep.strftime(STANDARD_DATE_FORMAT)
 
 
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
@@ -151,7 +232,10 @@ def _datetime_to_refdt_offset(end_dt, refdate=REF_DATETIME):
 def _log_date_to_refdt_offset(log_date, refdate=REF_DATETIME):
     '''Return the number of days from refdate to the log date string log_date.
     '''
-    return _datetime_to_refdt_offset(_log_date_to_datetime(log_date), refdate)
+    return (
+        date_codec.log_date_to_refdt_offset(log_date) -
+        _datetime_to_refdt_offset(refdate)
+        )
 
 
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
@@ -188,32 +272,46 @@ def _get_latest_valid_refdt_offset(filename):
         return max(refdt_values)
 
 
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def _get_trailing_window_totals(
+        plate_record_sets, days, record_class='guest_parking'
+        ):  # pylint: disable=bad-continuation
+    '''Count a canonical plate's record sets of a class in trailing windows.
+
+    Arguments:
+
+        plate_record_sets (list):
+            The ``PlateRecordSet`` instances for a canonical plate,
+            sorted by refdt_offset.
+
+        days (int):
+            The number of days in each window, ending on (and
+            including) the date of a record set.
+
+        record_class (str, optional):
+            The record class to count.
+
+    Returns a list with the count for each record set.
+    '''
+    return window_totals.trailing_window_counts(
+        [s.refdt_offset for s in plate_record_sets],
+        [s.record_class[record_class] for s in plate_record_sets],
+        days
+        )
+
+
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
 def _get_five_day_totals(plate_record_sets):
     '''Find five day totals for a canonical plate's plate record sets.'''
     # The plate record sets are returned sorted by
     # refdt_offset.
-    index_a = 0
-    for index_b, plate_record_set in enumerate(plate_record_sets):
-        # Advance index_a until the selected record is within
-        # five days of index_b.
-        while (
-                plate_record_sets[index_b].refdt_offset - 5 >=
-                plate_record_sets[index_a].refdt_offset
-                ):  # pylint: disable=bad-continuation
-            index_a += 1
-        # We've now moved index_a up until the days between the
-        # records at index_a and index_b is no more than 5.
-        # plate_record_set.five_day_total = index_b - index_a + 1
-
-        if not plate_record_set.record_class['guest_parking']:
-            continue
-        # Add one because the record set at index_b isn't included in
-        # the range, but we know it's a guest parking record set.
-        plate_record_set.five_day_total = len([
-            r for r in plate_record_sets[index_a:index_b]
-            if r.record_class['guest_parking']
-            ]) + 1
+    totals = _get_trailing_window_totals(
+        plate_record_sets, FIVE_DAY_WINDOW_DAYS
+        )
+    for plate_record_set, total in zip(plate_record_sets, totals):
+        # Only guest parking record sets get a total.
+        if plate_record_set.record_class['guest_parking']:
+            plate_record_set.five_day_total = total
 
 
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
@@ -248,6 +346,32 @@ class CsvParkingLogStructureError(Exception):
         self.code = code
 
 
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+class VehicleAttributes(object):
+    '''The description of a vehicle in one log row.
+
+    A row can log several dates for a vehicle, and the LogRecord
+    instances created for them share one VehicleAttributes instance.
+
+    Arguments:
+
+        make, model, color, location:
+            The row's values for these; like LogRecord, each is kept
+            as unicode text, so a missing value is u'None'.
+
+    '''
+
+    __slots__ = ('make', 'model', 'color', 'location')
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def __init__(self, make=None, model=None, color=None, location=None):
+        '''Initialize one VehicleAttributes instance.'''
+        self.make = _intern_text(make)
+        self.model = _intern_text(model)
+        self.color = _intern_text(color)
+        self.location = _intern_text(location)
+
+
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
 class LogRecord(object):
     '''A representation of one log record entry for a vehicle.
@@ -256,32 +380,67 @@ class LogRecord(object):
     logged in the Creekside Village parking log. This includes the plate,
     make, model, date logged and the type of log (e.g. first, second,
     third guest parking, tow record, fire lane, etc.)
+
+    Records are slot based and hold interned text, since there can be
+    millions of them.
     '''
 
+    __slots__ = (
+        'plate', 'date', 'record_type', 'vehicle', 'refdt_offset',
+        'canonical_plate',
+        )
+
     # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
     # pylint: disable=too-many-arguments
     def __init__(
             self,
             plate, date, record_type,
-            make=None, model=None, color=None, location=None
+            make=None, model=None, color=None, location=None,
+            refdt_offset=None, vehicle=None
             ):  # pylint: disable=bad-continuation
-        '''Initialize one LogRecord instance.'''
-        self.plate = unicode(plate)
-        self.date = unicode(date)
-        self.record_type = unicode(record_type)
-        self.make = unicode(make)
-        self.model = unicode(model)
-        self.color = unicode(color)
-        self.location = unicode(location)
-        self.refdt_offset = _datetime_to_refdt_offset(
-            _log_date_to_datetime(self.date)
-            )
+        '''Initialize one LogRecord instance.
+
+        The refdt_offset for the date is calculated unless it's given,
+        e.g. when the dates of a whole column were converted at once.
+        If a VehicleAttributes instance is given as vehicle, it is used
+        (and shared) instead of make, model, color and location.
+        '''
+        self.plate = _intern_text(plate)
+        self.date = _intern_text(date)
+        self.record_type = _intern_text(record_type)
+        if vehicle is None:
+            vehicle = VehicleAttributes(make, model, color, location)
+        self.vehicle = vehicle
+        if refdt_offset is None:
+            refdt_offset = date_codec.log_date_to_refdt_offset(date)
+        self.refdt_offset = refdt_offset
 
         # We'll calculate these and assign later.
         self.canonical_plate = None
 
-        logger_name = '%s.%s' % (__name__, self.__class__.__name__)
-        self._logger = logging.getLogger(logger_name)
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    @property
+    def make(self):
+        '''The make of the vehicle logged.'''
+        return self.vehicle.make
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    @property
+    def model(self):
+        '''The model of the vehicle logged.'''
+        return self.vehicle.model
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    @property
+    def color(self):
+        '''The color of the vehicle logged.'''
+        return self.vehicle.color
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    @property
+    def location(self):
+        '''Where the vehicle was logged.'''
+        return self.vehicle.location
 
     # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
     def to_dict(self):
@@ -292,10 +451,10 @@ class LogRecord(object):
             'canonical_plate': self.canonical_plate,
             'date': self.date,
             'record_type': self.record_type,
-            'make': self.make,
-            'model': self.model,
-            'color': self.color,
-            'location': self.location,
+            'make': self.vehicle.make,
+            'model': self.vehicle.model,
+            'color': self.vehicle.color,
+            'location': self.vehicle.location,
             REF_DATETIME_KEY: self.refdt_offset,
             }
 
@@ -314,13 +473,18 @@ class PlateRecordSet(object):
             separated plates.
     '''
 
+    __slots__ = (
+        'column_manager', 'log_records', 'canonical_plate', 'date',
+        'refdt_offset', 'record_class', 'five_day_total',
+        )
+
+    # Shared by all instances, rather than looked up for each.
+    _logger = logging.getLogger('%s.PlateRecordSet' % __name__)
+
     # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
     def __init__(self, column_manager, records):
         '''Initialize one PlateRecordSet instance.'''
 
-        logger_name = '%s.%s' % (__name__, self.__class__.__name__)
-        self._logger = logging.getLogger(logger_name)
-
         self.column_manager = column_manager
         self.log_records = records
 
@@ -397,6 +561,111 @@ class PlateRecordSet(object):
             }
 
 
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def record_values(log_record):
+    '''Return a log record's RECORD_FIELDS values, as a tuple.'''
+    return (
+        log_record.plate, log_record.date, log_record.record_type,
+        log_record.refdt_offset, log_record.make, log_record.model,
+        log_record.color, log_record.location
+        )
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def records_from_values(records_values):
+    '''Generate LogRecord instances from record_values() values.
+
+    Records with the same make, model, color and location share one
+    VehicleAttributes instance.
+    '''
+
+    vehicles = {}
+    for (
+            plate, date, record_type, refdt_offset,
+            make, model, color, location
+            ) in records_values:  # pylint: disable=bad-continuation
+        attributes = (make, model, color, location)
+        vehicle = vehicles.get(attributes)
+        if vehicle is None:
+            vehicle = vehicles[attributes] = VehicleAttributes(*attributes)
+        yield LogRecord(
+            plate, date, record_type,
+            refdt_offset=refdt_offset, vehicle=vehicle
+            )
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def _first_sheet_row(filepath, sheet_name):
+    '''Return row 0 of a worksheet, or an empty tuple if it has none.'''
+
+    rows = xlsx_reader.iter_sheet_rows(filepath, sheet_name)
+    try:
+        return next(rows, ())
+    finally:
+        rows.close()
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def _read_log_sheet(sheet_task):
+    '''Read the record rows of one of a log's worksheets.
+
+    This runs in a worker process for LogParser._parse_sheets(), so it
+    takes and returns plain values.
+
+    Arguments:
+
+        sheet_task (tuple):
+            The (log file path, sheet name) of the sheet.
+
+    Returns a (sheet name, log version, (rows parsed, header rows
+    skipped, rows inprocessed), record rows) tuple, with the record
+    rows as LogParser._iter_record_rows() yields them.
+    '''
+    # pylint: disable=protected-access
+
+    filepath, sheet_name = sheet_task
+
+    sheet_parser = LogParser(filepath)
+    sheet_parser.column_manager = ColumnManager()
+
+    rows = xlsx_reader.iter_sheet_rows(filepath, sheet_name)
+    header_row = next(rows, ())
+    sheet_parser.column_manager.determine_column_map(header_row)
+
+    record_rows = list(sheet_parser._iter_record_rows(
+        itertools.chain([header_row], rows)
+        ))
+    return (
+        sheet_name,
+        sheet_parser.column_manager.log_version,
+        (
+            sheet_parser.rows_parsed,
+            sheet_parser.header_rows_skipped,
+            sheet_parser.rows_inprocessed,
+            ),
+        record_rows,
+        )
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def _map_log_sheets(sheet_tasks, jobs):
+    '''Read log sheets with _read_log_sheet(), up to jobs at a time.
+
+    Each sheet is a task of its own, so with as many jobs as sheets the
+    wall time is that of the largest sheet. Results are in task order.
+    '''
+
+    if jobs <= 1 or len(sheet_tasks) <= 1:
+        return [_read_log_sheet(sheet_task) for sheet_task in sheet_tasks]
+
+    pool = multiprocessing.Pool(min(jobs, len(sheet_tasks)))
+    try:
+        return pool.map(_read_log_sheet, sheet_tasks, chunksize=1)
+    finally:
+        pool.terminate()
+        pool.join()
+
+
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
 class LogParser(object):
     '''A Creekside Village parking log reader and parser.
@@ -422,11 +691,57 @@ class LogParser(object):
             The maximum number of days to include in the records
             resulting from parsing.
 
+        plate_store_path (str, optional):
+            The path to a ``matchiness.CanonicalPlateStore`` file used
+            to keep plate canonicalization consistent across runs. It
+            is created if it does not exist, and updated after parsing.
+
+        jobs (int, optional):
+            The number of worker processes to use for plate matching,
+            and for reading a log split across several worksheets.
+            The default of 1 does all of this in this process.
+
+        incremental (bool, optional):
+            If True, canonicalize plates as records are created, with a
+            ``matchiness.PlateIndex``, instead of matching all plates
+            once the log has been read.
+
+        normalization (list, optional):
+            The ``matchiness.NORMALIZATION_RULES`` to apply to plates
+            before fuzzy matching them. Plates that normalize to the
+            same key are treated as equivalent.
+
+        record_table (bool, optional):
+            If True, also keep the retained log records in a
+            ``record_table.RecordTable``, filled as records are created
+            and given their canonical plates once plates are
+            canonicalized. The five day totals and guest parking window
+            totals are then found from its columns, and it can be
+            exported or cached. The dashboard data is still made from
+            the records, so this costs time and memory; leave it off
+            unless the table is wanted.
+
+        windows (list, optional):
+            The ``window_totals.Window`` definitions of the guest
+            parking window totals in the dashboard data; by default,
+            ``DEFAULT_WINDOWS``.
+
+        checkpoint_path (str, optional):
+            The path to a ``parse_checkpoint.ParseCheckpoint`` file for
+            an append-only log. Only the rows added since it was saved
+            are parsed, unless earlier rows have changed, and it is
+            created if it does not exist, and updated after reading.
+
     Raises:
 
         ValueError: if all three of ``start_date``, ``end_date`` and
         ``days`` are passed. At most two are necessary.
 
+        ValueError: if both ``plate_store_path`` and ``incremental``
+        are passed.
+
+        ValueError: if ``normalization`` includes an unknown rule.
+
     The records retained after parsing will only include those with a
     date on or after ``start_date`` and before (not on) ``end_date``.
     If not explicitly provided, these date boundaries will be
@@ -448,7 +763,15 @@ class LogParser(object):
             filepath,
             start_date=None,
             end_date=None,
-            days=None
+            days=None,
+            plate_store_path=None,
+            jobs=1,
+            incremental=False,
+            normalization=None,
+            columnar=False,
+            record_table=False,
+            windows=None,
+            checkpoint_path=None
             ):  # pylint: disable=bad-continuation
         '''Initialize one LogRecord instance.'''
 
@@ -460,6 +783,42 @@ class LogParser(object):
         # The path to the log file.
         self.filepath = filepath
 
+        # The path to the plate canonicalization store, if any.
+        self.plate_store_path = plate_store_path
+
+        # The path to the parse checkpoint, if any.
+        self.checkpoint_path = checkpoint_path
+
+        # The number of worker processes to use for plate matching and
+        # reading worksheets.
+        self.jobs = jobs
+
+        if plate_store_path and incremental:
+            err_msg = 'a plate store cannot be used with incremental parsing'
+            self._logger.error(err_msg)
+            raise ValueError(err_msg)
+
+        # The normalization rules to apply to plates before matching.
+        self.normalization = matchiness.get_normalization_rules(
+            normalization
+            )
+
+        # Whether to read the log a column at a time rather than a row
+        # at a time.
+        self.columnar = columnar
+
+        # The guest parking window totals for the dashboard.
+        self.windows = list(
+            windows if windows is not None else DEFAULT_WINDOWS
+            )
+
+        # The index used to canonicalize plates as records are created,
+        # if parsing incrementally.
+        self._canonicalizer = (
+            matchiness.PlateIndex(normalization=self.normalization)
+            if incremental else None
+            )
+
         # We set the "real" values in _initialize_refdt_offset_boundaries().
         # Note that internally we do all comparisons using
         # refdt_offset values, so start_date and end_date need not be
@@ -470,6 +829,10 @@ class LogParser(object):
         self.start_refdt_offset = DEFAULT_START_REFDT_OFFSET
         self.end_refdt_offset = DEFAULT_END_REFDT_OFFSET
 
+        # If only days is given, the (start, end) refdt offsets found
+        # before creating records, which are only created within them.
+        self._dynamic_refdt_offsets = None
+
         # The following checks that if days is defined, at least one
         # of start_date and end_date is not defined; if one of them is
         # defined, this also calculates the other by
@@ -479,6 +842,14 @@ class LogParser(object):
         # Individual LogRecord instances creeated from the log.
         self.log_records = []
 
+        # The retained log records as columns, if wanted; filled as
+        # records are created.
+        self.record_table = RecordTable() if record_table else None
+
+        # The guest parking (canonical plate codes, refdt offsets, five
+        # day totals) found from the record table, if there is one.
+        self._table_five_day_totals = None
+
         # An index, by plate, of all log records for that plte.
         self._plate_index = {}
 
@@ -542,6 +913,16 @@ class LogParser(object):
         # saved records.
         self.records_inprocessed = 0
 
+        # The number of times records were re-pointed to a new
+        # canonical plate when parsing incrementally.
+        self.canonical_plate_changes = 0
+
+        # The number of distinct plates and distinct normalized plates
+        # found among retained records, set when plates are
+        # canonicalized.
+        self.plates_found = 0
+        self.normalized_plates_found = 0
+
     # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
     def _initialize_refdt_offset_boundaries(self):
         '''Calculate refdt_offset boundaries.
@@ -588,59 +969,81 @@ class LogParser(object):
         self._logger.debug('ending offset: %s', self.end_refdt_offset)
 
     # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
-    def _validate_refdt_offset(self, log_record):
+    def _validate_refdt_offset(self, refdt_offset, date):
         '''Assess refdt offset validity and update tracking bounds.
 
         In addition to updating the latest valid, minimum and maximum
         improcessed values for date and refdt_offset, this method
         logs a warning for invalid dates and returns True or False
-        depending on whether the record's refdt offset is within the
+        depending on whether the log date's refdt offset is within the
         start and end specified boundaries.
 
         '''
-        if log_record.refdt_offset > self.max_valid_refdt_offset:
+        if refdt_offset > self.max_valid_refdt_offset:
             self._logger.warn(
                 'warning: row %s: refdt %s exceeds limit %s, date was %s',
                 self.rows_parsed,
-                log_record.refdt_offset,
+                refdt_offset,
                 self.max_valid_refdt_offset,
-                log_record.date
+                date
                 )
-        elif log_record.refdt_offset > self.latest_valid_refdt_offset_found:
+        elif refdt_offset > self.latest_valid_refdt_offset_found:
             # It's valid, so it's the new latest found.
-            self.latest_valid_refdt_offset_found = log_record.refdt_offset
-            self.latest_valid_date_found = log_record.date
+            self.latest_valid_refdt_offset_found = refdt_offset
+            self.latest_valid_date_found = date
 
         # - - - - - - - - - - - - - - - -
-        if log_record.refdt_offset < self.min_refdt_offset_inprocessed:
-            self.min_refdt_offset_inprocessed = log_record.refdt_offset
-            self.min_date_inprocessed = log_record.date
+        if refdt_offset < self.min_refdt_offset_inprocessed:
+            self.min_refdt_offset_inprocessed = refdt_offset
+            self.min_date_inprocessed = date
 
-        if log_record.refdt_offset > self.max_refdt_offset_inprocessed:
-            self.max_refdt_offset_inprocessed = log_record.refdt_offset
-            self.max_date_inprocessed = log_record.date
+        if refdt_offset > self.max_refdt_offset_inprocessed:
+            self.max_refdt_offset_inprocessed = refdt_offset
+            self.max_date_inprocessed = date
 
         # if (
-        #         log_record.refdt_offset < self.start_refdt_offset
-        #         or log_record.refdt_offset >= self.end_refdt_offset
+        #         refdt_offset < self.start_refdt_offset
+        #         or refdt_offset >= self.end_refdt_offset
         #         ):  # pylint: disable=bad-continuation
-        if not self._check_offset_in_bounds(log_record):
+        if not self._check_offset_in_bounds(refdt_offset):
             self.records_out_of_date += 1
             return False
 
         return True
 
     # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
-    def _check_offset_in_bounds(self, log_record):
-        '''Check whether a log record's refdt_offset is between offset bounds.
+    def _check_offset_in_bounds(self, refdt_offset):
+        '''Check whether a refdt_offset is between offset bounds.
 
         Note that the lower bound is included, the upper excluded.
         '''
         return (
-            log_record.refdt_offset >= self.start_refdt_offset
-            and log_record.refdt_offset < self.end_refdt_offset
+            refdt_offset >= self.start_refdt_offset
+            and refdt_offset < self.end_refdt_offset
             )
 
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def _accept_refdt_offset(self, refdt_offset, date):
+        '''Validate a log date, and decide whether to create its record.
+
+        With only days given, records for dates outside the bounds
+        found by _find_dynamic_refdt_offsets() are counted as out of
+        date, as well as inprocessed, as they were when they were
+        created and then pruned, but they aren't created.
+        '''
+
+        if not self._validate_refdt_offset(refdt_offset, date):
+            return False
+        self.records_inprocessed += 1
+
+        if self._dynamic_refdt_offsets is not None:
+            start_refdt_offset, end_refdt_offset = self._dynamic_refdt_offsets
+            if not start_refdt_offset <= refdt_offset < end_refdt_offset:
+                self.records_out_of_date += 1
+                return False
+
+        return True
+
     # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
     def _update_validated_record_bounds(self, log_record):
         '''Update the records of the first and last record date.
@@ -667,52 +1070,59 @@ class LogParser(object):
             self.last_record_refdt_offset = log_record.refdt_offset
 
     # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
-    def _prune_to_dynamic_date_bounds(self):
-        '''Discard records outside date bounds based only on days.
-
-        This method updates all the output data fields affected by
-        the pruning.
+    def _find_log_refdt_offsets(self, rows):
+        '''Return the set of refdt offsets logged in rows with a plate.
+
+        This is a cheap pass over just the date cells, so that, with
+        only days given, the date bounds are known before records are
+        created. Rows are read with the current column manager. Cells
+        that aren't log dates, such as those of repeated header rows,
+        are skipped here; they are left for the main pass to handle.
         '''
-        self._logger.info('pruning to dynamic date bounds...')
 
-        assert self.start_date is None
-        assert self.end_date is None
-        assert self.start_refdt_offset == DEFAULT_START_REFDT_OFFSET
-        assert self.end_refdt_offset == DEFAULT_END_REFDT_OFFSET
-        assert self.days is not None
+        license_column = self.column_manager.license_column
+        date_columns = self.column_manager.record_type_columns
 
-        self._set_dynamic_date_bounds()
+        log_dates = set()
+        for row in rows:
+            if len(row) <= license_column or not row[license_column]:
+                continue
+            log_dates.update(
+                row[column] for column in date_columns
+                if column < len(row) and row[column]
+                )
 
-        # We have to calcualate these anew, so we reset them here.
-        self.first_record_date = None
-        self.first_record_refdt_offset = 0
-        self.last_record_date = None
-        self.last_record_refdt_offset = 0
-        self._plate_index = {}
+        refdt_offsets = set()
+        for log_date in log_dates:
+            try:
+                refdt_offset = date_codec.log_date_to_refdt_offset(log_date)
+            except ValueError:
+                continue
+            refdt_offsets.add(refdt_offset)
+        return refdt_offsets
 
-        # Comprehension selector that also offsets necessary records.
-        def in_bounds(log_record):
-            '''Check offset bounds, and tally those out of bounds.'''
-            if not self._check_offset_in_bounds(log_record):
-                self.records_out_of_date += 1
-                return False
-            self._update_validated_record_bounds(log_record)
-            return True
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def _find_dynamic_refdt_offsets(self, refdt_offsets):
+        '''Find the refdt offset bounds for days, from the log's dates.
 
-        # Remove log_record entries that are out of bounds.
-        self.log_records = [r for r in self.log_records if in_bounds(r)]
+        With only days given, records outside these bounds are never
+        created.
 
-        # Add to plate index.
-        for log_record in self.log_records:
-            _ = self._plate_index.setdefault(log_record.plate, [])
-            self._plate_index[log_record.plate].append(log_record)
+        Returns the (start, end) refdt offsets, with end one past the
+        latest valid date.
+        '''
 
-        self._logger.debug(
-            'first record offset set to: %s', self.first_record_refdt_offset
-            )
-        self._logger.debug(
-            'last record offset set to: %s', self.last_record_refdt_offset
-            )
+        # As in _validate_refdt_offset().
+        latest_valid_refdt_offset = 0
+        for refdt_offset in refdt_offsets:
+            if (
+                    latest_valid_refdt_offset < refdt_offset <=
+                    self.max_valid_refdt_offset
+                    ):  # pylint: disable=bad-continuation
+                latest_valid_refdt_offset = refdt_offset
+
+        end_refdt_offset = latest_valid_refdt_offset + 1
+        return end_refdt_offset - self.days, end_refdt_offset
 
     # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
     def _set_dynamic_date_bounds(self):
@@ -749,6 +1159,12 @@ class LogParser(object):
         self.start_refdt_offset = self.end_refdt_offset - self.days
         self.start_date = _to_yyyy_mm_dd(self.start_refdt_offset)
 
+        # The records were created within the bounds found before
+        # parsing, so these must be the same.
+        assert self._dynamic_refdt_offsets == (
+            self.start_refdt_offset, self.end_refdt_offset
+            )
+
         self._logger.debug(
             'starting offset set to: %s', self.start_refdt_offset
             )
@@ -773,25 +1189,60 @@ class LogParser(object):
         occurring plate among records that are equivalent as
         determined by matchiness.
 
+        If a plate store path was given, equivalence classes and
+        canonical plates are taken from the store, only plates the
+        store has not seen before are fuzzy matched, and a class keeps
+        the canonical plate chosen for it in earlier runs.
+
         The lists of log records that are the values of the
-        canonical plate index are sorted by ``refdt_offset``.
+        canonical plate index are sorted by ``refdt_offset``, then
+        plate; see ``_canonical_record_order()``.
 
         '''
 
-        matches = matchiness.find_equivalence_classes(
-            self._plate_index.keys()
-            )
+        plate_store = None
+        if self.plate_store_path:
+            plate_store = matchiness.CanonicalPlateStore.load(
+                self.plate_store_path, self.normalization
+                )
+            new_plates = plate_store.add_plates(
+                self._plate_index.keys(), jobs=self.jobs
+                )
+            self._logger.info('new plates matched: %s', len(new_plates))
+            plate_classes = plate_store.classes()
+        else:
+            plate_classes = matchiness.DisjointSet(self._plate_index)
+            plate_classes.union_all(
+                matchiness.get_matching_pairs(
+                    self._plate_index.keys(),
+                    jobs=self.jobs,
+                    normalization=self.normalization
+                    )
+                )
+            plate_classes = plate_classes.classes()
 
         # print '--------'
-        for plate_list in matches:
+        for plate_class in plate_classes:
+            # The store's classes may include plates we haven't seen
+            # in this log.
+            plate_list = [p for p in plate_class if p in self._plate_index]
+            if not plate_list:
+                continue
+
             # Get all log records with a plate in matches.
             matching_records = []
             for plate in plate_list:
                 matching_records.extend(self._plate_index[plate])
 
-            canonical_plate = _most_common_element(
-                [r.plate for r in matching_records]
-                )
+            if plate_store:
+                canonical_plate = self._stored_canonical_plate(
+                    plate_store, plate_class, matching_records
+                    )
+                plate_store.set_canonical_plate(plate_class, canonical_plate)
+            else:
+                canonical_plate = _most_common_element(
+                    [r.plate for r in matching_records]
+                    )
 
             # print [r.plate for r in matching_records]
             for log_record in matching_records:
@@ -800,7 +1251,7 @@ class LogParser(object):
                 #     log_record.plate, log_record.canonical_plate
                 #     )
             self._canonical_plate_index[canonical_plate] = sorted(
-                matching_records, key=lambda x: x.refdt_offset
+                matching_records, key=_canonical_record_order
                 )
 
         # print '-----------'
@@ -811,6 +1262,68 @@ class LogParser(object):
 
         # exit()
 
+        if plate_store:
+            plate_store.save()
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def _canonicalize_log_record(self, log_record):
+        '''Set a new log record's canonical plate as it is created.
+
+        If the record's plate changes the equivalence classes, only the
+        records of the classes it merged are re-pointed to the new
+        canonical plate.
+        '''
+
+        change = self._canonicalizer.canonicalize(log_record.plate)
+        canonical_plate = self._canonicalizer.canonical_plate(
+            log_record.plate
+            )
+
+        canonical_records = self._canonical_plate_index.setdefault(
+            canonical_plate, []
+            )
+        if change is not None:
+            for previous_plate in change.previous_canonical_plates:
+                if previous_plate == canonical_plate:
+                    continue
+                self.canonical_plate_changes += 1
+                for previous_record in self._canonical_plate_index.pop(
+                        previous_plate, []
+                        ):  # pylint: disable=bad-continuation
+                    previous_record.canonical_plate = canonical_plate
+                    canonical_records.append(previous_record)
+
+        log_record.canonical_plate = canonical_plate
+        canonical_records.append(log_record)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    @staticmethod
+    def _stored_canonical_plate(plate_store, plate_class, matching_records):
+        '''Choose a canonical plate for a class, preferring earlier choices.
+
+        If classes were merged since the last run, the earlier choice
+        with the most records wins. Classes with no earlier choice fall
+        back to the most common plate among their records.
+        '''
+
+        stored_plates = [
+            plate_store.canonical_plate(r.plate) for r in matching_records
+            ]
+        stored_plates = [p for p in stored_plates if p is not None]
+
+        if not stored_plates:
+            # None of this log's plates in the class are known, but the
+            # class may still have been seen under other plates.
+            stored_plates = [
+                plate_store.canonical_plate(p) for p in plate_class
+                ]
+            stored_plates = [p for p in stored_plates if p is not None]
+
+        if not stored_plates:
+            stored_plates = [r.plate for r in matching_records]
+
+        return _most_common_element(stored_plates)
+
     # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
     def _consolidate_date_records(self):
         '''Combine multiple records for the same date without information loss.
@@ -876,6 +1389,26 @@ class LogParser(object):
             len(self.log_records)
             )
 
+        if self._canonicalizer is not None:
+            self._logger.debug(
+                'canonical plate changes: %s',
+                self.canonical_plate_changes
+                )
+
+        if self.plates_found:
+            self._logger.debug(
+                'plate normalization rules: %s',
+                ', '.join(self.normalization) or 'none'
+                )
+            self._logger.debug(
+                'plates found: %s',
+                self.plates_found
+                )
+            self._logger.debug(
+                'normalized plates found: %s',
+                self.normalized_plates_found
+                )
+
         # self._logger.debug(
         #     'plates found: %s', len(plates)
         #     )
@@ -887,30 +1420,77 @@ class LogParser(object):
 
     # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
     # pylint: disable=invalid-name
-    def _calculate_guest_parking_window_totals(self, plate):
-        '''Populate the 30, 60, 90 day window totals for a canonical plate.'''
+    def _calculate_guest_parking_window_totals(self):
+        '''Find the window totals for all canonical plates at once.
 
-        record_sets = self._plate_record_set_index[plate]
-        # We tally with an index, and convert to a list of
-        # {key:, value:} dicts at the end.
-        window_totals = {k: 0 for k in WINDOWS}
+        Returns a dict, by canonical plate, of the plate's window
+        totals as a list of {key:, value:} dicts, one per window.
+        '''
 
-        # record_sets is sorted in refdt_offset order.
-        for record_set in record_sets:
-            if not record_set.record_class['guest_parking']:
-                continue
-            days_since_record = self.end_refdt_offset - record_set.refdt_offset
-            for window_type, window_size in WINDOWS.iteritems():
-                if days_since_record <= window_size:
-                    if window_type[:4] == 'log1':
-                        window_totals[window_type] += 1
-                    elif (
-                            window_type[:4] == 'log5' and
-                            record_set.five_day_total >= 3
-                            ):  # pylint: disable=bad-continuation
-                        window_totals[window_type] += 1
-
-        return [{'key': k, 'value': v} for k, v in window_totals.iteritems()]
+        if self.record_table is not None:
+            return self._calculate_table_window_totals()
+
+        plates = list(self._plate_record_set_index)
+
+        # Gather every plate's guest parking record sets as entries.
+        plate_codes = []
+        days_before_end = []
+        five_day_totals = []
+        for plate_code, plate in enumerate(plates):
+            for record_set in self._plate_record_set_index[plate]:
+                if not record_set.record_class['guest_parking']:
+                    continue
+                plate_codes.append(plate_code)
+                days_before_end.append(
+                    self.end_refdt_offset - record_set.refdt_offset
+                    )
+                five_day_totals.append(record_set.five_day_total)
+
+        totals = window_totals.window_totals(
+            plate_codes, days_before_end, five_day_totals,
+            self.windows, len(plates)
+            )
+
+        return dict(
+            (plate, [
+                {'key': window.key, 'value': value}
+                for window, value in zip(self.windows, plate_totals)
+                ])
+            for plate, plate_totals in zip(plates, totals)
+            )
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def _calculate_table_window_totals(self):
+        '''Find the window totals for all canonical plates from the
+        record table's columns.
+
+        This gives the same totals as the plate record sets: a plate's
+        guest parking days, and their five day totals, are those
+        _set_table_five_day_totals() found from the canonical plate,
+        record type and refdt offset columns.
+        '''
+
+        plate_codes, refdt_offsets, five_day_totals = (
+            self._table_five_day_totals
+            )
+        days_before_end = list(itertools.imap(
+            operator.sub, itertools.repeat(self.end_refdt_offset),
+            refdt_offsets
+            ))
+
+        codes = self.record_table.dictionaries['plate'].codes
+        totals = window_totals.window_totals(
+            plate_codes, days_before_end, five_day_totals,
+            self.windows, len(codes)
+            )
+
+        return dict(
+            (plate, [
+                {'key': window.key, 'value': value}
+                for window, value in zip(self.windows, totals[codes[plate]])
+                ])
+            for plate in self._plate_record_set_index
+            )
     # pylint: enable=invalid-name
 
     # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
@@ -918,67 +1498,567 @@ class LogParser(object):
         '''Parse the instance's parking log file.'''
 
         self._logger.debug('parsing log file %s', self.filepath)
-        workbook = xlrd.open_workbook(self.filepath)
+
+        if self.checkpoint_path:
+            self.parse_log_records(self._read_checkpointed_log())
+            return
+
+        self._read_log()
+        self._logger.debug('rows: %s', self.rows_parsed)
+        self._process_log_records()
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def parse_log_records(self, log_records):
+        '''Parse log records that were read from logs elsewhere.
+
+        This does what parse() does once a log has been read, for
+        records gathered some other way, e.g. merged from several logs
+        by a ``log_corpus.LogCorpus``. The records are accepted, or
+        counted as out of date, against the instance's date bounds as
+        records read from a log are; their dates are checked against
+        the instance's max_valid_refdt_offset.
+
+        Arguments:
+
+            log_records (list):
+                The ``LogRecord`` instances, in log order, without
+                canonical plates.
+
+        '''
+
+        if self._days_only():
+            self._dynamic_refdt_offsets = self._find_dynamic_refdt_offsets(
+                set(log_record.refdt_offset for log_record in log_records)
+                )
+
+        for log_record in log_records:
+            if self._accept_refdt_offset(
+                    log_record.refdt_offset, log_record.date
+                    ):  # pylint: disable=bad-continuation
+                self._add_log_record(log_record)
+
+        self._process_log_records()
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def _read_log(self):
+        '''Create log records from the instance's log file.'''
+
+        # Just to be sure these are reset.
+        self.rows_parsed = 0
+        self.header_rows_skipped = 0
+        self.rows_inprocessed = 0
+
+        open_rows, rows_source, log_sheet_names, _, _ = self._open_log()
+        if open_rows is None:
+            self._parse_sheets(log_sheet_names)
+        else:
+            self._parse_source(open_rows(), rows_source, open_rows)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def _read_checkpointed_log(self):
+        '''Return the log's records, parsing only rows added since the
+        checkpoint at checkpoint_path was saved.
+
+        The rows the checkpoint covers aren't read again: the log's
+        bytes up to the end of them are checked against the checkpoint,
+        and if they have changed, the whole log is parsed again. The
+        checkpoint is then saved with the new rows' records added.
+        Records are read without date bounds, for parse_log_records()
+        to apply.
+        '''
+        # pylint: disable=protected-access
+
+        checkpoint = parse_checkpoint.ParseCheckpoint.load(
+            self.checkpoint_path
+            )
+        reader = LogParser(
+            self.filepath, jobs=self.jobs, columnar=self.columnar
+            )
+
+        (
+            open_rows, rows_source, log_sheet_names, row_position,
+            open_rows_after
+            ) = reader._open_log()
+
+        if open_rows is None:
+            self._logger.warning(
+                '%s: no checkpoint is kept for a log split across sheets',
+                self.filepath
+                )
+            reader._parse_sheets(log_sheet_names)
+            log_records = reader.log_records
+
+        else:
+            position = checkpoint.parsed_position(rows_source)
+            new_rows = (
+                open_rows_after(position) if position is not None else None
+                )
+
+            if new_rows is not None:
+                self._logger.info(
+                    'parsing rows after the %s in checkpoint %s',
+                    checkpoint.row_count, self.checkpoint_path
+                    )
+                reader.column_manager = ColumnManager()
+                reader.column_manager.determine_column_map(
+                    ColumnManager.version_header_row[checkpoint.log_version]
+                    )
+                (
+                    reader.rows_parsed, reader.header_rows_skipped,
+                    reader.rows_inprocessed
+                    ) = checkpoint.row_counts
+                if self.columnar:
+                    reader._parse_columns(new_rows)
+                else:
+                    reader._parse_rows(new_rows)
+
+                log_records = list(records_from_values(checkpoint.records))
+                log_records.extend(reader.log_records)
+
+            else:
+                self._logger.info(
+                    'parsing all rows for checkpoint %s', self.checkpoint_path
+                    )
+                checkpoint.reset(rows_source)
+                reader._parse_source(open_rows(), rows_source)
+                checkpoint.log_version = reader.column_manager.log_version
+                log_records = reader.log_records
+
+            if reader.rows_parsed != checkpoint.row_count:
+                self._save_checkpoint(checkpoint, reader, row_position)
+
+        self.rows_parsed = reader.rows_parsed
+        self.header_rows_skipped = reader.header_rows_skipped
+        self.rows_inprocessed = reader.rows_inprocessed
+        self.column_manager = reader.column_manager
+        return log_records
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def _save_checkpoint(self, checkpoint, reader, row_position):
+        '''Add the rows a reader has parsed, and the records it created,
+        to a checkpoint, and save it.
+
+        Arguments:
+
+            checkpoint (ParseCheckpoint):
+                The checkpoint of the rows parsed before the reader's.
+
+            reader (LogParser):
+                The parser of the rows after them.
+
+            row_position (callable):
+                Returns the position after a number of the log's rows;
+                see _open_log().
+
+        '''
+
+        checkpoint.row_count = reader.rows_parsed
+        checkpoint.position = row_position(reader.rows_parsed)
+        if checkpoint.position is None:
+            self._logger.warning(
+                '%s: rows added to the log will not be found from '
+                'checkpoint %s', self.filepath, self.checkpoint_path
+                )
+        checkpoint.row_counts = [
+            reader.rows_parsed, reader.header_rows_skipped,
+            reader.rows_inprocessed
+            ]
+        checkpoint.records.extend(
+            record_values(log_record) for log_record in reader.log_records
+            )
+        checkpoint.save()
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def _open_log(self):
+        '''Find the rows of the instance's log file.
+
+        Returns an (open_rows, rows_source, log sheet names,
+        row_position, open_rows_after) tuple. For a log of delimited
+        text, or of one worksheet, open_rows returns a new iterator over
+        its rows, header row first, each time it's called; it takes an
+        optional set of the column indices to read. rows_source says
+        what the rows are read from. row_position and open_rows_after
+        are the reader's functions for finding the position after a
+        number of rows, and for reading only the rows after a position;
+        see parse_checkpoint. For a workbook with several log sheets,
+        all but the log sheet names are None, and the sheets are to be
+        read with _parse_sheets().
+        '''
+
+        # Logs may be exported as CSV or TSV; otherwise they're Excel.
+        delimiter = csv_reader.sniff_delimiter(self.filepath)
+        if delimiter is not None:
+            return (
+                functools.partial(
+                    csv_reader.iter_csv_rows, self.filepath, delimiter
+                    ),
+                'delimited text', None,
+                functools.partial(
+                    csv_reader.csv_row_position, self.filepath,
+                    delimiter=delimiter
+                    ),
+                functools.partial(
+                    csv_reader.iter_csv_rows_after, self.filepath,
+                    delimiter=delimiter
+                    ),
+                )
+
+        # A log may be split across worksheets; its sheets are those
+        # whose row 0 is a recognized header row.
+        sheet_names = xlsx_reader.sheet_names(self.filepath)
+        log_sheet_names = [
+            sheet_name for sheet_name in sheet_names
+            if ColumnManager.determine_log_version(
+                _first_sheet_row(self.filepath, sheet_name)
+                ) is not None
+            ]
+
+        if len(log_sheet_names) > 1:
+            return None, None, log_sheet_names, None, None
+
+        # With no log sheet, parsing reports the first sheet's header.
+        sheet_name = (
+            log_sheet_names or sheet_names or [xlsx_reader.DEFAULT_SHEET_NAME]
+            )[0]
+        return (
+            functools.partial(
+                xlsx_reader.iter_sheet_rows, self.filepath, sheet_name
+                ),
+            'sheet %s' % sheet_name, log_sheet_names,
+            functools.partial(
+                xlsx_reader.sheet_row_position, self.filepath, sheet_name
+                ),
+            functools.partial(
+                xlsx_reader.iter_sheet_rows_after, self.filepath, sheet_name
+                ),
+            )
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def _process_log_records(self):
+        '''Canonicalize the plates of the records created, and index them.
+        '''
+
+        self._log_parse_statistics()
+
+        if self._dynamic_refdt_offsets is not None:
+            # This dynamically calculates start and end dates.
+            self._set_dynamic_date_bounds()
+
+        self.plates_found = len(self._plate_index)
+        self.normalized_plates_found = len(set(
+            matchiness.normalize(plate, self.normalization)
+            for plate in self._plate_index
+            ))
+
+        if self._canonicalizer is None:
+            self._canonicalize_plates()
+        else:
+            # Plates were canonicalized as records were created, so
+            # the records for a canonical plate may be out of order.
+            for log_records in self._canonical_plate_index.itervalues():
+                log_records.sort(key=_canonical_record_order)
+        self._log_parse_statistics()
+
+        for plate, log_records in self._canonical_plate_index.iteritems():
+            plate_record_sets = self.get_plate_record_sets(log_records)
+            self._plate_record_set_index[plate] = plate_record_sets
+            if self.record_table is None:
+                _get_five_day_totals(plate_record_sets)
+
+        if self.record_table is not None:
+            self.record_table.set_canonical_plates(dict(
+                (log_record.plate, canonical_plate)
+                for canonical_plate, log_records
+                in self._canonical_plate_index.iteritems()
+                for log_record in log_records
+                ))
+            self._set_table_five_day_totals()
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def _set_table_five_day_totals(self):
+        '''Set the guest parking record sets' five day totals from the
+        record table's columns.
+
+        The totals are kept for _calculate_table_window_totals(), so
+        they're only found once.
+        '''
+
+        guest_parking_record_types = [
+            record_type for record_type, record_class
+            in self.column_manager.record_class.iteritems()
+            if record_class == 'guest_parking'
+            ]
+        self._table_five_day_totals = self.record_table.plate_day_counts(
+            FIVE_DAY_WINDOW_DAYS, guest_parking_record_types
+            )
+
+        five_day_totals = dict(
+            ((int(plate_code), int(refdt_offset)), int(total))
+            for plate_code, refdt_offset, total
+            in itertools.izip(*self._table_five_day_totals)
+            )
+        codes = self.record_table.dictionaries['plate'].codes
+        for plate, plate_record_sets in (
+                self._plate_record_set_index.iteritems()
+                ):  # pylint: disable=bad-continuation
+            plate_code = codes[plate]
+            for plate_record_set in plate_record_sets:
+                # Only guest parking record sets get a total.
+                if plate_record_set.record_class['guest_parking']:
+                    plate_record_set.five_day_total = five_day_totals[
+                        plate_code, plate_record_set.refdt_offset
+                        ]
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def _days_only(self):
+        '''Whether the date bounds are to be found from the log's dates.'''
+        return bool(self.days and not (self.start_date or self.end_date))
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def _parse_source(self, rows, rows_source, open_rows=None):
+        '''Create log records from the rows of one sheet or text file.
+
+        Arguments:
+
+            rows (iterator):
+                The rows, header row first.
+
+            rows_source (str):
+                What the rows are read from, for messages.
+
+            open_rows (callable, optional):
+                Returns a new iterator over the same rows, reading only
+                the column indices it's given; see _open_log(). With
+                only days given, it's used to find the log's dates
+                before records are created. It's needed then.
+
+        '''
 
         self.column_manager = ColumnManager()
 
-        sheet = workbook.sheet_by_name('Sheet1')
-        self.column_manager.determine_column_map(sheet.row(0))
+        header_row = next(rows, ())
+        self.column_manager.determine_column_map(header_row)
 
         if self.column_manager.log_version is None:
-            err_msg = '%s: sheet %s row 0 is not a recognized header row'
-            self._logger.error(err_msg, self.filepath, sheet.name)
+            err_msg = '%s: %s row 0 is not a recognized header row'
+            self._logger.error(err_msg, self.filepath, rows_source)
             raise CsvParkingLogStructureError(
-                err_msg % (self.filepath, sheet.name)
+                err_msg % (self.filepath, rows_source)
                 )
         self._logger.info(
             'log version determined: %s', self.column_manager.log_version
             )
 
-        number_of_rows = sheet.nrows
-        self._logger.debug('rows: %s', number_of_rows)
+        rows = itertools.chain([header_row], rows)
+        if self._days_only():
+            # Find the date bounds from the log's dates first, so that
+            # records outside them are never created. The dates are
+            # read in a pass of their own, so the rows are streamed
+            # both times rather than held.
+            date_rows = open_rows(
+                [self.column_manager.license_column] +
+                list(self.column_manager.record_type_columns)
+                )
+            self._dynamic_refdt_offsets = self._find_dynamic_refdt_offsets(
+                self._find_log_refdt_offsets(date_rows)
+                )
+            self._logger.debug(
+                'dynamic offset bounds found: %s', self._dynamic_refdt_offsets
+                )
+
+        if self.columnar:
+            self._parse_columns(rows)
+        else:
+            self._parse_rows(rows)
 
-        # Just to be sure these are reset.
-        self.rows_parsed = 0
-        self.header_rows_skipped = 0
-        self.rows_inprocessed = 0
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def _parse_sheets(self, log_sheet_names):
+        '''Create log records from a log split across worksheets.
 
-        license_column = self.column_manager.license_column
+        The sheets are read in worker processes, up to jobs at a time,
+        and their records are then created here, in workbook order,
+        before plates are canonicalized; records come out as they would
+        from one sheet holding all of the sheets' rows.
+        '''
+
+        self._logger.info(
+            'reading %d sheets: %s', len(log_sheet_names), log_sheet_names
+            )
+        sheet_reads = _map_log_sheets(
+            [(self.filepath, sheet_name) for sheet_name in log_sheet_names],
+            self.jobs
+            )
 
-        for row_num in range(number_of_rows):
+        # Each sheet's column manager, as the log version may change
+        # from one sheet to the next.
+        column_managers = []
+        for sheet_name, log_version, row_counts, _ in sheet_reads:
+            self._logger.info(
+                'sheet %s log version determined: %s', sheet_name, log_version
+                )
+            column_manager = ColumnManager()
+            column_manager.determine_column_map(
+                ColumnManager.version_header_row[log_version]
+                )
+            column_managers.append(column_manager)
+
+            rows_parsed, header_rows_skipped, rows_inprocessed = row_counts
+            self.rows_parsed += rows_parsed
+            self.header_rows_skipped += header_rows_skipped
+            self.rows_inprocessed += rows_inprocessed
+
+        if self._days_only():
+            refdt_offsets = set()
+            for column_manager, sheet_read in zip(
+                    column_managers, sheet_reads
+                    ):  # pylint: disable=bad-continuation
+                self.column_manager = column_manager
+                refdt_offsets.update(
+                    self._find_log_refdt_offsets(sheet_read[-1])
+                    )
+            self._dynamic_refdt_offsets = self._find_dynamic_refdt_offsets(
+                refdt_offsets
+                )
+            self._logger.debug(
+                'dynamic offset bounds found: %s', self._dynamic_refdt_offsets
+                )
+
+        for column_manager, sheet_read in zip(column_managers, sheet_reads):
+            self.column_manager = column_manager
+            record_rows = sheet_read[-1]
+            if self.columnar:
+                if record_rows:
+                    self.create_column_records(
+                        zip(*record_rows), range(len(record_rows))
+                        )
+            else:
+                for record_row in record_rows:
+                    self.create_row_records(record_row)
+
+        self.column_manager = column_managers[0]
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def _parse_rows(self, rows):
+        '''Create log records from the log's rows, one row at a time.'''
+
+        for record_row in self._iter_record_rows(rows):
+            self.create_row_records(record_row)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def _iter_record_rows(self, rows):
+        '''Yield the log's rows that hold records, ready to create them.
+
+        Rows are padded out to the header row width, rows without a
+        plate and repeated header rows are dropped, and the LIC and
+        MODEL values are coerced. The row counts are kept as rows are
+        read.
+        '''
+
+        column_manager = self.column_manager
+        license_column = column_manager.license_column
+        model_column = column_manager.column_indices['MODEL']
+
+        # Rows are ragged, so pad them out to the header row width.
+        row_width = len(column_manager.header_row_template)
+
+        for record_row in rows:
             self.rows_parsed += 1
-            record_row = sheet.row(row_num)
 
-            if not record_row[license_column].value:
+            if len(record_row) < row_width:
+                record_row += (xlsx_reader.EMPTY_VALUE,) * (
+                    row_width - len(record_row)
+                    )
+
+            if not record_row[license_column]:
                 continue
 
-            if self.column_manager.is_header_row(record_row):
+            if column_manager.is_header_row(record_row):
                 self.header_rows_skipped += 1
                 continue
 
             self.rows_inprocessed += 1
-            _force_float_to_int(
-                record_row, self.column_manager.column_indices['LIC']
+            record_row = list(record_row)
+            record_row[license_column] = _coerce_float_to_int(
+                record_row[license_column]
                 )
-            _force_float_to_int(
-                record_row, self.column_manager.column_indices['MODEL']
+            record_row[model_column] = _coerce_float_to_int(
+                record_row[model_column]
                 )
 
-            self.create_row_records(record_row)
+            yield record_row
 
-        self._log_parse_statistics()
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def _parse_columns(self, rows):
+        '''Create log records from the log's rows, a column at a time.
+
+        The rows are turned into columns as they are read, and each
+        step of _parse_rows() is then applied to whole columns: picking
+        rows with a plate, dropping header rows and coercing the LIC
+        and MODEL values. The records created, and their order, are the
+        same.
+        '''
 
-        if self.days and not (self.start_date or self.end_date):
-            # This will also dynamically calculate start and end dates.
-            self._prune_to_dynamic_date_bounds()
+        # Syntax sugar.
+        column_indices = self.column_manager.column_indices
 
-        self._canonicalize_plates()
-        self._log_parse_statistics()
+        # Rows are ragged, so pad the columns out to the header row
+        # width. Rows are added COLUMN_CHUNK_ROWS at a time, so only a
+        # chunk of them is held besides the columns.
+        row_width = len(self.column_manager.header_row_template)
+        columns = [[] for _ in range(row_width)]
+        row_count = 0
+        for chunk in iter(
+                lambda: list(itertools.islice(rows, COLUMN_CHUNK_ROWS)), []
+                ):  # pylint: disable=bad-continuation
+            row_count += len(chunk)
+            chunk_columns = itertools.izip_longest(
+                *chunk, fillvalue=xlsx_reader.EMPTY_VALUE
+                )
+            for column, values in itertools.izip(columns, chunk_columns):
+                column.extend(values)
+            for column in columns:
+                if len(column) < row_count:
+                    column.extend(
+                        [xlsx_reader.EMPTY_VALUE] * (row_count - len(column))
+                        )
+        self.rows_parsed += row_count
 
-        for plate, log_records in self._canonical_plate_index.iteritems():
-            plate_record_sets = self.get_plate_record_sets(log_records)
-            self._plate_record_set_index[plate] = plate_record_sets
-            _get_five_day_totals(plate_record_sets)
+        license_values = columns[self.column_manager.license_column]
+        row_nums = [
+            row_num for row_num, plate in enumerate(license_values) if plate
+            ]
+
+        header_row_nums = self.column_manager.find_header_rows(
+            columns, row_nums
+            )
+        if header_row_nums:
+            self.header_rows_skipped += len(header_row_nums)
+            row_nums = [
+                row_num for row_num in row_nums
+                if row_num not in header_row_nums
+                ]
+        self.rows_inprocessed += len(row_nums)
+
+        for column_name in ['LIC', 'MODEL']:
+            column_index = column_indices[column_name]
+            columns[column_index] = _coerce_column(columns[column_index])
+
+        self.create_column_records(columns, row_nums)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def _add_log_record(self, new_record):
+        '''Keep a new log record, accepted by _accept_refdt_offset().'''
+
+        self._update_validated_record_bounds(new_record)
+        self.log_records.append(new_record)
+        _ = self._plate_index.setdefault(
+            new_record.plate, []
+            )
+        self._plate_index[new_record.plate].append(new_record)
+        if self._canonicalizer is not None:
+            self._canonicalize_log_record(new_record)
+        if self.record_table is not None:
+            self.record_table.append(new_record)
 
     # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
     def create_row_records(self, record_row):
@@ -986,40 +2066,121 @@ class LogParser(object):
         '''
 
         # Syntax sugar.
-        column_indices = self.column_manager.column_indices
+        column_manager = self.column_manager
+
+        plate = column_manager.plate_getter(record_row)
 
-        plate = record_row[column_indices['LIC']].value
+        # The row's records all describe the same vehicle.
+        vehicle = None
 
         # Add a record for each of these potential date fields
         # that have a value defined.
-        for event_field_index in self.column_manager.record_type_columns:
-
-            record_type = self.column_manager.record_type[event_field_index]
+        for (_, record_type, _), record_date in itertools.izip(
+                column_manager.record_type_plan,
+                column_manager.event_getter(record_row)
+                ):  # pylint: disable=bad-continuation
 
             # If a value is present for this type of event, it should
             # be the date the event was logged.
-            if record_row[event_field_index].value:
+            if record_date:
 
-                record_date = record_row[event_field_index].value
+                refdt_offset = date_codec.log_date_to_refdt_offset(
+                    record_date
+                    )
+                if not self._accept_refdt_offset(refdt_offset, record_date):
+                    continue
+
+                if vehicle is None:
+                    vehicle = VehicleAttributes(
+                        *column_manager.vehicle_getter(record_row)
+                        )
 
                 new_record = LogRecord(
                     plate,
                     record_date,
                     record_type,
-                    make=record_row[column_indices['MAKE']].value,
-                    model=record_row[column_indices['MODEL']].value,
-                    color=record_row[column_indices['COLOR']].value,
-                    location=record_row[column_indices['LOCATION']].value
+                    refdt_offset=refdt_offset,
+                    vehicle=vehicle
                     )
 
-                if self._validate_refdt_offset(new_record):
-                    self._update_validated_record_bounds(new_record)
-                    self.log_records.append(new_record)
-                    self.records_inprocessed += 1
-                    _ = self._plate_index.setdefault(
-                        new_record.plate, []
-                        )
-                    self._plate_index[new_record.plate].append(new_record)
+                self._add_log_record(new_record)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def create_column_records(self, columns, row_nums):
+        '''Create LogRecord instances for the dates logged in these rows.
+
+        Arguments:
+
+            columns (list):
+                The log's column value sequences, by column index.
+
+            row_nums (list):
+                The numbers of the rows to create records for, in
+                order.
+
+        Records are created in the order create_row_records() would
+        create them, row by row.
+        '''
+
+        # Syntax sugar.
+        column_indices = self.column_manager.column_indices
+        record_type_plan = self.column_manager.record_type_plan
+
+        # Find the logged events, as (row number, position in
+        # record_type_plan, refdt offset) tuples, so they sort into row
+        # order. Each column's dates are converted all at once.
+        events = []
+        for position, (event_field_index, _, _) in enumerate(
+                record_type_plan
+                ):  # pylint: disable=bad-continuation
+            event_column = columns[event_field_index]
+            event_row_nums = [
+                row_num for row_num in row_nums if event_column[row_num]
+                ]
+            refdt_offsets = date_codec.log_dates_to_refdt_offsets(
+                [event_column[row_num] for row_num in event_row_nums]
+                )
+            events.extend(
+                (row_num, position, refdt_offset)
+                for row_num, refdt_offset
+                in zip(event_row_nums, refdt_offsets)
+                )
+        events.sort()
+
+        plates = columns[column_indices['LIC']]
+        makes = columns[column_indices['MAKE']]
+        models = columns[column_indices['MODEL']]
+        colors = columns[column_indices['COLOR']]
+        locations = columns[column_indices['LOCATION']]
+
+        # Events are in row order, so each row's vehicle is only needed
+        # until the next row's first event.
+        vehicle_row_num, vehicle = None, None
+
+        for row_num, position, refdt_offset in events:
+            event_field_index, record_type, _ = record_type_plan[position]
+            record_date = columns[event_field_index][row_num]
+            if not self._accept_refdt_offset(refdt_offset, record_date):
+                continue
+
+            if row_num != vehicle_row_num:
+                vehicle_row_num = row_num
+                vehicle = VehicleAttributes(
+                    make=makes[row_num],
+                    model=models[row_num],
+                    color=colors[row_num],
+                    location=locations[row_num]
+                    )
+
+            new_record = LogRecord(
+                plates[row_num],
+                record_date,
+                record_type,
+                refdt_offset=refdt_offset,
+                vehicle=vehicle
+                )
+
+            self._add_log_record(new_record)
 
     # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
     def get_plate_record_sets(self, canonical_plate_log_records):
@@ -1106,6 +2267,8 @@ class LogParser(object):
             }
         '''
 
+        window_totals_by_plate = self._calculate_guest_parking_window_totals()
+
         dashboard_data = {
             'date_range': {
                 'first_record_date': self.first_record_date,
@@ -1119,9 +2282,7 @@ class LogParser(object):
                         self._plate_record_set_index[plate][0].canonical_plate
                         ),
                     'records': [u.to_dict() for u in v],
-                    'window_total': (
-                        self._calculate_guest_parking_window_totals(plate)
-                        ),
+                    'window_total': window_totals_by_plate[plate],
                     }
                 for plate, v in self._plate_record_set_index.iteritems()
                 }
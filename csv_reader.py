@@ -0,0 +1,254 @@
+'''Read parking logs exported as CSV or TSV text.
+
+Rows are yielded the same way xlsx_reader yields them: tuples of cell
+values, ragged (trailing empty cells dropped), with rows that have no
+values yielded as empty tuples, and trailing empty rows not yielded at
+all. Values are text, since that is all a CSV file has; LogParser
+already copes with text plates, models and dates.
+
+A file is read as delimited text if its extension says so, or, for
+extensions that don't say what the file is, if csv.Sniffer can find a
+delimiter in the first part of it.
+'''
+
+import csv
+import hashlib
+import io
+import itertools
+import logging
+# Set default logging handler to avoid "No handler found" warnings.
+try:  # Python 2.7+
+    from logging import NullHandler
+except ImportError:
+    class NullHandler(logging.Handler):
+        '''Placeholder handler.'''
+        def emit(self, record):
+            pass
+import os
+import zipfile
+
+logging.getLogger(__name__).addHandler(NullHandler())
+
+# Delimiters for the extensions which tell us a file is delimited text.
+DELIMITER_BY_EXTENSION = {
+    '.csv': ',',
+    '.tsv': '\t',
+    '.tab': '\t',
+    }
+
+# Extensions which tell us a file is an Excel workbook.
+WORKBOOK_EXTENSIONS = ['.xls', '.xlsm', '.xlsx']
+
+# The delimiters we'll accept when sniffing a file.
+SNIFF_DELIMITERS = ',\t;|'
+SNIFF_SIZE = 16384
+
+ENCODING = 'utf-8'
+UTF8_BOM = '\xef\xbb\xbf'
+
+# The start of an OLE2 compound document, i.e. a legacy .xls workbook.
+OLE2_SIGNATURE = '\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+
+EMPTY_VALUE = u''
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def sniff_delimiter(filepath):
+    '''Return the delimiter for a delimited text file, or None.
+
+    None means the file isn't delimited text we can read, e.g. it's
+    an Excel workbook, it's binary, or it's empty.
+    '''
+
+    extension = os.path.splitext(filepath)[1].lower()
+    if extension in DELIMITER_BY_EXTENSION:
+        return DELIMITER_BY_EXTENSION[extension]
+    if extension in WORKBOOK_EXTENSIONS or zipfile.is_zipfile(filepath):
+        return None
+
+    with open(filepath, 'rb') as fptr:
+        sample = fptr.read(SNIFF_SIZE)
+
+    if not sample or '\0' in sample or sample.startswith(OLE2_SIGNATURE):
+        return None
+
+    # Don't let a partial last line confuse the sniffer.
+    if len(sample) == SNIFF_SIZE and '\n' in sample:
+        sample = sample[:sample.rindex('\n')]
+
+    try:
+        return csv.Sniffer().sniff(sample, SNIFF_DELIMITERS).delimiter
+    except csv.Error:
+        pass
+
+    # The sniffer wants every row to have the same number of fields,
+    # which ragged exports don't. The header row should be complete,
+    # so go by whichever delimiter it uses most.
+    header = sample.splitlines()[0]
+    count, delimiter = max(
+        (header.count(delimiter), delimiter)
+        for delimiter in SNIFF_DELIMITERS
+        )
+    return delimiter if count else None
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def iter_csv_rows(filepath, delimiter=None, columns=None):
+    '''Yield the rows of a delimited text file as tuples of values.
+
+    Arguments:
+
+        filepath (str):
+            The path to the CSV or TSV file.
+
+        delimiter (str):
+            The field delimiter; if None, it's determined by
+            sniff_delimiter().
+
+        columns (iterable, optional):
+            The indices of the columns to read; the other columns'
+            values are left empty, and aren't decoded. By default,
+            every column is read.
+
+    '''
+
+    logger = logging.getLogger(__name__)
+
+    data, delimiter = _read_data(filepath, delimiter)
+    logger.debug('reading %s delimited by %r', filepath, delimiter)
+    if data.startswith(UTF8_BOM):
+        data = data[len(UTF8_BOM):]
+
+    for row in _iter_data_rows(data, delimiter, columns):
+        yield row
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def _iter_data_rows(data, delimiter, columns=None):
+    '''Yield value tuples for the rows of delimited text.'''
+
+    # Decode the whole file at once to check it. Pure ASCII logs (the
+    # usual case) can then skip decoding each value.
+    try:
+        data.decode('ascii')
+        decode = None
+    except UnicodeDecodeError:
+        data.decode(ENCODING)
+        decode = lambda value: value.decode(ENCODING)
+
+    if columns is not None:
+        columns = frozenset(columns)
+
+    reader = csv.reader(io.BytesIO(data), delimiter=delimiter)
+    empty_rows = 0
+
+    for row in reader:
+        if columns is not None:
+            row = [
+                value if column_index in columns else ''
+                for column_index, value in enumerate(row)
+                ]
+        while row and not row[-1]:
+            row.pop()
+
+        # Rows without values only count once a later row has some.
+        if not row:
+            empty_rows += 1
+            continue
+
+        for _ in range(empty_rows):
+            yield ()
+        empty_rows = 0
+
+        if decode is not None:
+            row = [decode(value) if value else EMPTY_VALUE for value in row]
+        yield tuple(row)
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def _read_data(filepath, delimiter):
+    '''Return a delimited text file's bytes, and its delimiter.'''
+
+    if delimiter is None:
+        delimiter = sniff_delimiter(filepath)
+        if delimiter is None:
+            raise ValueError('%s is not delimited text' % filepath)
+
+    with open(filepath, 'rb') as fptr:
+        return fptr.read(), delimiter
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def csv_row_position(filepath, row_count, delimiter=None):
+    '''Return the position just after the first row_count rows of a
+    delimited text file, for iter_csv_rows_after().
+
+    The position is the byte offset the rows end at and a digest of
+    the bytes before it, or None if the file doesn't have that many
+    rows, or if they don't end with a line break that rows appended
+    later would follow.
+    '''
+
+    data, delimiter = _read_data(filepath, delimiter)
+    start = len(UTF8_BOM) if data.startswith(UTF8_BOM) else 0
+
+    # Reading lines from a BytesIO doesn't read ahead, so its position
+    # is where the last row read ends. Each row of the file, empty or
+    # not, is a row of the reader.
+    fptr = io.BytesIO(data)
+    fptr.seek(start)
+    reader = csv.reader(fptr, delimiter=delimiter)
+    if sum(1 for _ in itertools.islice(reader, row_count)) < row_count:
+        return None
+
+    offset = int(fptr.tell())
+    if not data[start:offset].endswith('\n'):
+        return None
+
+    return {
+        'offset': offset,
+        'digest': hashlib.sha256(data[:offset]).hexdigest(),
+        }
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def iter_csv_rows_after(filepath, position, delimiter=None):
+    '''Return an iterator over the rows of a delimited text file after a
+    csv_row_position() position.
+
+    Only the bytes after the position are parsed. None is returned if
+    the bytes before the position have changed, e.g. if parsed rows
+    were edited, so the rows after it may not follow on from them.
+    '''
+
+    data, delimiter = _read_data(filepath, delimiter)
+
+    offset = position['offset']
+    if (
+            len(data) < offset or
+            hashlib.sha256(data[:offset]).hexdigest() != position['digest']
+            ):  # pylint: disable=bad-continuation
+        return None
+
+    return _iter_data_rows(data[offset:], delimiter)
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def _csv_value(value):
+    '''Format a worksheet value the way Excel writes it to CSV.'''
+    if isinstance(value, float) and value == int(value):
+        value = int(value)
+    return unicode(value).encode(ENCODING)
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def write_csv_rows(rows, filepath, delimiter=','):
+    '''Write rows of worksheet values to a delimited text file.
+
+    Whole number floats are written as ints, as Excel does, so e.g. a
+    numeric plate or model year is written without a trailing '.0'.
+    '''
+    with open(filepath, 'wb') as fptr:
+        writer = csv.writer(fptr, delimiter=delimiter)
+        for row in rows:
+            writer.writerow([_csv_value(value) for value in row])
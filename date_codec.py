@@ -0,0 +1,170 @@
+'''Convert parking log dates to refdt offsets and offsets to YYYY-MM-DD.
+
+A log has only a few hundred distinct dates across tens of thousands of
+cells, so the scalar conversions are memoized, each in its own cache of
+at most CACHE_SIZE values. Excel date serials are converted with
+arithmetic rather than through datetime objects.
+
+The column conversions do a whole sequence of values at once: with
+NumPy installed, numeric columns are converted in a single vectorized
+step and offsets can be turned into datetime64 arrays.
+'''
+
+from datetime import date
+from datetime import datetime
+from datetime import timedelta
+import functools
+import math
+import re
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Date comparison is easier when we use "days since ref date" to compare.
+REF_DATETIME = datetime(2000, 01, 01)
+
+# This is the Excel vslue for offset to January 1, 2000.
+EXCEL_OFFSET_TO_REF_DATETIME = 36526
+
+STANDARD_DATE_FORMAT = '%Y-%m-%d'
+LOG_DATE_FORMAT = '%m.%d.%y'
+
+# Log dates are m.dd.yy, dot separated, possibly followed by other text.
+LOG_DATE_PATTERN = re.compile(
+    r'(?P<log_mon>\d{1,2})\.(?P<log_day>\d{1,2})\.(?P<log_year>\d{1,2})'
+    )
+
+# As for strptime's %y, two digit years from this on are in the 1900s.
+CENTURY_PIVOT_YEAR = 69
+
+# The most values each conversion cache holds before it is emptied.
+CACHE_SIZE = 4096
+
+_REF_ORDINAL = REF_DATETIME.toordinal()
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def memoize(max_size=CACHE_SIZE):
+    '''Decorate a function of one hashable argument with a bounded cache.
+
+    The cache is emptied when it is full, which is cheap and, given
+    how few distinct dates a log has, rare. Exceptions aren't cached.
+    '''
+
+    def decorator(func):
+        '''Add the cache to func.'''
+        cache = {}
+
+        @functools.wraps(func)
+        def wrapper(value):
+            '''Look the value up in the cache, or convert it.'''
+            try:
+                return cache[value]
+            except KeyError:
+                pass
+            result = func(value)
+            if len(cache) >= max_size:
+                cache.clear()
+            cache[value] = result
+            return result
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def excel_serial_to_refdt_offset(serial):
+    '''Convert an Excel date serial number to a refdt offset.
+
+    Serials count days from Excel's "January 0, 1900", in which 1900 is
+    a leap year; any fraction of a day is a time and is dropped.
+    '''
+    return int(math.floor(serial - EXCEL_OFFSET_TO_REF_DATETIME))
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+@memoize()
+def log_date_to_refdt_offset(log_date):
+    '''Convert a parking log date to a refdt offset.
+
+    The log date is either an Excel date serial number or text
+    starting with an m.dd.yy date. Raises ValueError if it's neither.
+    '''
+
+    if isinstance(log_date, (float, int, long)):
+        return excel_serial_to_refdt_offset(log_date)
+
+    matches = LOG_DATE_PATTERN.match(log_date)
+    if not matches:
+        raise ValueError('No log date found in %s' % log_date)
+
+    year = int(matches.group('log_year'))
+    year += 1900 if year >= CENTURY_PIVOT_YEAR else 2000
+
+    # date() raises ValueError for impossible dates, as strptime does.
+    return date(
+        year, int(matches.group('log_mon')), int(matches.group('log_day'))
+        ).toordinal() - _REF_ORDINAL
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+@memoize()
+def refdt_offset_to_yyyy_mm_dd(offset):
+    '''Convert a refdt offset to a YYYY-MM-DD date string.'''
+    return (REF_DATETIME + timedelta(days=offset)).strftime(
+        STANDARD_DATE_FORMAT
+        )
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def log_dates_to_refdt_offsets(log_dates):
+    '''Convert a sequence of parking log dates to a list of refdt offsets.
+
+    With NumPy, a column of Excel date serials is converted in one
+    step. Otherwise each distinct date is converted once.
+    '''
+
+    if (
+            numpy is not None and len(log_dates) and
+            isinstance(log_dates[0], (float, int, long))
+            ):  # pylint: disable=bad-continuation
+        serials = numpy.asarray(log_dates)
+        if serials.dtype.kind in 'fiu':
+            return numpy.floor(
+                serials - EXCEL_OFFSET_TO_REF_DATETIME
+                ).astype(int).tolist()
+
+    offsets = dict(
+        (log_date, log_date_to_refdt_offset(log_date))
+        for log_date in set(log_dates)
+        )
+    return [offsets[log_date] for log_date in log_dates]
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def refdt_offsets_to_datetime64(offsets):
+    '''Convert a sequence of refdt offsets to a NumPy datetime64 array.'''
+
+    if numpy is None:
+        raise ImportError('refdt_offsets_to_datetime64 requires numpy')
+
+    return (
+        numpy.datetime64(REF_DATETIME.date(), 'D') +
+        numpy.asarray(offsets, dtype=int).astype('timedelta64[D]')
+        )
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def refdt_offsets_to_yyyy_mm_dd(offsets):
+    '''Convert a sequence of refdt offsets to YYYY-MM-DD date strings.'''
+
+    if numpy is not None and len(offsets):
+        return numpy.datetime_as_string(
+            refdt_offsets_to_datetime64(offsets), unit='D'
+            ).tolist()
+
+    return [refdt_offset_to_yyyy_mm_dd(offset) for offset in offsets]
@@ -1,5 +1,7 @@
 '''Manage csv_parking log version and column mapping/meaning.'''
 
+import collections
+import itertools
 import logging
 # Set default logging handler to avoid "No handler found" warnings.
 try:  # Python 2.7+
@@ -9,6 +11,27 @@ except ImportError:
         '''Placeholder handler.'''
         def emit(self, record):
             pass
+import operator
+
+# The columns describing the vehicle, in VehicleAttributes argument
+# order.
+VEHICLE_COLUMNS = ('MAKE', 'MODEL', 'COLOR', 'LOCATION')
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def count_header_matches(row, row_template):
+    '''Count the cells of row that match a header row template.
+
+    Cells are compared as stripped text, by built-in functions mapped
+    over the row, so no Python code runs for each cell.
+    '''
+
+    cells = itertools.islice(row, len(row_template))
+    return sum(itertools.imap(
+        operator.eq,
+        itertools.imap(unicode.strip, itertools.imap(unicode, cells)),
+        row_template
+        ))
 
 
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
@@ -127,6 +150,15 @@ class ColumnManager(object):
             'street_tow': 'tow',
             }
 
+        # The row plan, compiled for the log version by
+        # determine_column_map(): getters for a row's plate, vehicle
+        # attributes and event cells, and a (column, record type,
+        # record class) tuple for each event cell.
+        self.plate_getter = None
+        self.vehicle_getter = None
+        self.event_getter = None
+        self.record_type_plan = []
+
     # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
     def determine_column_map(self, row):
         '''Examine a row and determine what log version we're managing.'''
@@ -149,6 +181,19 @@ class ColumnManager(object):
             if k in self.column_indices
             }
 
+        self.plate_getter = operator.itemgetter(self.column_indices['LIC'])
+        self.vehicle_getter = operator.itemgetter(
+            *[self.column_indices[name] for name in VEHICLE_COLUMNS]
+            )
+        self.event_getter = operator.itemgetter(*self.record_type_columns)
+        self.record_type_plan = [
+            (
+                column, self.record_type[column],
+                self.record_class[self.record_type[column]]
+                )
+            for column in self.record_type_columns
+            ]
+
     # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
     @property
     def license_column(self):
@@ -168,8 +213,8 @@ class ColumnManager(object):
                 continue
 
             matches = True
-            for index, cell in enumerate(row):
-                if cell.value.strip() != row_template[index]:
+            for index, value in enumerate(row):
+                if unicode(value).strip() != row_template[index]:
                     matches = False
                     break
 
@@ -182,7 +227,7 @@ class ColumnManager(object):
     def is_header_row(self, row, version=None):
         '''Examine a row and determine if it's a header row.'''
 
-        logger = logging.getLogger(__name__)
+        logger = self._logger
 
         # Not sure it's worth the cost here.
         # lower_row = map(lambda x: str(x).lower, row)
@@ -216,16 +261,53 @@ class ColumnManager(object):
         # if len(row) != len(row_template):
         #     continue
 
-        match_count = 0
-        for index, cell in enumerate(row):
-            if index > len(row_template):
-                break
-            if unicode(cell.value).strip() == row_template[index]:
-                match_count += 1
-            if match_count > self.header_row_match_threshold:
-                return True
+        return (
+            count_header_matches(row, row_template) >
+            self.header_row_match_threshold
+            )
 
-        return False
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def find_header_rows(self, columns, row_nums):
+        '''Find the header rows among rows of a sheet held as columns.
+
+        This gives the same answer as calling is_header_row() for each
+        row in row_nums, but compares each distinct value in a column
+        with the header once, rather than every cell.
+
+        Arguments:
+
+            columns (list):
+                The sheet's column value sequences, by column index.
+
+            row_nums (list):
+                The row numbers to check.
+
+        Returns the set of row numbers which are header rows.
+        '''
+
+        if not self.header_row_template:
+            err_msg = 'find_header_rows: log version is not determined'
+            self._logger.error(err_msg)
+            raise ValueError(err_msg)
+
+        row_template = self.header_row_template
+        match_counts = collections.Counter()
+
+        for index, column in enumerate(columns[:len(row_template)]):
+            header_values = set(
+                value for value in set(column)
+                if unicode(value).strip() == row_template[index]
+                )
+            if header_values:
+                match_counts.update(
+                    row_num for row_num in row_nums
+                    if column[row_num] in header_values
+                    )
+
+        return set(
+            row_num for row_num, match_count in match_counts.iteritems()
+            if match_count > self.header_row_match_threshold
+            )
 
     # # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
     # @staticmethod
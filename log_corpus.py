@@ -0,0 +1,256 @@
+'''Merge overlapping parking log snapshots into one log.
+
+Weekly log snapshots repeat most of the previous week's entries. A
+LogCorpus reads each snapshot in a worker process, which passes back
+the snapshot's records, and merges the snapshots here. Records are
+duplicates across snapshots if they have the same (plate, date, record
+type, location) key, and each key is kept as many times as it appears
+in any one snapshot, so a log that holds the same entry twice keeps
+both. The merged records are then parsed by one LogParser, so memory
+use follows the number of distinct records rather than the number of
+rows across all the snapshots.
+'''
+
+import logging
+# Set default logging handler to avoid "No handler found" warnings.
+try:  # Python 2.7+
+    from logging import NullHandler
+except ImportError:
+    class NullHandler(logging.Handler):
+        '''Placeholder handler.'''
+        def emit(self, record):
+            pass
+import multiprocessing
+
+import csv_parking_log
+from log_column_manager import ColumnManager
+
+logging.getLogger(__name__).addHandler(NullHandler())
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def record_key(log_record):
+    '''Return the key identifying duplicates of a log record.
+
+    Dates are compared as refdt offsets, so the same day logged as text
+    in one snapshot and as an Excel date in another is a duplicate.
+    '''
+    return (
+        log_record.plate, log_record.refdt_offset, log_record.record_type,
+        log_record.location
+        )
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def _read_log_file(file_task):
+    '''Read the records of one log file.
+
+    This runs in a worker process for LogCorpus.parse(), so it takes
+    and returns plain values. The file is read with no date bounds;
+    they are applied to the merged records.
+
+    Arguments:
+
+        file_task (tuple):
+            The (log file path, columnar) of the file, columnar being
+            passed on to LogParser.
+
+    Returns a (file path, log version, max valid refdt offset, (rows
+    parsed, header rows skipped, rows inprocessed), records read,
+    records) tuple, with each record as its
+    csv_parking_log.record_values(), in log order.
+    '''
+    # pylint: disable=protected-access
+
+    filepath, columnar = file_task
+
+    log_parser = csv_parking_log.LogParser(filepath, columnar=columnar)
+    log_parser._read_log()
+
+    records = [
+        csv_parking_log.record_values(log_record)
+        for log_record in log_parser.log_records
+        ]
+
+    return (
+        filepath,
+        log_parser.column_manager.log_version,
+        log_parser.max_valid_refdt_offset,
+        (
+            log_parser.rows_parsed,
+            log_parser.header_rows_skipped,
+            log_parser.rows_inprocessed,
+            ),
+        len(log_parser.log_records),
+        records,
+        )
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def _map_log_files(file_tasks, jobs):
+    '''Generate _read_log_file() results, reading up to jobs at a time.
+
+    Results are generated in task order, as each is needed, so only a
+    few files' records are held at once.
+    '''
+
+    if jobs <= 1 or len(file_tasks) <= 1:
+        for file_task in file_tasks:
+            yield _read_log_file(file_task)
+        return
+
+    pool = multiprocessing.Pool(min(jobs, len(file_tasks)))
+    try:
+        for result in pool.imap(_read_log_file, file_tasks):
+            yield result
+    finally:
+        # Also stops the workers if the caller stops reading early.
+        pool.terminate()
+        pool.join()
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+class LogCorpus(object):
+    '''Parking log files merged into one log, without duplicate records.
+
+    Arguments:
+
+        filepaths (list):
+            The paths to the log files, oldest first. The first
+            copies of a duplicated record are kept, and log dates are
+            taken to be valid up to the latest date in any file name.
+
+        jobs (int, optional):
+            The number of worker processes to read files with; also
+            passed on to the merged log's LogParser.
+
+        **parser_options:
+            Other ``csv_parking_log.LogParser`` arguments, e.g. days
+            or normalization, for parsing the merged log.
+
+    Raises:
+
+        ValueError: if there are no filepaths.
+
+    '''
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def __init__(self, filepaths, jobs=1, **parser_options):
+        '''Initialize one LogCorpus instance.'''
+
+        logger_name = '%s.%s' % (__name__, self.__class__.__name__)
+        self._logger = logging.getLogger(logger_name)
+
+        self.filepaths = list(filepaths)
+        if not self.filepaths:
+            err_msg = 'a log corpus needs at least one log file'
+            self._logger.error(err_msg)
+            raise ValueError(err_msg)
+
+        # The number of worker processes to read files with.
+        self.jobs = jobs
+
+        # The parser for the merged log; it's named for the last file.
+        self.log_parser = csv_parking_log.LogParser(
+            self.filepaths[-1], jobs=jobs, **parser_options
+            )
+
+        # The number of records read from all the files, and the
+        # number of them dropped as duplicates.
+        self.records_read = 0
+        self.duplicate_records = 0
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def parse(self):
+        '''Read, merge and parse the corpus's log files.'''
+
+        log_parser = self.log_parser
+
+        # The number of records kept so far, by key.
+        key_counts = {}
+
+        # The records kept share vehicles with the same attributes.
+        vehicles = {}
+
+        log_records = []
+        max_valid_refdt_offsets = []
+        file_tasks = [
+            (filepath, log_parser.columnar) for filepath in self.filepaths
+            ]
+        file_results = _map_log_files(file_tasks, self.jobs)
+        for (
+                filepath, log_version, max_valid_refdt_offset, row_counts,
+                records_read, records
+                ) in file_results:  # pylint: disable=bad-continuation
+            records_kept = len(log_records)
+
+            # The number of records read from this file so far, by key.
+            file_key_counts = {}
+
+            # Record types and classes are the same in every version.
+            if log_parser.column_manager is None:
+                log_parser.column_manager = ColumnManager()
+                log_parser.column_manager.determine_column_map(
+                    ColumnManager.version_header_row[log_version]
+                    )
+
+            for (
+                    plate, date, record_type, refdt_offset,
+                    make, model, color, location
+                    ) in records:  # pylint: disable=bad-continuation
+                key = (plate, refdt_offset, record_type, location)
+                file_key_count = file_key_counts[key] = (
+                    file_key_counts.get(key, 0) + 1
+                    )
+                if file_key_count <= key_counts.get(key, 0):
+                    continue
+
+                attributes = (make, model, color, location)
+                vehicle = vehicles.get(attributes)
+                if vehicle is None:
+                    vehicle = vehicles[attributes] = (
+                        csv_parking_log.VehicleAttributes(*attributes)
+                        )
+                log_record = csv_parking_log.LogRecord(
+                    plate, date, record_type,
+                    refdt_offset=refdt_offset, vehicle=vehicle
+                    )
+                log_records.append(log_record)
+
+                # The key made from the record shares its text.
+                key_counts[record_key(log_record)] = file_key_count
+
+            rows_parsed, header_rows_skipped, rows_inprocessed = row_counts
+            log_parser.rows_parsed += rows_parsed
+            log_parser.header_rows_skipped += header_rows_skipped
+            log_parser.rows_inprocessed += rows_inprocessed
+
+            max_valid_refdt_offsets.append(max_valid_refdt_offset)
+
+            self.records_read += records_read
+            self._logger.info(
+                '%s: %s new records of %s', filepath,
+                len(log_records) - records_kept, records_read
+                )
+
+        log_parser.max_valid_refdt_offset = max(max_valid_refdt_offsets)
+
+        self.duplicate_records = self.records_read - len(log_records)
+        self._logger.info(
+            'merged %s files: %s records, %s duplicates dropped',
+            len(self.filepaths), len(log_records), self.duplicate_records
+            )
+
+        del key_counts, file_key_counts, vehicles
+        log_parser.parse_log_records(log_records)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def dashboard_data(self):
+        '''Return the merged log's dashboard data.'''
+        return self.log_parser.dashboard_data()
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    @property
+    def record_table(self):
+        '''The merged log's record table, if one was asked for.'''
+        return self.log_parser.record_table
@@ -1,7 +1,12 @@
 #!/usr/bin/env python
 
 import argparse
+import collections
+import heapq
+import itertools
+import json
 import logging
+import multiprocessing
 import os
 import re
 import sys
@@ -32,12 +37,661 @@ FUZZ_SIZE = 2
 # "matchy".
 MATCH_THRESHOLD = 1
 
+# Normalization rules, in the order they are applied (see normalize()).
+# Strings normalized to the same key are equivalent without being fuzzy
+# matched, and only one string per key is fuzzy matched.
+NORMALIZATION_RULES = ['separators', 'case', 'confusables']
+
+# Characters removed by the 'separators' normalization rule.
+SEPARATORS = ' -.'
+
+# Easily confused characters, and the characters the 'confusables'
+# normalization rule replaces them with.
+CONFUSABLES = {'O': '0', 'I': '1', 'Z': '2', 'B': '8'}
+
+# The strings to score in a worker process, set by _init_scoring_worker.
+_WORKER_STRINGS = {}
+
+# A change to the class of plate made by PlateIndex.canonicalize():
+# previous_canonical_plates are the canonical plates of the classes now
+# merged under canonical_plate (empty if plate started a new class).
+CanonicalChange = collections.namedtuple(
+    'CanonicalChange',
+    ['plate', 'canonical_plate', 'previous_canonical_plates']
+    )
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+class DisjointSet(object):
+    '''A union-find structure for building string equivalence classes.
+
+    Pairs of matching strings are merged with ``union()``, and the
+    resulting equivalence classes are extracted in one pass with
+    ``classes()``. ``find()`` compresses paths as it goes and
+    ``union()`` attaches the shallower tree under the deeper one, so a
+    stream of pairs is consumed in near linear time.
+
+    Arguments:
+
+        elements (iterable, optional):
+            The initial elements, each in a class of its own.
+
+    '''
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def __init__(self, elements=()):
+        '''Initialize a DisjointSet instance.'''
+
+        self._parent = {}
+        self._rank = {}
+
+        for element in elements:
+            self.add(element)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def __contains__(self, element):
+        '''Check whether element has been added.'''
+        return element in self._parent
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def __iter__(self):
+        '''Iterate over the elements added.'''
+        return iter(self._parent)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def __len__(self):
+        '''Return the number of elements added.'''
+        return len(self._parent)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def add(self, element):
+        '''Add element in a class of its own, if not already present.'''
+
+        if element not in self._parent:
+            self._parent[element] = element
+            self._rank[element] = 0
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def find(self, element):
+        '''Return the representative of the class containing element.'''
+
+        parent = self._parent
+
+        root = element
+        while parent[root] != root:
+            root = parent[root]
+
+        # Point everything we walked through directly at the root.
+        while parent[element] != root:
+            parent[element], element = root, parent[element]
+
+        return root
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def union(self, element_a, element_b):
+        '''Merge the classes containing element_a and element_b.
+
+        Elements not yet present are added first. Returns the
+        representative of the merged class.
+        '''
+
+        self.add(element_a)
+        self.add(element_b)
+
+        root_a = self.find(element_a)
+        root_b = self.find(element_b)
+        if root_a == root_b:
+            return root_a
+
+        if self._rank[root_a] < self._rank[root_b]:
+            root_a, root_b = root_b, root_a
+        elif self._rank[root_a] == self._rank[root_b]:
+            self._rank[root_a] += 1
+
+        self._parent[root_b] = root_a
+        return root_a
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def union_all(self, pairs):
+        '''Merge the classes for each (element_a, element_b) in pairs.'''
+
+        for element_a, element_b in pairs:
+            self.union(element_a, element_b)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def classes(self):
+        '''Return the list of equivalence classes, as sets.'''
+
+        classes = {}
+        for element in self._parent:
+            classes.setdefault(self.find(element), set()).add(element)
+
+        return classes.values()
+
 
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
-class AlreadyFoundEquivalenceClass(Exception):
-    '''Interrupt when constructing unique equivalence class list.
+class CanonicalPlateStore(object):
+    '''An on-disk record of plate equivalence classes and canonical plates.
+
+    The store lets equivalence classes and canonical plate choices carry
+    over from one run to the next, so that only plates not seen before
+    need to be fuzzy matched. A store saved with different matching
+    parameters (see ``get_parameters()``) is discarded when loaded.
+
+    Arguments:
+
+        path (str, optional):
+            The path of the JSON file the store is saved to.
+
+        normalization (list, optional):
+            The NORMALIZATION_RULES to apply before fuzzy matching.
+
     '''
-    pass
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def __init__(self, path=None, normalization=None):
+        '''Initialize an empty CanonicalPlateStore instance.'''
+
+        logger_name = '%s.%s' % (__name__, self.__class__.__name__)
+        self._logger = logging.getLogger(logger_name)
+
+        self.path = path
+        self.normalization = get_normalization_rules(normalization)
+        self.parameters = get_parameters(self.normalization)
+
+        self.equivalents = DisjointSet()
+
+        # { plate: canonical plate for plate's class }
+        self._canonical_plate = {}
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    @classmethod
+    def load(cls, path, normalization=None):
+        '''Return the store saved at path, or an empty one.
+
+        An empty store is returned if there is no file at path or if it
+        was saved with different matching parameters.
+        '''
+
+        plate_store = cls(path, normalization)
+
+        if not os.path.exists(path):
+            plate_store._logger.info('no plate store found at %s', path)
+            return plate_store
+
+        with open(path) as fptr:
+            saved = json.load(fptr)
+
+        if saved.get('parameters') != plate_store.parameters:
+            plate_store._logger.info(
+                'discarding plate store %s saved with parameters %s',
+                path, saved.get('parameters')
+                )
+            return plate_store
+
+        for plate_class in saved['classes']:
+            plates = plate_class['plates']
+            plate_store.equivalents.union_all(
+                (plates[0], plate) for plate in plates
+                )
+            for plate in plates:
+                plate_store._canonical_plate[plate] = (
+                    plate_class['canonical_plate']
+                    )
+
+        plate_store._logger.info(
+            'loaded %s plates from plate store %s',
+            len(plate_store.equivalents), path
+            )
+        return plate_store
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def save(self, path=None):
+        '''Write the store to path, or to the path it was loaded from.'''
+
+        path = path or self.path
+
+        classes = []
+        for plate_class in self.equivalents.classes():
+            plates = sorted(plate_class)
+            canonical_plates = [
+                self._canonical_plate[p] for p in plates
+                if p in self._canonical_plate
+                ]
+            classes.append({
+                'canonical_plate': (
+                    canonical_plates[0] if canonical_plates else plates[0]
+                    ),
+                'plates': plates,
+                })
+        classes.sort(key=lambda c: c['plates'][0])
+
+        self._logger.info('saving plate store to %s', path)
+        with open(path, 'w') as fptr:
+            json.dump(
+                {'parameters': self.parameters, 'classes': classes}, fptr
+                )
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def __contains__(self, plate):
+        '''Check whether plate is already known to the store.'''
+        return plate in self.equivalents
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def add_plates(self, plates, jobs=1):
+        '''Add plates, matching only the new ones against known plates.
+
+        Matching is split across jobs worker processes if jobs is more
+        than 1. Returns the list of plates that were not already in the
+        store.
+        '''
+
+        new_plates = [p for p in set(plates) if p not in self.equivalents]
+        if not new_plates:
+            return new_plates
+
+        known_plates = list(self.equivalents)
+        for plate in new_plates:
+            self.equivalents.add(plate)
+        self.equivalents.union_all(
+            get_matching_pairs(
+                new_plates,
+                known_plates,
+                jobs=jobs,
+                normalization=self.normalization
+                )
+            )
+
+        return new_plates
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def classes(self):
+        '''Return the list of known equivalence classes, as sets.'''
+        return self.equivalents.classes()
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def canonical_plate(self, plate):
+        '''Return the canonical plate last chosen for plate, or None.'''
+        return self._canonical_plate.get(plate)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def set_canonical_plate(self, plate_class, canonical_plate):
+        '''Record canonical_plate as the choice for every plate in a class.'''
+
+        for plate in plate_class:
+            self._canonical_plate[plate] = canonical_plate
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+class PlateIndex(object):
+    '''An index of known plates for looking up near matches one at a time.
+
+    The index keeps two lookup tables for its plates: their signatures
+    (see ``iter_signatures()``), to find plates matching the wildcard
+    tests of a plate looked up, and their wildcard tests, to find plates
+    whose tests the plate looked up matches. Either way a lookup costs
+    a few dictionary probes per character of the plate, however many
+    plates are indexed, and adding a plate only extends the tables.
+
+    Plates are grouped into equivalence classes as they are added, and
+    each class has a canonical plate: by default its most often added
+    plate, chosen as ``most_common_plate()`` chooses.
+
+    Arguments:
+
+        plates (iterable, optional):
+            Plates to add to the index, each occurrence counting towards
+            the choice of canonical plate.
+
+        fuzz_size (int, optional):
+            Number of characters replaced with a wildcard in each test
+            (default: FUZZ_SIZE).
+
+        min_length (int, optional):
+            Minimum length of a plate to match (default: MIN_LENGTH).
+
+        max_size_diff (int, optional):
+            Plates must differ in length by less than this to match
+            (default: MAX_SIZE_DIFF).
+
+        match_threshold (int, optional):
+            Number of matching tests for two plates to match (default:
+            MATCH_THRESHOLD).
+
+        normalization (list, optional):
+            The NORMALIZATION_RULES to apply before fuzzy matching. Only
+            the first plate added with each normalized key is indexed.
+
+    '''
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def __init__(
+            self,
+            plates=(),
+            fuzz_size=FUZZ_SIZE,
+            min_length=MIN_LENGTH,
+            max_size_diff=MAX_SIZE_DIFF,
+            match_threshold=MATCH_THRESHOLD,
+            normalization=None
+            ):  # pylint: disable=bad-continuation
+        '''Initialize a PlateIndex instance.'''
+
+        logger_name = '%s.%s' % (__name__, self.__class__.__name__)
+        self._logger = logging.getLogger(logger_name)
+
+        self.fuzz_size = fuzz_size
+        self.min_length = min_length
+        self.max_size_diff = max_size_diff
+        self.match_threshold = match_threshold
+        self.normalization = get_normalization_rules(normalization)
+
+        self.equivalents = DisjointSet()
+
+        # { plate: number of times plate was added }
+        self.counts = {}
+
+        # { class representative: canonical plate for the class }
+        self._canonical_plate = {}
+
+        # { normalized key: first plate added with that key }
+        self._key_plate = {}
+
+        # The lookup tables hold normalized keys, which are the plates
+        # themselves if there are no normalization rules.
+        # { length: { (prefix, suffix): set([keys of that length]) } }
+        self._signature_index = {}
+
+        # { length: { (prefix, suffix): set([keys with that test]) } }
+        self._test_index = {}
+
+        for plate in plates:
+            self.add(plate)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    @property
+    def parameters(self):
+        '''The parameters that determine which plates are equivalent.'''
+        return {
+            'MIN_LENGTH': self.min_length,
+            'MAX_SIZE_DIFF': self.max_size_diff,
+            'FUZZ_SIZE': self.fuzz_size,
+            'MATCH_THRESHOLD': self.match_threshold,
+            'NORMALIZATION': self.normalization,
+            }
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    @classmethod
+    def load(cls, path):
+        '''Return the index saved at path.
+
+        Plates are indexed with the saved parameters and put in the
+        saved classes without being matched again. A file saved by a
+        CanonicalPlateStore can also be loaded; its plates are each
+        counted once.
+        '''
+
+        with open(path) as fptr:
+            saved = json.load(fptr)
+
+        parameters = saved['parameters']
+        plate_index = cls(
+            fuzz_size=parameters['FUZZ_SIZE'],
+            min_length=parameters['MIN_LENGTH'],
+            max_size_diff=parameters['MAX_SIZE_DIFF'],
+            match_threshold=parameters['MATCH_THRESHOLD'],
+            normalization=parameters.get('NORMALIZATION')
+            )
+
+        counts = saved.get('counts', {})
+        for plate_class in saved['classes']:
+            plates = plate_class['plates']
+            for plate in plates:
+                plate_index._add_plate(plate, counts.get(plate, 1))
+                plate_index.equivalents.union(plates[0], plate)
+            plate_index.set_canonical_plate(
+                plates[0], plate_class['canonical_plate']
+                )
+
+        plate_index._logger.info(
+            'loaded %s plates from plate index %s', len(plate_index), path
+            )
+        return plate_index
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def save(self, path):
+        '''Write the index to path.'''
+
+        classes = [
+            {
+                'canonical_plate': self.canonical_plate(min(plate_class)),
+                'plates': sorted(plate_class),
+                }
+            for plate_class in self.classes()
+            ]
+        classes.sort(key=lambda c: c['plates'][0])
+
+        self._logger.info('saving plate index to %s', path)
+        with open(path, 'w') as fptr:
+            json.dump(
+                {
+                    'parameters': self.parameters,
+                    'classes': classes,
+                    'counts': self.counts,
+                    },
+                fptr
+                )
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def __contains__(self, plate):
+        '''Check whether plate has been added to the index.'''
+        return plate in self.counts
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def __len__(self):
+        '''Return the number of distinct plates in the index.'''
+        return len(self.counts)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def _add_plate(self, plate, count):
+        '''Count plate, indexing it if it is new. Return True if new.'''
+
+        if plate in self.counts:
+            self.counts[plate] += count
+            return False
+
+        self.counts[plate] = count
+        self.equivalents.add(plate)
+        self._canonical_plate[plate] = plate
+
+        key = normalize(plate, self.normalization)
+        if key in self._key_plate:
+            return True
+        self._key_plate[key] = plate
+
+        if len(key) >= self.min_length:
+            signatures = self._signature_index.setdefault(len(key), {})
+            for signature in iter_signatures(
+                    key, self.fuzz_size, self.max_size_diff
+                    ):  # pylint: disable=bad-continuation
+                signatures.setdefault(signature, set()).add(key)
+
+            tests = self._test_index.setdefault(len(key), {})
+            for wildcard_test in build_wildcard_tests(key, self.fuzz_size):
+                tests.setdefault(wildcard_test, set()).add(key)
+
+        return True
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def _union(self, plate_a, plate_b):
+        '''Merge the classes of two plates, keeping the canonical plate
+        most_common_plate() chooses.'''
+
+        root_a = self.equivalents.find(plate_a)
+        root_b = self.equivalents.find(plate_b)
+        if root_a == root_b:
+            return
+
+        canonical_plates = [
+            self._canonical_plate.pop(root_a),
+            self._canonical_plate.pop(root_b),
+            ]
+
+        root = self.equivalents.union(root_a, root_b)
+        self._canonical_plate[root] = most_common_plate(
+            (p, self.counts.get(p, 0)) for p in canonical_plates
+            )
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def _insert(self, plate, count):
+        '''Add count occurrences of plate to the index.
+
+        Returns the list of plates a new plate matched, and the sorted
+        list of canonical plates of the classes it joined beforehand.
+        '''
+
+        if not self._add_plate(plate, count):
+            root = self.equivalents.find(plate)
+            canonical_plate = self._canonical_plate[root]
+            self._canonical_plate[root] = most_common_plate(
+                (p, self.counts.get(p, 0)) for p in [canonical_plate, plate]
+                )
+            return [], [canonical_plate]
+
+        # Plates with the same key match whether or not it is long
+        # enough to be fuzzy matched.
+        matches = set(self.scores(plate))
+        matches.add(self._key_plate[normalize(plate, self.normalization)])
+        matches.discard(plate)
+        matches = sorted(matches)
+
+        previous_canonical_plates = sorted(
+            set(self.canonical_plate(t) for t in matches)
+            )
+        for t in matches:
+            self._union(t, plate)
+
+        return matches, previous_canonical_plates
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def add(self, plate, count=1):
+        '''Add count occurrences of plate to the index.
+
+        A new plate is matched against the plates already indexed and
+        merged into the classes of those it matches. Returns the list of
+        plates it matched.
+        '''
+        return self._insert(plate, count)[0]
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def canonicalize(self, plate, count=1):
+        '''Add count occurrences of plate and report any class change.
+
+        Returns a CanonicalChange if plate started a new class, merged
+        classes, or became the canonical plate of its class, and None
+        if no plate's canonical plate changed. Only plate's candidate
+        matches are looked at, so the cost does not grow with the
+        number of plates indexed.
+        '''
+
+        _, previous_canonical_plates = self._insert(plate, count)
+        canonical_plate = self.canonical_plate(plate)
+
+        if previous_canonical_plates == [canonical_plate]:
+            return None
+
+        return CanonicalChange(
+            plate, canonical_plate, previous_canonical_plates
+            )
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def scores(self, plate):
+        '''Return { indexed plate: score } for the plates plate matches.
+
+        The score of a pair is the number of tests for one plate that
+        the other matches, whichever way round is higher. Only plates
+        scoring at least match_threshold are included. With
+        normalization rules, normalized keys are compared, and each key
+        found is reported as the first plate added with it.
+        '''
+
+        scores = {}
+        plate = normalize(plate, self.normalization)
+        if len(plate) < self.min_length:
+            return scores
+
+        lengths = range(
+            len(plate) - self.max_size_diff + 1,
+            len(plate) + self.max_size_diff
+            )
+
+        # Indexed plates matching the tests for plate.
+        forward = {}
+        wildcard_tests = build_wildcard_tests(plate, self.fuzz_size)
+        for length in lengths:
+            signatures = self._signature_index.get(length)
+            if not signatures:
+                continue
+            for wildcard_test in wildcard_tests:
+                for t in signatures.get(wildcard_test, ()):
+                    forward[t] = forward.get(t, 0) + 1
+
+        # Indexed plates with tests that plate matches.
+        reverse = {}
+        signatures = set(
+            iter_signatures(plate, self.fuzz_size, self.max_size_diff)
+            )
+        for length in lengths:
+            tests = self._test_index.get(length)
+            if not tests:
+                continue
+            for signature in signatures:
+                for t in tests.get(signature, ()):
+                    reverse[t] = reverse.get(t, 0) + 1
+
+        for t in set(forward) | set(reverse):
+            score = max(forward.get(t, 0), reverse.get(t, 0))
+            if score >= self.match_threshold:
+                scores[self._key_plate[t]] = score
+
+        return scores
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def lookup(self, plate):
+        '''Return a list of (canonical plate, score) candidates for plate.
+
+        Each canonical plate is scored with the best score of the
+        plates in its class that plate matches, and the list is sorted
+        best score first. The index is not changed.
+        '''
+
+        best_scores = {}
+        for t, score in self.scores(plate).items():
+            canonical_plate = self.canonical_plate(t)
+            best_scores[canonical_plate] = max(
+                score, best_scores.get(canonical_plate, 0)
+                )
+
+        return sorted(best_scores.items(), key=lambda c: (-c[1], c[0]))
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def classes(self):
+        '''Return the list of equivalence classes, as sets.'''
+        return self.equivalents.classes()
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def canonical_plate(self, plate):
+        '''Return the canonical plate for plate's class, or None.'''
+
+        if plate not in self.equivalents:
+            return None
+        return self._canonical_plate[self.equivalents.find(plate)]
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def set_canonical_plate(self, plate, canonical_plate):
+        '''Make canonical_plate the canonical plate for plate's class.'''
+        self._canonical_plate[self.equivalents.find(plate)] = (
+            canonical_plate
+            )
 
 
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
@@ -53,6 +707,33 @@ def argument_parser():
             '''
         )
 
+    parser.add_argument(
+        '-a', '--against',
+        metavar='FILE',
+        help='''path to a file of known strings; report the known strings
+            each input string matches instead of grouping the input
+            strings.
+            '''
+        )
+
+    parser.add_argument(
+        '-d', '--dump-scores',
+        default=False,
+        action='store_true',
+        help='''print each nonzero key, candidate score as it is found,
+            instead of the groupings.
+            '''
+        )
+
+    parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        default=1,
+        help='''number of worker processes to score strings with
+            (DEFAULT: 1).
+            '''
+        )
+
     parser.add_argument(
         '-l', '--log-path',
         default=DEFAULT_LOG_PATH,
@@ -61,6 +742,16 @@ def argument_parser():
             ''' % DEFAULT_LOG_FILE_NAME
         )
 
+    parser.add_argument(
+        '-n', '--normalize',
+        metavar='RULE',
+        action='append',
+        choices=NORMALIZATION_RULES,
+        help='''normalization rule to apply before grouping strings, one
+            of %s; may be repeated.
+            ''' % ', '.join(NORMALIZATION_RULES)
+        )
+
     parser.add_argument(
         '--no-log',
         default=False,
@@ -144,6 +835,75 @@ def log_startup_configuration(args):
         logger.debug(attr_log_entry)
 
 
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def get_parameters(normalization=()):
+    '''Return the parameters that determine which strings are equivalent.
+    '''
+
+    return {
+        'MIN_LENGTH': MIN_LENGTH,
+        'MAX_SIZE_DIFF': MAX_SIZE_DIFF,
+        'FUZZ_SIZE': FUZZ_SIZE,
+        'MATCH_THRESHOLD': MATCH_THRESHOLD,
+        'NORMALIZATION': list(normalization),
+        }
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def get_normalization_rules(rules):
+    '''Return a list of normalization rules in the order they apply.
+
+    Raises ValueError if any rule is not one of NORMALIZATION_RULES.
+    '''
+
+    rules = set(rules or ())
+    unknown_rules = rules - set(NORMALIZATION_RULES)
+    if unknown_rules:
+        raise ValueError(
+            'unknown normalization rule: %s' % ', '.join(sorted(unknown_rules))
+            )
+
+    return [rule for rule in NORMALIZATION_RULES if rule in rules]
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def normalize(targetstring, rules=NORMALIZATION_RULES):
+    '''
+    Return the key targetstring is reduced to by normalization rules,
+    which must be in the order given by get_normalization_rules():
+
+        separators: remove SEPARATORS ("537-ARV" -> "537ARV")
+        case: fold to upper case ("537arv" -> "537ARV")
+        confusables: replace CONFUSABLES ("8MZ8212" -> "8M28212")
+    '''
+
+    key = targetstring
+
+    if 'separators' in rules:
+        for separator in SEPARATORS:
+            key = key.replace(separator, '')
+
+    if 'case' in rules:
+        key = key.upper()
+
+    if 'confusables' in rules:
+        for character, replacement in CONFUSABLES.iteritems():
+            key = key.replace(character, replacement)
+
+    return key
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def most_common_plate(plate_counts):
+    '''Return the canonical plate to choose from (plate, count) pairs.
+
+    The plate with the highest count wins, and a tie goes to the plate
+    that sorts first, so the choice doesn't depend on the order plates
+    were seen or merged in.
+    '''
+    return min(plate_counts, key=lambda pc: (-pc[1], pc[0]))[0]
+
+
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
 def get_string_list_from_input_file(input_file, min_length=0):
     '''Read in the strings to process from a file.
@@ -169,178 +929,671 @@ def get_string_list_from_input_file(input_file, min_length=0):
 
 
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
-def get_match_score(string_list):
+def build_wildcard_tests(targetstring, fuzzsize):
+    '''
+    Given a starting string, return a list of (prefix, suffix) tests for
+    "near matches" to the starting string, each made by replacing
+    fuzzsize characters with a global match wildcard.
+    If fuzzsize == 3:
+    abcdefghijkl
+    ^^^
+    '''
+
+    targetlen = len(targetstring)
+    assert fuzzsize > 0
+    assert fuzzsize <= targetlen, (
+        "Target string \"%s\" too short (%s characters required)"
+        ) % (targetstring, fuzzsize)
+
+    return [
+        (targetstring[0:max(x, 0)], targetstring[x + fuzzsize:targetlen])
+        for x in range(-(fuzzsize - 1), targetlen)
+        ]
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def wildcard_match(wildcard_test, candidate):
+    '''
+    Check whether candidate matches a (prefix, suffix) wildcard test.
+
+    This behaves like re.match with "prefix.*suffix": candidate must
+    start with prefix and contain suffix somewhere after it, but suffix
+    need not be at the end of candidate.
+    '''
+
+    prefix, suffix = wildcard_test
+    return (
+        len(candidate) >= len(prefix) + len(suffix) and
+        candidate.startswith(prefix) and
+        candidate.find(suffix, len(prefix)) != -1
+        )
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def count_wildcard_matches(wildcard_tests, candidate, limit=None):
+    '''
+    Return the number of wildcard_tests that candidate matches.
+
+    If limit is given, stop counting once it has been reached.
+    '''
+
+    count = 0
+    for wildcard_test in wildcard_tests:
+        if wildcard_match(wildcard_test, candidate):
+            count += 1
+            if count == limit:
+                break
+
+    return count
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def iter_signatures(targetstring, fuzzsize, max_size_diff=MAX_SIZE_DIFF):
+    '''
+    Generate every (prefix, suffix) pair a wildcard test could use to
+    match targetstring.
+
+    A test built by build_wildcard_tests matches a candidate when the
+    candidate starts with prefix and contains suffix somewhere after
+    that (see wildcard_match). Because tests only differ from their
+    target by fuzzsize characters and lengths are limited by
+    max_size_diff, the characters a matching candidate has outside
+    prefix and suffix are bounded, so there are only a few such splits
+    of each string. The same pair may be generated more than once.
+    '''
+
+    max_slack = fuzzsize + max_size_diff - 1
+    targetlen = len(targetstring)
+
+    for prefix_len in range(targetlen + 1):
+        prefix = targetstring[0:prefix_len]
+        for gap in range(max_slack + 1):
+            suffix_start = prefix_len + gap
+            for tail in range(max_slack - gap + 1):
+                suffix_end = targetlen - tail
+                if suffix_end < suffix_start:
+                    break
+                yield prefix, targetstring[suffix_start:suffix_end]
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def build_signature_index(
+        string_list,
+        fuzzsize,
+        max_size_diff=MAX_SIZE_DIFF,
+        min_length=MIN_LENGTH
+        ):  # pylint: disable=bad-continuation
+    '''
+    Index strings by every (prefix, suffix) pair a wildcard test could use
+    to match them (see iter_signatures), so that candidates for a test
+    are found with a lookup instead of a scan of every string.
+
+    The index will look like
+    { length: { (prefix, suffix): set([strings of that length]) } }
+    '''
+
+    signature_index = {}
+    for t in string_list:
+        if len(t) < min_length:
+            continue
+
+        signatures = signature_index.setdefault(len(t), {})
+        for signature in iter_signatures(t, fuzzsize, max_size_diff):
+            signatures.setdefault(signature, set()).add(t)
+
+    return signature_index
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def get_candidates(targetstring, signature_index, fuzzsize):
+    '''
+    Return the set of indexed strings that might match targetstring.
+
+    Only strings of a comparable length sharing a signature with one of
+    targetstring's wildcard tests are returned, so the cost of a lookup
+    depends on the number of near matches rather than the number of
+    strings indexed.
+    '''
+
+    candidates = set()
+    targetlen = len(targetstring)
+
+    if targetlen < MIN_LENGTH:
+        return candidates
+
+    lengths = [
+        length for length in range(
+            targetlen - MAX_SIZE_DIFF + 1, targetlen + MAX_SIZE_DIFF
+            )
+        if length in signature_index
+        ]
+
+    for signature in build_wildcard_tests(targetstring, fuzzsize):
+        for length in lengths:
+            candidates.update(signature_index[length].get(signature, ()))
+
+    return candidates
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def build_test_index(string_list, fuzzsize, min_length=MIN_LENGTH):
+    '''
+    Index strings by their own wildcard tests, so that the strings with
+    a test a target string matches are found from the target's
+    signatures (see get_reverse_candidates).
+
+    The index will look like
+    { length: { (prefix, suffix): set([strings of that length]) } }
+    '''
+
+    test_index = {}
+    for t in string_list:
+        if len(t) < min_length:
+            continue
+
+        tests = test_index.setdefault(len(t), {})
+        for wildcard_test in build_wildcard_tests(t, fuzzsize):
+            tests.setdefault(wildcard_test, set()).add(t)
+
+    return test_index
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def get_reverse_candidates(targetstring, test_index, fuzzsize):
+    '''
+    Return the set of indexed strings with a wildcard test that
+    targetstring matches.
+
+    This is the other direction from get_candidates: a string matches a
+    test exactly when the test is one of its signatures, so only
+    targetstring's signatures are looked up.
+    '''
+
+    candidates = set()
+    targetlen = len(targetstring)
+
+    if targetlen < MIN_LENGTH:
+        return candidates
+
+    lengths = [
+        length for length in range(
+            targetlen - MAX_SIZE_DIFF + 1, targetlen + MAX_SIZE_DIFF
+            )
+        if length in test_index
+        ]
+
+    for signature in set(iter_signatures(targetstring, fuzzsize)):
+        for length in lengths:
+            candidates.update(test_index[length].get(signature, ()))
+
+    return candidates
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def _get_scoring_keys(string_list, known_list=()):
     '''
+    Return the sorted list of (index number, key) entries looked up when
+    scoring: strings in string_list are looked up in signature index 0,
+    built over all strings, and strings only in known_list in signature
+    index 1, built over string_list alone.
     '''
 
-    # regex_tests will look like
-    # { string: [tests for matchiness to string] }
-    regex_tests = {
-        s: build_regex_tests(s, FUZZ_SIZE) for s in string_list
+    string_list = set(string_list)
+    known_list = set(known_list) - string_list
+
+    keys = [(0, s) for s in string_list if len(s) >= MIN_LENGTH]
+    keys.extend((1, s) for s in known_list if len(s) >= MIN_LENGTH)
+
+    return sorted(keys)
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def _get_scoring_state(string_list, known_list=(), part=0, parts=1):
+    '''
+    Build the wildcard tests and signature indexes used for scoring.
+
+    Only part of the candidate strings are indexed: every parts-th
+    string in sorted order, starting from the part-th. Each worker
+    process builds the indexes for one part and looks up every key (see
+    _get_scoring_keys) in them, so the work of building the indexes is
+    split as well as the scoring.
+    '''
+
+    string_list = set(string_list)
+    known_list = set(known_list) - string_list
+    all_strings = string_list | known_list
+    candidates = set(sorted(all_strings)[part::parts])
+
+    # wildcard_tests will look like
+    # { string: [(prefix, suffix) tests for matchiness to string] }
+    wildcard_tests = {
+        s: build_wildcard_tests(s, FUZZ_SIZE)
+        for s in all_strings if len(s) >= MIN_LENGTH
         }
 
-    # match_score will look like
-    # { key: { candidate: # of matches to candidate among regex_tests[key] } }
-    match_score = {
-        s: {
-            t: len(
-                [r.match(t) for r in regex_tests[s] if (
-                    len(s) >= MIN_LENGTH and
-                    len(t) >= MIN_LENGTH and
-                    abs(len(s) - len(t)) < MAX_SIZE_DIFF and
-                    r.match(t) is not None
-                    )]
-                )
-            for t in string_list
-            }
-        for s in regex_tests
+    # Find the candidates for tests of new strings among all strings,
+    # and for tests of known strings among new strings only.
+    signature_indexes = [build_signature_index(candidates, FUZZ_SIZE)]
+    if known_list:
+        signature_indexes.append(
+            build_signature_index(candidates & string_list, FUZZ_SIZE)
+            )
+
+    return {
+        'wildcard_tests': wildcard_tests,
+        'signature_indexes': signature_indexes,
+        'keys': _get_scoring_keys(string_list, known_list),
         }
 
-    # print match_score
-    return match_score
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def _get_cross_scoring_state(string_list, known_list, part=0, parts=1):
+    '''
+    Build the wildcard tests and indexes used for scoring strings only
+    against known strings.
+
+    Both indexes are built over the known strings alone: the signature
+    index finds known strings matching the tests for a string, and the
+    test index finds known strings with tests the string matches. As in
+    _get_scoring_state, only the part-th of parts of the known strings
+    are indexed.
+    '''
+
+    string_list = set(string_list)
+    known_list = set(sorted(set(known_list))[part::parts])
+
+    # wildcard_tests will look like
+    # { string: [(prefix, suffix) tests for matchiness to string] }
+    wildcard_tests = {
+        s: build_wildcard_tests(s, FUZZ_SIZE)
+        for s in string_list | known_list if len(s) >= MIN_LENGTH
+        }
+
+    return {
+        'wildcard_tests': wildcard_tests,
+        'signature_indexes': [build_signature_index(known_list, FUZZ_SIZE)],
+        'test_index': build_test_index(known_list, FUZZ_SIZE),
+        'keys': _get_scoring_keys(string_list),
+        }
 
 
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
-def find_equivalence_classes(string_list):
+def _init_scoring_worker(string_list, known_list):
+    '''Keep the strings to score in each worker process.'''
+    _WORKER_STRINGS.clear()
+    _WORKER_STRINGS.update(string_list=string_list, known_list=known_list)
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def _score_part(task):
     '''
+    Return the list of results for one part of the candidate strings in
+    a worker process; task is an (iter_results, get_state, part, parts)
+    tuple (see _iter_scoring_results).
     '''
 
-    # # regex_tests will look like
-    # # { string: [tests for matchiness to string] }
-    # regex_tests = {
-    #     s: build_regex_tests(s, FUZZ_SIZE) for s in string_list
-    #     }
+    iter_results, get_state, part, parts = task
+    state = get_state(
+        _WORKER_STRINGS['string_list'],
+        _WORKER_STRINGS['known_list'],
+        part,
+        parts
+        )
+    return list(iter_results(state['keys'], state))
 
-    # # match_score will look like
-    # # {key: {
-    # #     candidate: # of matches to candidate among regex_tests[key]
-    # #     }}
-    # match_score = {
-    #     s: {
-    #         t: len(
-    #             [r.match(t) for r in regex_tests[s] if (
-    #                 len(s) >= MIN_LENGTH and
-    #                 len(t) >= MIN_LENGTH and
-    #                 abs(len(s) - len(t)) < MAX_SIZE_DIFF and
-    #                 r.match(t) is not None
-    #                 )]
-    #             )
-    #         for t in string_list
-    #         }
-    #     for s in regex_tests
-    #     }
 
-    match_score = get_match_score(string_list)
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def _iter_scoring_results(
+        iter_results,
+        get_state,
+        string_list,
+        known_list,
+        jobs
+        ):  # pylint: disable=bad-continuation
+    '''
+    Generate the (key position, candidate, result) tuples iter_results
+    generates for the keys and indexes of a scoring state from get_state,
+    in order.
+
+    If jobs is more than 1, the candidate strings are split into that
+    many parts, each indexed and scored by a worker process, and the
+    results for the parts are merged. Each candidate is in one part
+    only, so the merged results are the same as for a single part.
+    '''
 
-    # Iterate over the match_score information and create equivalence
-    # classes of strings, where A =~= B <=> A matches B or B matches A.
+    if jobs <= 1:
+        state = get_state(string_list, known_list)
+        for result in iter_results(state['keys'], state):
+            yield result
+        return
 
-    # Start with each string only equivalent to itself.
-    equivalents = {s: {s} for s in string_list}
-
-    for s in equivalents:
-        for t in match_score[s]:
-            # If t's score in s's matches is at least MATCH_THRESHOLD,
-            # merge their equivalence classes.
-            if match_score[s][t] >= MATCH_THRESHOLD:
-                # Create the merged set of equivalents.
-                merged_equivalents = equivalents[s] | equivalents[t]
-                # Assign it to all of their equivalents.
-                for e in merged_equivalents:
-                    equivalents[e] = merged_equivalents
-
-    equivalence_classes = []
-    for s in equivalents:
-        # Extract unique equivalence classes.
-
-        try:
-            for e in equivalence_classes:
-                # By symmetry, we only need check if one member of s's
-                # equivalents is already in some known equivalence class.
-                if s in e:
-                    raise AlreadyFoundEquivalenceClass
-            # We checked all current equivalence classes and didn't find a
-            # copy of s's equivalents, so we need to add it as a new class.
-            equivalence_classes.append(equivalents[s])
-
-        except AlreadyFoundEquivalenceClass:
-            # We already have a representative for s - go on to next one.
-            continue
+    pool = multiprocessing.Pool(
+        jobs, _init_scoring_worker, (string_list, known_list)
+        )
+    try:
+        part_results = pool.map(
+            _score_part,
+            [(iter_results, get_state, part, jobs) for part in range(jobs)],
+            chunksize=1
+            )
+    finally:
+        pool.terminate()
+        pool.join()
+
+    for result in heapq.merge(*part_results):
+        yield result
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def _iter_match_edges(keys, state):
+    '''
+    Generate (key position, candidate, edge) tuples for a list of (index,
+    key) entries, where edge is a (key, candidate, score) tuple, leaving
+    out zero scores and each key's score against itself.
+    '''
 
-    # for s in equivalents:
-    #     # Quick print.
-    #     if len(equivalents[s]) < 2:
-    #         continue
-    #     print "%s:\t%s" % (s, ", ".join(equivalents[s]))
-    #     # print "%s: %s" % (s, equivalents[s])
-    # print
+    signature_indexes = state['signature_indexes']
+    wildcard_tests = state['wildcard_tests']
+
+    for position, (index_number, s) in enumerate(keys):
+        candidates = get_candidates(
+            s, signature_indexes[index_number], FUZZ_SIZE
+            )
+        for t in sorted(candidates):
+            if t == s:
+                continue
 
-    return equivalence_classes
+            score = count_wildcard_matches(wildcard_tests[s], t)
+            if score:
+                yield position, t, (s, t, score)
 
 
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
-def dump(match_score):
-    # This is a quick and dirty dump.
-    for key in match_score:
-        # print "\nTESTING: %s" % key
-        for candidate in match_score[key]:
-            if match_score[key][candidate] == 0:
+def _iter_matching_pairs(keys, state):
+    '''
+    Generate (key position, candidate, pair) tuples for the matching
+    pairs found for a list of (index, key) entries.
+
+    Each unordered pair is only evaluated the first time it is found.
+    '''
+
+    signature_indexes = state['signature_indexes']
+    wildcard_tests = state['wildcard_tests']
+
+    evaluated = set()
+    for position, (index_number, s) in enumerate(keys):
+        candidates = get_candidates(
+            s, signature_indexes[index_number], FUZZ_SIZE
+            )
+        for t in sorted(candidates):
+            if t == s:
                 continue
-            if candidate == key:
+
+            pair = (s, t) if s < t else (t, s)
+            if pair in evaluated:
                 continue
-            print "%s\t%s\t%s" % (
-                str(match_score[key][candidate]),
-                key,
-                candidate
-                )
+            evaluated.add(pair)
+
+            if (
+                    count_wildcard_matches(
+                        wildcard_tests[s], t, MATCH_THRESHOLD
+                        ) >= MATCH_THRESHOLD or
+                    count_wildcard_matches(
+                        wildcard_tests[t], s, MATCH_THRESHOLD
+                        ) >= MATCH_THRESHOLD
+                    ):  # pylint: disable=bad-continuation
+                yield position, t, pair
 
 
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
-def build_regex_tests(targetstring, fuzzsize):
+def _iter_cross_matching_pairs(keys, state):
     '''
-    Given a starting string, return a list of regexes to test for "near
-    matches" to the starting string, by replacing fuzzsize characters with
-    a global match wildcard.
-    If fuzzsize == 3:
-    abcdefghijkl
-    ^^^
+    Generate (key position, known string, pair) tuples for the (key,
+    known string) matching pairs for a list of (index, key) entries,
+    using a state from _get_cross_scoring_state.
     '''
 
-    def parens_clean(a_string):
-        '''Escape parens in a string.
-        '''
-        return a_string.replace('(', '\(').replace(')', '\)')
+    signature_index = state['signature_indexes'][0]
+    test_index = state['test_index']
+    wildcard_tests = state['wildcard_tests']
+
+    for position, (_, s) in enumerate(keys):
+        candidates = get_candidates(s, signature_index, FUZZ_SIZE)
+        candidates.update(get_reverse_candidates(s, test_index, FUZZ_SIZE))
+        for t in sorted(candidates):
+            if (
+                    count_wildcard_matches(
+                        wildcard_tests[s], t, MATCH_THRESHOLD
+                        ) >= MATCH_THRESHOLD or
+                    count_wildcard_matches(
+                        wildcard_tests[t], s, MATCH_THRESHOLD
+                        ) >= MATCH_THRESHOLD
+                    ):  # pylint: disable=bad-continuation
+                yield position, t, (s, t)
 
-    targetlen = len(targetstring)
-    assert fuzzsize > 0
-    assert fuzzsize <= targetlen, (
-        "Target string \"%s\" too short (%s characters required)"
-        ) % (targetstring, fuzzsize)
 
-    regex_tests = []
-    # for posn in range(targetlen - fuzzsize + 1):
-    for posn in map(lambda x: x - 1, range(targetlen - fuzzsize + 3)):
-        new_regex_test = re.compile(r'.*'.join([
-            parens_clean(targetstring[0:max(posn, 0)]),
-            parens_clean(targetstring[posn + 2:targetlen])
-            ]))
-
-    for (prefix, suffix) in [
-            [
-                targetstring[0:max(x, 0)],
-                targetstring[x + fuzzsize:len(targetstring)]
-                ]
-            for x in range(-(fuzzsize - 1), len(targetstring))
-            ]:  # pylint: disable=bad-continuation
-        new_regex_test = re.compile(
-            r'.*'.join([
-                parens_clean(prefix),
-                parens_clean(suffix)
-                ])
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def iter_match_edges(string_list, jobs=1):
+    '''
+    Generate (key, candidate, score) edges, where score is the number of
+    tests for key that candidate matches.
+
+    Only edges with a nonzero score between distinct strings are
+    generated, and candidates are drawn from a signature index instead
+    of the full string list, so nothing proportional to the square of
+    the number of strings is ever held in memory.
+
+    If jobs is more than 1, the candidate strings are split across that
+    many worker processes, each building the index for its share. Edges
+    are generated in the same order whatever the number of workers.
+    '''
+
+    for _, _, edge in _iter_scoring_results(
+            _iter_match_edges, _get_scoring_state, list(string_list), [], jobs
+            ):  # pylint: disable=bad-continuation
+        yield edge
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def get_match_score(string_list, jobs=1):
+    '''
+    Return the dense match_score dict for every pair of strings.
+
+    This is kept for callers that want the whole score table; it takes
+    memory proportional to the square of the number of strings, so use
+    iter_match_edges for anything but small string lists.
+    '''
+
+    string_list = list(string_list)
+
+    # match_score will look like
+    # { key: { candidate: # of matches to candidate among tests for key } }
+    match_score = {s: dict.fromkeys(string_list, 0) for s in string_list}
+    for s in string_list:
+        if len(s) >= MIN_LENGTH:
+            # Every test for a string matches the string itself.
+            match_score[s][s] = len(build_wildcard_tests(s, FUZZ_SIZE))
+
+    for key, candidate, score in iter_match_edges(string_list, jobs=jobs):
+        match_score[key][candidate] = score
+
+    return match_score
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def _iter_normalized_pairs(string_list, known_list, rules, jobs):
+    '''
+    Generate (key, candidate) pairs of strings that are equivalent once
+    normalized by rules, linking each string to the first string with
+    the same key and fuzzy matching only those first strings.
+    '''
+
+    # { normalized key: first string with that key }
+    known_keys = {}
+    for s in known_list:
+        known_keys.setdefault(normalize(s, rules), s)
+
+    new_keys = {}
+    for s in string_list:
+        key = normalize(s, rules)
+        if key in known_keys:
+            first_string = known_keys[key]
+        else:
+            first_string = new_keys.setdefault(key, s)
+        if first_string != s:
+            yield (s, first_string) if s < first_string else (first_string, s)
+
+    first_strings = dict(known_keys)
+    first_strings.update(new_keys)
+    for key_a, key_b in get_matching_pairs(
+            list(new_keys), list(known_keys), jobs=jobs
+            ):  # pylint: disable=bad-continuation
+        s, t = first_strings[key_a], first_strings[key_b]
+        yield (s, t) if s < t else (t, s)
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def get_matching_pairs(
+        string_list,
+        known_list=(),
+        jobs=1,
+        normalization=None
+        ):  # pylint: disable=bad-continuation
+    '''
+    Generate (key, candidate) pairs of distinct matching strings.
+
+    A pair matches if either string has at least MATCH_THRESHOLD tests
+    the other matches. Each unordered pair is evaluated only once, and
+    counting stops as soon as the threshold is reached.
+
+    Strings in known_list are assumed to have already been compared with
+    each other, so only pairs including at least one string from
+    string_list are generated.
+
+    If jobs is more than 1, the candidate strings are split across that
+    many worker processes, each building the indexes for its share.
+    Pairs are generated in the same order whatever the number of
+    workers.
+
+    If normalization rules (see NORMALIZATION_RULES) are given, strings
+    with the same normalized key are paired up front, and only their
+    keys are fuzzy matched.
+    '''
+
+    string_list = list(string_list)
+    known_list = list(known_list)
+
+    normalization = get_normalization_rules(normalization)
+    if normalization:
+        for pair in _iter_normalized_pairs(
+                string_list, known_list, normalization, jobs
+                ):  # pylint: disable=bad-continuation
+            yield pair
+        return
+
+    matching_pairs = set()
+    for _, _, pair in _iter_scoring_results(
+            _iter_matching_pairs,
+            _get_scoring_state,
+            string_list,
+            known_list,
+            jobs
+            ):  # pylint: disable=bad-continuation
+        # A pair may be found from both of its strings, by different
+        # workers.
+        if pair not in matching_pairs:
+            matching_pairs.add(pair)
+            yield pair
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def get_cross_matching_pairs(
+        string_list,
+        known_list,
+        jobs=1,
+        normalization=None
+        ):  # pylint: disable=bad-continuation
+    '''
+    Generate (string, known string) pairs matching a string in
+    string_list with one in known_list.
+
+    Only pairs across the two lists are scored. Candidates are looked up
+    in indexes built over known_list, so after building them the cost
+    depends on the number of strings in string_list and their near
+    matches, not on comparing every string with every other. A string
+    in both lists is paired with itself.
+
+    Pairs are generated in string order whatever the number of workers
+    (jobs). If normalization rules (see NORMALIZATION_RULES) are given,
+    normalized keys are matched instead, and every string is paired with
+    each known string whose key matches its key.
+    '''
+
+    string_list = list(string_list)
+    known_list = list(known_list)
+
+    normalization = get_normalization_rules(normalization)
+    if normalization:
+        # { normalized key: [strings with that key] }
+        strings = {}
+        for s in string_list:
+            strings.setdefault(normalize(s, normalization), []).append(s)
+        known_strings = {}
+        for t in known_list:
+            known_strings.setdefault(
+                normalize(t, normalization), []
+                ).append(t)
+
+        pairs = sorted(
+            (s, t)
+            for key, known_key in get_cross_matching_pairs(
+                list(strings), list(known_strings), jobs
+                )
+            for s in strings[key]
+            for t in known_strings[known_key]
+            )
+        for pair in pairs:
+            yield pair
+        return
+
+    for _, _, pair in _iter_scoring_results(
+            _iter_cross_matching_pairs,
+            _get_cross_scoring_state,
+            string_list,
+            known_list,
+            jobs
+            ):  # pylint: disable=bad-continuation
+        yield pair
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def find_equivalence_classes(
+        string_list, jobs=1, normalization=None
+        ):  # pylint: disable=bad-continuation
+    '''
+    Return a list of sets of strings, where A =~= B <=> A matches B or B
+    matches A, or A and B have the same key under normalization rules.
+    '''
+
+    # Start with each string only equivalent to itself.
+    string_list = list(string_list)
+    equivalents = DisjointSet(string_list)
+    equivalents.union_all(
+        get_matching_pairs(
+            string_list,
+            jobs=jobs,
+            normalization=normalization
             )
-        regex_tests.append(new_regex_test)
+        )
+
+    return equivalents.classes()
 
-    return regex_tests
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def dump(match_edges):
+    '''Print (key, candidate, score) edges as they are generated.'''
+    for key, candidate, score in match_edges:
+        print "%s\t%s\t%s" % (str(score), key, candidate)
 
 
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
@@ -356,7 +1609,31 @@ def main():
 
     string_list = get_string_list_from_input_file(args.input_file)
 
-    for e in find_equivalence_classes(string_list):
+    if args.dump_scores:
+        dump(iter_match_edges(string_list, jobs=args.jobs))
+        return
+
+    if args.against:
+        known_list = get_string_list_from_input_file(args.against)
+        for s, pairs in itertools.groupby(
+                get_cross_matching_pairs(
+                    string_list,
+                    known_list,
+                    jobs=args.jobs,
+                    normalization=args.normalize
+                    ),
+                key=lambda pair: pair[0]
+                ):  # pylint: disable=bad-continuation
+            print "\t".join([s] + [pair[1] for pair in pairs])
+        return
+
+    for e in sorted(
+            sorted(e) for e in find_equivalence_classes(
+                string_list,
+                jobs=args.jobs,
+                normalization=args.normalize
+                )
+            ):  # pylint: disable=bad-continuation
         if len(e) > 1:
             print "\t".join(e)
 
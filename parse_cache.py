@@ -0,0 +1,236 @@
+'''A cache of dashboard data, keyed by log file contents and options.
+
+The same log is often processed more than once: S3 events are
+delivered again, and operators upload the same file twice. A ParseCache
+keeps the dashboard data, and optionally the record table, from each
+parse in a directory, as gzipped JSON, under a key made from a SHA-256
+digest of the log files' bytes and of the options that change the
+result. A cache hit then costs a read of the files and of one small
+entry instead of a parse. Entries are dropped least recently used
+first once the directory holds more than max_bytes of them.
+
+Parses that use a plate store aren't cached, since their result also
+depends on the store, which each parse updates.
+'''
+
+import gzip
+import hashlib
+import json
+import logging
+# Set default logging handler to avoid "No handler found" warnings.
+try:  # Python 2.7+
+    from logging import NullHandler
+except ImportError:
+    class NullHandler(logging.Handler):
+        '''Placeholder handler.'''
+        def emit(self, record):
+            pass
+import os
+import tempfile
+
+import csv_parking_log
+import matchiness
+from record_table import RecordTable
+
+logging.getLogger(__name__).addHandler(NullHandler())
+
+# The version of the cache entry format, and of how dashboard data is
+# made; entries made with another are never found.
+CACHE_VERSION = 1
+
+# The default limit on the total size of a cache's entries, in bytes.
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# The suffix of cache entry files.
+ENTRY_SUFFIX = '.json.gz'
+
+# The number of bytes of a log file to hash at a time.
+READ_BLOCK_SIZE = 1024 * 1024
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def file_digest(filepath):
+    '''Return the SHA-256 digest of a file's bytes, as a hex string.'''
+
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as fptr:
+        for block in iter(lambda: fptr.read(READ_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def cache_key(filepaths, parser_options):
+    '''Return the cache key for parsing log files with parser options.
+
+    Arguments:
+
+        filepaths (list):
+            The log file paths, in the order they are parsed.
+
+        parser_options (dict):
+            The ``csv_parking_log.LogParser`` arguments used. Those
+            that don't change the dashboard data, e.g. jobs or
+            columnar, are ignored.
+
+    Only the dates in the file names, which bound the valid log dates,
+    go into the key along with the files' contents, so the same file
+    downloaded to a new path has the same key.
+
+    Raises:
+
+        ValueError: if ``plate_store_path`` is passed; see the module
+        docstring.
+
+    '''
+    # pylint: disable=protected-access
+
+    if parser_options.get('plate_store_path'):
+        raise ValueError('parses using a plate store are not cached')
+
+    normalization = matchiness.get_normalization_rules(
+        parser_options.get('normalization')
+        )
+    windows = parser_options.get('windows')
+    if windows is None:
+        windows = csv_parking_log.DEFAULT_WINDOWS
+
+    key_values = {
+        'version': CACHE_VERSION,
+        'files': [file_digest(filepath) for filepath in filepaths],
+        'max_valid_refdt_offset': max(
+            csv_parking_log._get_latest_valid_refdt_offset(
+                os.path.basename(filepath)
+                )
+            for filepath in filepaths
+            ),
+        'start_date': parser_options.get('start_date'),
+        'end_date': parser_options.get('end_date'),
+        'days': parser_options.get('days'),
+        'incremental': bool(parser_options.get('incremental')),
+        'matching': matchiness.get_parameters(normalization),
+        'windows': [list(window) for window in windows],
+        }
+
+    return hashlib.sha256(
+        json.dumps(key_values, sort_keys=True)
+        ).hexdigest()
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+class ParseCache(object):
+    '''A directory of dashboard data from parsed logs.
+
+    Arguments:
+
+        directory (str):
+            The cache directory; it is created if it doesn't exist.
+
+        max_bytes (int, optional):
+            The most bytes of entries to keep. Least recently used
+            entries are removed once there are more.
+
+    '''
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        '''Initialize one ParseCache instance.'''
+
+        logger_name = '%s.%s' % (__name__, self.__class__.__name__)
+        self._logger = logging.getLogger(logger_name)
+
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def entry_path(self, key):
+        '''Return the path of the entry for key.'''
+        return os.path.join(self.directory, key + ENTRY_SUFFIX)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def get(self, key, record_table=False):
+        '''Return the cached (dashboard data, record table) for key.
+
+        The record table is None unless record_table is True. None is
+        returned if there is no entry for key, or, if record_table is
+        True, if the entry was saved without one.
+        '''
+
+        path = self.entry_path(key)
+        try:
+            with gzip.open(path, 'rb') as fptr:
+                entry = json.load(fptr)
+        except (IOError, ValueError) as err:
+            if os.path.exists(path):
+                self._logger.warning(
+                    'ignoring unreadable cache entry %s: %s', path, err
+                    )
+            return None
+
+        table = None
+        if record_table:
+            if entry.get('record_table') is None:
+                self._logger.info('cache entry %s has no record table', key)
+                return None
+            table = RecordTable.from_dict(entry['record_table'])
+
+        # Using an entry makes it the most recently used.
+        os.utime(path, None)
+
+        self._logger.info('cache hit for %s', key)
+        return entry['dashboard_data'], table
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def put(self, key, dashboard_data, record_table=None):
+        '''Save the dashboard data, and record table if any, for key.
+
+        Least recently used entries are then removed to bring the
+        cache within max_bytes.
+        '''
+
+        entry = {
+            'dashboard_data': dashboard_data,
+            'record_table': (
+                record_table.to_dict() if record_table is not None else None
+                ),
+            }
+
+        # Write to a temporary file first, so readers never see part of
+        # an entry.
+        fdesc, tmp_path = tempfile.mkstemp(
+            dir=self.directory, suffix='.tmp'
+            )
+        try:
+            with os.fdopen(fdesc, 'wb') as raw_fptr:
+                with gzip.GzipFile(fileobj=raw_fptr, mode='wb') as fptr:
+                    json.dump(entry, fptr, separators=(',', ':'))
+            os.rename(tmp_path, self.entry_path(key))
+        except Exception:
+            os.remove(tmp_path)
+            raise
+
+        self._logger.info('cached %s', key)
+        self.evict()
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def evict(self):
+        '''Remove least recently used entries until within max_bytes.'''
+
+        entries = []
+        for filename in os.listdir(self.directory):
+            if not filename.endswith(ENTRY_SUFFIX):
+                continue
+            path = os.path.join(self.directory, filename)
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            self._logger.info('evicting cache entry %s', path)
+            os.remove(path)
+            total_bytes -= size
@@ -0,0 +1,188 @@
+'''Checkpoints of append-only parking logs, for parsing only new rows.
+
+Each week's log is the week before's plus new rows. A ParseCheckpoint
+saves how much of a log has been parsed: the number of rows, the
+position in the file just after them (see csv_reader.csv_row_position()
+and xlsx_reader.sheet_row_position()), and the records created from
+them. On the next run the log's reader checks the bytes before that
+position against their digest and reads only the rows after it, so the
+rows parsed before aren't read again; a log whose parsed rows have been
+edited is parsed again from the start.
+
+Records are kept as they are read, before date bounds are applied or
+plates canonicalized, so a checkpoint serves whatever bounds and
+matching options a run uses. They are saved a column at a time, each
+column dictionary encoded as a RecordTable's are, so each distinct value
+is saved once.
+'''
+
+import itertools
+import json
+import logging
+# Set default logging handler to avoid "No handler found" warnings.
+try:  # Python 2.7+
+    from logging import NullHandler
+except ImportError:
+    class NullHandler(logging.Handler):
+        '''Placeholder handler.'''
+        def emit(self, record):
+            pass
+import os
+
+logging.getLogger(__name__).addHandler(NullHandler())
+
+# The version of the checkpoint format, and of how records are read
+# from rows; checkpoints saved with another are discarded.
+CHECKPOINT_VERSION = 3
+
+# The suffix csv_parking.py gives a checkpoint saved next to its output.
+CHECKPOINT_SUFFIX = '.checkpoint'
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def _encode_columns(rows):
+    '''Return rows of values as a list of dictionary encoded columns.
+
+    Each column is a (values, codes) pair, codes being the index of
+    each row's value in values.
+    '''
+
+    columns = []
+    for column in itertools.izip(*rows):
+        codes = {}
+        column_codes = [
+            codes.setdefault(value, len(codes)) for value in column
+            ]
+        columns.append((sorted(codes, key=codes.get), column_codes))
+    return columns
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def _decode_columns(columns):
+    '''Return the rows of values in _encode_columns() columns.'''
+    return zip(*[
+        [values[code] for code in codes] for values, codes in columns
+        ])
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+class ParseCheckpoint(object):
+    '''How much of a log has been parsed, and the records created.
+
+    Arguments:
+
+        path (str, optional):
+            The path of the JSON file the checkpoint is saved to.
+
+    '''
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def __init__(self, path=None):
+        '''Initialize an empty ParseCheckpoint instance.'''
+
+        logger_name = '%s.%s' % (__name__, self.__class__.__name__)
+        self._logger = logging.getLogger(logger_name)
+
+        self.path = path
+        self.parameters = {'version': CHECKPOINT_VERSION}
+
+        # What the rows were read from, e.g. 'sheet Sheet1', and the
+        # log version of their header row.
+        self.rows_source = None
+        self.log_version = None
+
+        # The number of rows parsed, and the reader's position just
+        # after them, or None if rows appended can't be found from it.
+        self.row_count = 0
+        self.position = None
+
+        # The LogParser rows_parsed, header_rows_skipped and
+        # rows_inprocessed counts for the rows.
+        self.row_counts = [0, 0, 0]
+
+        # The records created from the rows, as tuples of values; see
+        # csv_parking_log.RECORD_FIELDS.
+        self.records = []
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    @classmethod
+    def load(cls, path):
+        '''Return the checkpoint saved at path, or an empty one.
+
+        An empty checkpoint is returned if there is no file at path or
+        if it was saved with different parameters.
+        '''
+
+        checkpoint = cls(path)
+
+        if not os.path.exists(path):
+            checkpoint._logger.info('no checkpoint found at %s', path)
+            return checkpoint
+
+        with open(path) as fptr:
+            saved = json.load(fptr)
+
+        if saved.get('parameters') != checkpoint.parameters:
+            checkpoint._logger.info(
+                'discarding checkpoint %s saved with parameters %s',
+                path, saved.get('parameters')
+                )
+            return checkpoint
+
+        for attr in [
+                'rows_source', 'log_version', 'row_count', 'position',
+                'row_counts',
+                ]:  # pylint: disable=bad-continuation
+            setattr(checkpoint, attr, saved[attr])
+        checkpoint.records = _decode_columns(saved['records'])
+
+        checkpoint._logger.info(
+            'loaded checkpoint %s: %s rows, %s records',
+            path, checkpoint.row_count, len(checkpoint.records)
+            )
+        return checkpoint
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def save(self, path=None):
+        '''Write the checkpoint to path, or to the path it was loaded from.
+        '''
+
+        path = path or self.path
+
+        self._logger.info('saving checkpoint to %s', path)
+
+        # Encoding the whole checkpoint at once is much faster than
+        # json.dump(), which writes it a piece at a time.
+        checkpoint_json = json.dumps({
+            'parameters': self.parameters,
+            'rows_source': self.rows_source,
+            'log_version': self.log_version,
+            'row_count': self.row_count,
+            'position': self.position,
+            'row_counts': self.row_counts,
+            'records': _encode_columns(self.records),
+            })
+        with open(path, 'w') as fptr:
+            fptr.write(checkpoint_json)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def reset(self, rows_source):
+        '''Forget the rows and records, to parse rows_source from the start.
+        '''
+
+        self.rows_source = rows_source
+        self.log_version = None
+        self.row_count = 0
+        self.position = None
+        self.row_counts = [0, 0, 0]
+        self.records = []
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def parsed_position(self, rows_source):
+        '''Return the position after the rows parsed from rows_source, or
+        None if there is none and the log must be parsed from the start.
+        '''
+
+        if rows_source != self.rows_source or not self.row_count:
+            return None
+        return self.position
@@ -0,0 +1,425 @@
+'''A columnar table of parking log records.
+
+LogParser keeps its records as LogRecord objects, which suits building
+the dashboard but makes every aggregation a loop over objects. A
+RecordTable holds the same records as a struct of arrays: an integer
+column for the refdt offset and one for each of the record type,
+plate, canonical plate, make, model, color and location, which are
+dictionary encoded. Aggregations can then work on whole columns.
+
+With NumPy installed the columns are the rows of one two dimensional
+int32 array, so they are handed out as NumPy arrays, or as a pandas
+DataFrame, without copying. Otherwise they are array.array columns.
+'''
+
+import array
+import operator
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import pandas
+except ImportError:
+    pandas = None
+
+import window_totals
+
+COLUMNS = (
+    'refdt_offset', 'record_type', 'plate', 'canonical_plate',
+    'make', 'model', 'color', 'location',
+    )
+
+# The dictionary each text column is encoded with. Plates and canonical
+# plates share one, so their codes can be compared.
+DICTIONARY_BY_COLUMN = {
+    'record_type': 'record_type',
+    'plate': 'plate',
+    'canonical_plate': 'plate',
+    'make': 'make',
+    'model': 'model',
+    'color': 'color',
+    'location': 'location',
+    }
+
+# The code for a missing value, e.g. a canonical plate not yet set.
+NO_CODE = -1
+
+ARRAY_TYPECODE = 'i'
+NUMPY_DTYPE = 'int32'
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+class TextDictionary(object):
+    '''Dictionary encoding of text values as consecutive integer codes.
+
+    The code for a value is its index in ``values``; None is encoded
+    as NO_CODE.
+    '''
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def __init__(self):
+        '''Initialize one TextDictionary instance.'''
+
+        # The values encoded, by code.
+        self.values = []
+
+        # The codes, by value.
+        self.codes = {}
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def __len__(self):
+        return len(self.values)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def encode(self, value):
+        '''Return the code for value, adding value if it is new.'''
+
+        if value is None:
+            return NO_CODE
+        try:
+            return self.codes[value]
+        except KeyError:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+            return code
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def decode(self, code):
+        '''Return the value for code.'''
+        return None if code == NO_CODE else self.values[code]
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+class RecordTable(object):
+    '''A struct of arrays holding log records.
+
+    Records are added with ``append()`` or ``extend()``, and their
+    canonical plates can be set afterwards with
+    ``set_canonical_plates()``. The arrays ``column()``, ``to_numpy()``
+    and ``to_dataframe()`` return share memory with the table, so they
+    should be treated as read only, and they don't see records added
+    later.
+
+    Arguments:
+
+        log_records (iterable, optional):
+            ``LogRecord`` instances to fill the table with.
+
+    '''
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def __init__(self, log_records=None):
+        '''Initialize one RecordTable instance.'''
+
+        # The text dictionaries, by name; see DICTIONARY_BY_COLUMN.
+        self.dictionaries = dict(
+            (name, TextDictionary())
+            for name in set(DICTIONARY_BY_COLUMN.values())
+            )
+
+        # For each column, a record's value and the function encoding
+        # it, if it's text.
+        self._column_getters = [
+            (
+                operator.attrgetter(name),
+                self.dictionaries[DICTIONARY_BY_COLUMN[name]].encode
+                if name in DICTIONARY_BY_COLUMN else None
+                )
+            for name in COLUMNS
+            ]
+
+        self._size = 0
+        if numpy is not None:
+            # Each column is a row, so slices of a row are contiguous.
+            self._block = numpy.empty((len(COLUMNS), 0), dtype=NUMPY_DTYPE)
+        else:
+            self._columns = [array.array(ARRAY_TYPECODE) for _ in COLUMNS]
+
+        if log_records is not None:
+            self.extend(log_records)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def __len__(self):
+        return self._size
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def to_dict(self):
+        '''Return the table as a dictionary of plain lists.
+
+        Columns hold codes, so each text value is written once, in its
+        dictionary's values.
+        '''
+
+        return {
+            'columns': dict(
+                (name, [int(code) for code in self.column(name)])
+                for name in COLUMNS
+                ),
+            'dictionaries': dict(
+                (name, list(dictionary.values))
+                for name, dictionary in self.dictionaries.items()
+                ),
+            }
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    @classmethod
+    def from_dict(cls, table_dict):
+        '''Return a table made from a ``to_dict()`` dictionary.'''
+
+        table = cls()
+
+        for name, values in table_dict['dictionaries'].items():
+            dictionary = table.dictionaries[name]
+            dictionary.values = list(values)
+            dictionary.codes = dict(
+                (value, code) for code, value in enumerate(values)
+                )
+
+        columns = [table_dict['columns'][name] for name in COLUMNS]
+        table._size = len(columns[0])
+        if numpy is not None:
+            table._block = numpy.array(columns, dtype=NUMPY_DTYPE)
+        else:
+            table._columns = [
+                array.array(ARRAY_TYPECODE, column) for column in columns
+                ]
+
+        return table
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def _reserve(self, size):
+        '''Make room in the NumPy block for size records.'''
+
+        if size > self._block.shape[1]:
+            # Grow geometrically, so adding records a few at a time
+            # copies each only a few times.
+            block = numpy.empty(
+                (len(COLUMNS), max(size, 2 * self._block.shape[1])),
+                dtype=NUMPY_DTYPE
+                )
+            block[:, :self._size] = self._block[:, :self._size]
+            self._block = block
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def append(self, log_record):
+        '''Add a log record to the table.'''
+
+        values = [
+            get(log_record) if encode is None else encode(get(log_record))
+            for get, encode in self._column_getters
+            ]
+
+        if numpy is not None:
+            self._reserve(self._size + 1)
+            self._block[:, self._size] = values
+        else:
+            for column, value in zip(self._columns, values):
+                column.append(value)
+
+        self._size += 1
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def extend(self, log_records):
+        '''Add log records to the table.'''
+
+        log_records = list(log_records)
+        if not log_records:
+            return
+
+        column_values = []
+        for get, encode in self._column_getters:
+            values = map(get, log_records)
+            if encode is not None:
+                values = map(encode, values)
+            column_values.append(values)
+
+        start, end = self._size, self._size + len(log_records)
+        if numpy is not None:
+            self._reserve(end)
+            for column_num, values in enumerate(column_values):
+                self._block[column_num, start:end] = values
+        else:
+            for column, values in zip(self._columns, column_values):
+                column.extend(values)
+
+        self._size = end
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def set_canonical_plates(self, canonical_plates):
+        '''Set each record's canonical plate from its plate.
+
+        Arguments:
+
+            canonical_plates (dict):
+                The canonical plate, by plate. Records with a plate
+                that isn't a key are left without one.
+
+        '''
+
+        dictionary = self.dictionaries['plate']
+        canonical_codes = [
+            dictionary.encode(canonical_plates.get(plate))
+            for plate in list(dictionary.values)
+            ]
+
+        plate_codes = self.column('plate')
+        column_num = COLUMNS.index('canonical_plate')
+        if numpy is not None:
+            self._block[column_num, :self._size] = numpy.array(
+                canonical_codes, dtype=NUMPY_DTYPE
+                )[plate_codes]
+        else:
+            self._columns[column_num] = array.array(
+                ARRAY_TYPECODE, [canonical_codes[c] for c in plate_codes]
+                )
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def column(self, name):
+        '''Return a column's values: a NumPy array, or an array.array.
+
+        Text columns hold codes; see ``decode_column()``.
+        '''
+
+        column_num = COLUMNS.index(name)
+        if numpy is not None:
+            return self._block[column_num, :self._size]
+        return self._columns[column_num]
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def decode_column(self, name):
+        '''Return a text column's values as a list of text.'''
+
+        decode = self.dictionaries[DICTIONARY_BY_COLUMN[name]].decode
+        return [decode(code) for code in self.column(name)]
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def to_numpy(self):
+        '''Return a dict of the columns, by name, as NumPy arrays.'''
+
+        if numpy is None:
+            raise ImportError('RecordTable.to_numpy requires numpy')
+
+        return dict((name, self.column(name)) for name in COLUMNS)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def to_dataframe(self):
+        '''Return the table as a pandas DataFrame.
+
+        Text columns hold codes, as in ``column()``. The columns are
+        all int32, so the DataFrame is a single block over the table's
+        array.
+        '''
+
+        if pandas is None or numpy is None:
+            raise ImportError('RecordTable.to_dataframe requires pandas')
+
+        return pandas.DataFrame(
+            self._block[:, :self._size].T, columns=list(COLUMNS), copy=False
+            )
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def plate_days(self, record_types=None):
+        '''Find the days each canonical plate was logged.
+
+        Arguments:
+
+            record_types (iterable, optional):
+                The record types to count; by default, all of them.
+
+        Returns a (canonical plate codes, refdt offsets) pair of
+        equal length sequences, holding each distinct pair once,
+        sorted by canonical plate code and then offset.
+        '''
+
+        record_type_codes = None
+        if record_types is not None:
+            codes = self.dictionaries['record_type'].codes
+            record_type_codes = [
+                codes[record_type] for record_type in record_types
+                if record_type in codes
+                ]
+
+        canonical_plates = self.column('canonical_plate')
+        offsets = self.column('refdt_offset')
+
+        if numpy is None:
+            pairs = zip(canonical_plates, offsets)
+            if record_type_codes is not None:
+                record_type_codes = set(record_type_codes)
+                pairs = [
+                    pair for pair, code
+                    in zip(pairs, self.column('record_type'))
+                    if code in record_type_codes
+                    ]
+            pairs = sorted(set(pairs))
+            return [p for p, _ in pairs], [o for _, o in pairs]
+
+        if record_type_codes is not None:
+            selected = numpy.in1d(
+                self.column('record_type'), record_type_codes
+                )
+            canonical_plates = canonical_plates[selected]
+            offsets = offsets[selected]
+        if not len(offsets):
+            return canonical_plates, offsets
+
+        # Pack each pair into one sortable key.
+        low = int(offsets.min())
+        span = int(offsets.max()) - low + 1
+        keys = numpy.unique(
+            canonical_plates.astype(numpy.int64) * span + (offsets - low)
+            )
+        return (
+            (keys // span).astype(NUMPY_DTYPE),
+            (keys % span + low).astype(NUMPY_DTYPE)
+            )
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def plate_day_counts(self, days, record_types=None):
+        '''Count the days each canonical plate was logged in trailing
+        windows.
+
+        Arguments:
+
+            days (int):
+                The number of days in each window, ending on (and
+                including) the day counted for.
+
+            record_types (iterable, optional):
+                The record types to count; by default, all of them.
+
+        Returns a (canonical plate codes, refdt offsets, counts) tuple
+        of equal length sequences: the pairs ``plate_days()`` returns,
+        and for each the number of days its plate was logged in the
+        window ending on its offset.
+        '''
+
+        plates, offsets = self.plate_days(record_types)
+
+        if numpy is None:
+            counts = []
+            start = 0
+            for end in range(len(plates) + 1):
+                if end == len(plates) or plates[end] != plates[start]:
+                    counts.extend(window_totals.trailing_window_counts(
+                        offsets[start:end], [True] * (end - start), days
+                        ))
+                    start = end
+            return plates, offsets, counts
+
+        if not len(offsets):
+            return plates, offsets, numpy.zeros(0, dtype=NUMPY_DTYPE)
+
+        # Pack each pair into one key, leaving a gap of days between
+        # plates so no window reaches back into the plate before.
+        low = int(offsets.min())
+        span = int(offsets.max()) - low + days
+        keys = plates.astype(numpy.int64) * span + (offsets - low)
+        window_starts = numpy.searchsorted(keys, keys - (days - 1))
+        return (
+            plates, offsets,
+            (numpy.arange(len(keys)) - window_starts + 1).astype(NUMPY_DTYPE)
+            )
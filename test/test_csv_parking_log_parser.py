@@ -5,12 +5,18 @@ test_csv_parking_log_parser.py
 Test cases for the csv_parking_record.LogParser class.
 '''
 
+import os
+import shutil
+import tempfile
 import unittest
 from zipfile import BadZipfile
 
 from xlrd import XLRDError
 
 import csv_parking_log
+import csv_reader
+import matchiness
+import xlsx_reader
 # from csv_parking_log import CsvParkingLogStructureError
 
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
@@ -51,6 +57,13 @@ class TestLogParser(unittest.TestCase):
                 end_date="2016-01-31"
                 )
 
+        with self.assertRaises(ValueError):
+            _ = csv_parking_log.LogParser(
+                filepath='empty.txt',
+                plate_store_path='plate_store.json',
+                incremental=True
+                )
+
     # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
     def test_csv_parking_log_parser_init(self):
         '''Test initialization of a LogParser instance.
@@ -380,6 +393,401 @@ class TestLogParser(unittest.TestCase):
         self.assertEqual(log_parser.records_out_of_date, 0)
         self.assertEqual(log_parser.records_inprocessed, 5389)
 
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_csv_parking_log_parser_parse_normalization(self):
+        '''Test LogParser.parse with plate normalization rules.
+        '''
+        # pylint: disable=protected-access
+
+        log_parser = csv_parking_log.LogParser(
+            filepath='sample_log_reaL20170202.xlsx',
+            normalization=['separators', 'case', 'confusables']
+            )
+        log_parser.parse()
+
+        self.assertEqual(log_parser.plates_found, 1577)
+        self.assertEqual(log_parser.normalized_plates_found, 1568)
+        self.assertEqual(len(log_parser._canonical_plate_index), 1206)
+
+        canonical_plates = {}
+        for log_record in log_parser.log_records:
+            self.assertEqual(
+                canonical_plates.setdefault(
+                    matchiness.normalize(
+                        log_record.plate, log_parser.normalization
+                        ),
+                    log_record.canonical_plate
+                    ),
+                log_record.canonical_plate
+                )
+
+        with self.assertRaises(ValueError):
+            _ = csv_parking_log.LogParser(
+                filepath='empty.txt', normalization=['soundex']
+                )
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_csv_parking_log_parser_parse_csv(self):
+        '''Test LogParser.parse with logs exported as CSV and TSV.
+        '''
+
+        xlsx_parser = csv_parking_log.LogParser(
+            filepath='sample_log_reaL20170202.xlsx', days=91
+            )
+        xlsx_parser.parse()
+
+        tempdir = tempfile.mkdtemp()
+        try:
+            # Keep the date in the name; it bounds the valid dates.
+            csv_path = os.path.join(tempdir, 'sample_log_reaL20170202.csv')
+            # No extension to go on, so the delimiter is sniffed.
+            tsv_path = os.path.join(tempdir, 'sample_log_reaL20170202.log')
+
+            rows = list(
+                xlsx_reader.iter_sheet_rows('sample_log_reaL20170202.xlsx')
+                )
+            csv_reader.write_csv_rows(rows, csv_path)
+            csv_reader.write_csv_rows(rows, tsv_path, delimiter='\t')
+
+            for filepath in [csv_path, tsv_path]:
+                log_parser = csv_parking_log.LogParser(
+                    filepath=filepath, days=91
+                    )
+                log_parser.parse()
+
+                self.assertEqual(
+                    log_parser.rows_parsed, xlsx_parser.rows_parsed
+                    )
+                self.assertEqual(
+                    log_parser.dashboard_data(), xlsx_parser.dashboard_data()
+                    )
+        finally:
+            shutil.rmtree(tempdir)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_csv_parking_log_parser_parse_sheets(self):
+        '''Test LogParser.parse with a log split across worksheets.
+        '''
+
+        xlsx_parser = csv_parking_log.LogParser(
+            filepath='sample_log_reaL20170202.xlsx', days=91
+            )
+        xlsx_parser.parse()
+
+        tempdir = tempfile.mkdtemp()
+        try:
+            # Keep the date in the name; it bounds the valid dates.
+            filepath = os.path.join(tempdir, 'sample_log_reaL20170202.xlsx')
+
+            # Three log sheets, each with a header row, and a sheet of
+            # something else, which isn't parsed.
+            rows = list(
+                xlsx_reader.iter_sheet_rows('sample_log_reaL20170202.xlsx')
+                )
+            header_row, rows = rows[0], rows[1:]
+            other_rows = list(xlsx_reader.iter_sheet_rows(
+                'sample_log_reaL20170202.xlsx', 'Sheet2'
+                ))
+            xlsx_reader.write_workbook(filepath, [
+                ('2013', [header_row] + rows[:1000]),
+                ('Notes', other_rows),
+                ('2014', [header_row] + rows[1000:2500]),
+                ('2015', [header_row] + rows[2500:]),
+                ])
+
+            for jobs, columnar in [(1, False), (3, False), (2, True)]:
+                log_parser = csv_parking_log.LogParser(
+                    filepath=filepath, days=91, jobs=jobs, columnar=columnar
+                    )
+                log_parser.parse()
+
+                self.assertEqual(
+                    log_parser.column_manager.log_version, 'CSVPL16.1'
+                    )
+                for attr in ['rows_parsed', 'header_rows_skipped']:
+                    self.assertEqual(
+                        getattr(log_parser, attr),
+                        getattr(xlsx_parser, attr) + 2
+                        )
+                for attr in ['rows_inprocessed', 'records_inprocessed']:
+                    self.assertEqual(
+                        getattr(log_parser, attr), getattr(xlsx_parser, attr)
+                        )
+                self.assertEqual(
+                    [r.to_dict() for r in log_parser.log_records],
+                    [r.to_dict() for r in xlsx_parser.log_records]
+                    )
+                self.assertEqual(
+                    log_parser.dashboard_data(), xlsx_parser.dashboard_data()
+                    )
+        finally:
+            shutil.rmtree(tempdir)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_csv_parking_log_parser_parse_plate_store(self):
+        '''Test LogParser.parse with a plate store.
+        '''
+        # pylint: disable=protected-access
+
+        tempdir = tempfile.mkdtemp()
+        try:
+            plate_store_path = os.path.join(tempdir, 'plate_store.json')
+
+            canonical_plates = []
+            for _ in range(2):
+                log_parser = csv_parking_log.LogParser(
+                    filepath='sample_log_30_lines.xlsx',
+                    plate_store_path=plate_store_path
+                    )
+                log_parser.parse()
+                self.assertTrue(os.path.exists(plate_store_path))
+                self.assertEqual(len(log_parser._plate_index), 22)
+                self.assertEqual(len(log_parser._canonical_plate_index), 10)
+                canonical_plates.append({
+                    r.plate: r.canonical_plate for r in log_parser.log_records
+                    })
+
+            self.assertEqual(canonical_plates[0], canonical_plates[1])
+
+        finally:
+            shutil.rmtree(tempdir)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_csv_parking_log_parser_parse_incremental(self):
+        '''Test LogParser.parse canonicalizing plates incrementally.
+        '''
+        # pylint: disable=protected-access
+
+        # The larger log has classes whose plates tie for most common.
+        for filepath, days in [
+                ('sample_log_30_lines.xlsx', None),
+                ('sample_log_30_lines.xlsx', 6),
+                ('sample_log_reaL20170202.xlsx', 3650),
+                ]:  # pylint: disable=bad-continuation
+            plate_classes = []
+            dashboards = []
+            for incremental in [False, True]:
+                log_parser = csv_parking_log.LogParser(
+                    filepath=filepath,
+                    days=days,
+                    incremental=incremental
+                    )
+                log_parser.parse()
+                plate_classes.append(set(
+                    frozenset(r.plate for r in log_records)
+                    for log_records
+                    in log_parser._canonical_plate_index.values()
+                    ))
+                dashboards.append(log_parser.dashboard_data())
+
+                for canonical_plate, log_records in (
+                        log_parser._canonical_plate_index.iteritems()
+                        ):  # pylint: disable=bad-continuation
+                    self.assertEqual(
+                        set(r.canonical_plate for r in log_records),
+                        {canonical_plate}
+                        )
+                    self.assertEqual(
+                        log_records,
+                        sorted(log_records, key=lambda x: x.refdt_offset)
+                        )
+
+            self.assertEqual(plate_classes[0], plate_classes[1])
+            self.assertEqual(dashboards[0], dashboards[1])
+
+            # Only the whole log has plates that merge classes; with
+            # days, records outside the date bounds are never created.
+            if days is None:
+                self.assertTrue(log_parser.canonical_plate_changes > 0)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_csv_parking_log_parser_parse_days_only(self):
+        '''Test that with only days, no records outside it are created.
+        '''
+
+        created = []
+
+        class CountedLogRecord(csv_parking_log.LogRecord):
+            '''A LogRecord that notes its creation.'''
+            def __init__(self, *args, **kwargs):
+                super(CountedLogRecord, self).__init__(*args, **kwargs)
+                created.append(self)
+
+        all_records = csv_parking_log.LogParser(
+            filepath='sample_log_30_lines.xlsx'
+            )
+        all_records.parse()
+
+        log_record_class = csv_parking_log.LogRecord
+        csv_parking_log.LogRecord = CountedLogRecord
+        try:
+            for columnar in [False, True]:
+                del created[:]
+                log_parser = csv_parking_log.LogParser(
+                    filepath='sample_log_30_lines.xlsx',
+                    days=6,
+                    columnar=columnar
+                    )
+                log_parser.parse()
+
+                self.assertEqual(created, log_parser.log_records)
+                self.assertTrue(
+                    0 < len(created) < len(all_records.log_records)
+                    )
+                for log_record in created:
+                    self.assertTrue(
+                        log_parser.start_refdt_offset <=
+                        log_record.refdt_offset <
+                        log_parser.end_refdt_offset
+                        )
+                self.assertEqual(
+                    log_parser.end_refdt_offset,
+                    all_records.latest_valid_refdt_offset_found + 1
+                    )
+                self.assertEqual(
+                    log_parser.records_inprocessed,
+                    all_records.records_inprocessed
+                    )
+                self.assertEqual(
+                    log_parser.records_out_of_date,
+                    all_records.records_inprocessed - len(created)
+                    )
+        finally:
+            csv_parking_log.LogRecord = log_record_class
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_csv_parking_log_parser_parse_days_only_streamed(self):
+        '''Test that with only days, the log's dates are read in a pass
+        of their own, of just the LIC and date columns.
+        '''
+
+        columns_read = []
+        iter_sheet_rows = xlsx_reader.iter_sheet_rows
+
+        def counted_iter_sheet_rows(filepath, sheet_name, columns=None):
+            '''Note the columns read, and read the rows.'''
+            columns_read.append(columns)
+            return iter_sheet_rows(filepath, sheet_name, columns)
+
+        xlsx_reader.iter_sheet_rows = counted_iter_sheet_rows
+        try:
+            log_parser = csv_parking_log.LogParser(
+                filepath='sample_log_30_lines.xlsx', days=6
+                )
+            log_parser.parse()
+        finally:
+            xlsx_reader.iter_sheet_rows = iter_sheet_rows
+
+        column_manager = log_parser.column_manager
+        self.assertEqual(
+            [set(c) for c in columns_read if c is not None],
+            [
+                set([column_manager.license_column]) |
+                set(column_manager.record_type_columns)
+                ]
+            )
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_csv_parking_log_parser_parse_columnar(self):
+        '''Test LogParser.parse reading the log a column at a time.
+        '''
+
+        column_chunk_rows = csv_parking_log.COLUMN_CHUNK_ROWS
+
+        for filepath, days in [
+                ('sample_log_typemix.xlsx', None),
+                ('sample_log_headers_only.xlsx', None),
+                ('sample_log_30_lines.xlsx', None),
+                ('sample_log_reaL20170202.xlsx', 91),
+                ]:  # pylint: disable=bad-continuation
+
+            row_parser = csv_parking_log.LogParser(
+                filepath=filepath, days=days
+                )
+            row_parser.parse()
+
+            # Ragged rows may end a chunk of rows turned into columns.
+            for chunk_rows in [column_chunk_rows, 7]:
+                csv_parking_log.COLUMN_CHUNK_ROWS = chunk_rows
+                try:
+                    column_parser = csv_parking_log.LogParser(
+                        filepath=filepath, days=days, columnar=True
+                        )
+                    column_parser.parse()
+                finally:
+                    csv_parking_log.COLUMN_CHUNK_ROWS = column_chunk_rows
+
+                for attr in [
+                        'rows_parsed', 'header_rows_skipped',
+                        'rows_inprocessed', 'records_inprocessed'
+                        ]:  # pylint: disable=bad-continuation
+                    self.assertEqual(
+                        getattr(column_parser, attr),
+                        getattr(row_parser, attr)
+                        )
+                self.assertEqual(
+                    [r.to_dict() for r in column_parser.log_records],
+                    [r.to_dict() for r in row_parser.log_records]
+                    )
+                self.assertEqual(
+                    column_parser.dashboard_data(),
+                    row_parser.dashboard_data()
+                    )
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_coerce_float_to_int(self):
+        '''Test that coercing by type matches _force_float_to_int.
+        '''
+        # pylint: disable=protected-access
+
+        for value in [
+                1234567.0, 2.5, float('inf'), float('nan'), 1, True,
+                u'2005', ' 12 ', '+3.7', '.5', '1e5', '1e400', 'inf', 'nan',
+                '7DYB056', u'1 2', u'12\n', '0x10', u''
+                ]:  # pylint: disable=bad-continuation
+            record_row = [value]
+            csv_parking_log._force_float_to_int(record_row, 0)
+            self.assertEqual(
+                repr(csv_parking_log._coerce_float_to_int(value)),
+                repr(record_row[0])
+                )
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_compact_log_records(self):
+        '''Test that log records are slot based and share their text.
+        '''
+
+        for columnar in [False, True]:
+            log_parser = csv_parking_log.LogParser(
+                filepath='sample_log_30_lines.xlsx', columnar=columnar
+                )
+            log_parser.parse()
+            log_records = log_parser.log_records
+
+            for log_record in log_records:
+                self.assertFalse(hasattr(log_record, '__dict__'))
+                self.assertTrue(isinstance(log_record.make, unicode))
+
+            # Text is interned, and a row's records share its vehicle.
+            by_plate = {}
+            for log_record in log_records:
+                by_plate.setdefault(log_record.plate, []).append(log_record)
+            shared = [
+                records for records in by_plate.values()
+                if len(records) > 1
+                ]
+            self.assertTrue(shared)
+            for records in shared:
+                self.assertTrue(records[0].plate is records[1].plate)
+            self.assertTrue(any(
+                records[0].vehicle is records[1].vehicle
+                for records in shared
+                ))
+
+        log_record = csv_parking_log.LogRecord('7DYB056', '1.02.17', 'first')
+        self.assertEqual(log_record.make, u'None')
+        self.assertFalse(hasattr(log_record.vehicle, '__dict__'))
+
     # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
     # TODO: Test cases with days, start_date, end_date combinations.
 
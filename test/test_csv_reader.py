@@ -0,0 +1,187 @@
+'''Test cases for the csv_reader.py module.'''
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import csv_reader
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+# Uncomment to show lower level logging statements.
+# import logging
+# logger = logging.getLogger()
+# logger.setLevel(logging.DEBUG)
+# shandler = logging.StreamHandler()
+# shandler.setLevel(logging.INFO)  # Pick one.
+# shandler.setLevel(logging.DEBUG)  # Pick one.
+# logger.addHandler(shandler)
+
+CSV_DATA = (
+    '\xef\xbb\xbfMAKE,MODEL,LIC#,,\r\n'
+    'HONDA,2005,7DYB056,"a, b"\r\n'
+    ',,,,\r\n'
+    'VW,,CAF\xc3\x89,,\r\n'
+    ',,,\r\n'
+    '\r\n'
+    )
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+class TestCsvReader(unittest.TestCase):
+    '''Test cases for the csv_reader module.'''
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def setUp(self):
+        '''Test case common fixture setup.'''
+        self.tmp_dir = tempfile.mkdtemp()
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def tearDown(self):
+        '''Test case common fixture teardown.'''
+        shutil.rmtree(self.tmp_dir)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def _write(self, filename, data):
+        '''Write data to a file in the temporary directory.'''
+        filepath = os.path.join(self.tmp_dir, filename)
+        with open(filepath, 'wb') as fptr:
+            fptr.write(data)
+        return filepath
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_sniff_delimiter(self):
+        '''Test choosing delimited text by extension or content.'''
+
+        self.assertEqual(
+            csv_reader.sniff_delimiter(self._write('log.csv', '')), ','
+            )
+        self.assertEqual(
+            csv_reader.sniff_delimiter(self._write('log.TSV', '')), '\t'
+            )
+        self.assertEqual(
+            csv_reader.sniff_delimiter(
+                self._write('log', CSV_DATA.replace(',', '\t'))
+                ),
+            '\t'
+            )
+        self.assertEqual(
+            csv_reader.sniff_delimiter(self._write('log.txt', CSV_DATA)), ','
+            )
+
+        self.assertIsNone(csv_reader.sniff_delimiter('sample_log_empty.txt'))
+        self.assertIsNone(
+            csv_reader.sniff_delimiter('sample_log_30_lines.xlsx')
+            )
+        self.assertIsNone(
+            csv_reader.sniff_delimiter(
+                self._write('log', csv_reader.OLE2_SIGNATURE + 'a,b\n')
+                )
+            )
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_iter_csv_rows(self):
+        '''Test reading values, empty rows and ragged rows.'''
+
+        rows = list(
+            csv_reader.iter_csv_rows(self._write('log.csv', CSV_DATA))
+            )
+        self.assertEqual(
+            rows,
+            [
+                (u'MAKE', u'MODEL', u'LIC#'),
+                (u'HONDA', u'2005', u'7DYB056', u'a, b'),
+                (),
+                (u'VW', u'', u'CAF\xc9'),
+                ]
+            )
+        self.assertTrue(isinstance(rows[3][2], unicode))
+
+        self.assertEqual(
+            list(csv_reader.iter_csv_rows(
+                self._write('log.csv', CSV_DATA), columns=[2]
+                )),
+            [
+                (u'', u'', u'LIC#'),
+                (u'', u'', u'7DYB056'),
+                (),
+                (u'', u'', u'CAF\xc9'),
+                ]
+            )
+
+        with self.assertRaises(ValueError):
+            list(csv_reader.iter_csv_rows('sample_log_empty.txt'))
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_iter_csv_rows_after(self):
+        '''Test reading only the rows after a row position.'''
+
+        filepath = self._write('log.csv', CSV_DATA)
+        rows = list(csv_reader.iter_csv_rows(filepath))
+
+        for row_count in range(1, len(rows) + 1):
+            position = csv_reader.csv_row_position(filepath, row_count)
+            self.assertEqual(
+                list(csv_reader.iter_csv_rows_after(filepath, position)),
+                rows[row_count:]
+                )
+
+        # Appended rows follow on, after the empty rows before them;
+        # edited rows don't.
+        position = csv_reader.csv_row_position(filepath, len(rows))
+        self._write('log.csv', CSV_DATA + 'FORD,,X1\r\n')
+        self.assertEqual(
+            list(csv_reader.iter_csv_rows_after(filepath, position)),
+            list(csv_reader.iter_csv_rows(filepath))[len(rows):]
+            )
+        self._write('log.csv', CSV_DATA.replace('HONDA', 'HONDO'))
+        self.assertIsNone(csv_reader.iter_csv_rows_after(filepath, position))
+
+        # There's no position after more rows than the file has, or
+        # after a last row without a line break, which may be added to.
+        self.assertIsNone(
+            csv_reader.csv_row_position(filepath, len(rows) + 3)
+            )
+        self.assertIsNone(
+            csv_reader.csv_row_position(self._write('log.csv', 'A,B\r\nC'), 2)
+            )
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_write_csv_rows(self):
+        '''Test that written rows read back as text.'''
+
+        filepath = os.path.join(self.tmp_dir, 'log.tsv')
+        csv_reader.write_csv_rows(
+            [(u'LIC#', u'MODEL'), (), (1234567.0, 2.5, u'CAF\xc9')],
+            filepath,
+            delimiter='\t'
+            )
+        self.assertEqual(
+            list(csv_reader.iter_csv_rows(filepath)),
+            [
+                (u'LIC#', u'MODEL'),
+                (),
+                (u'1234567', u'2.5', u'CAF\xc9'),
+                ]
+            )
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+# Define test suite.
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+# pylint: disable=invalid-name
+load_case = unittest.TestLoader().loadTestsFromTestCase
+all_suites = {
+    # Lowercase these.
+    'suite_CsvReader': load_case(
+        TestCsvReader
+        ),
+    }
+
+master_suite = unittest.TestSuite(all_suites.values())
+# pylint: enable=invalid-name
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+if __name__ == '__main__':
+    unittest.main()
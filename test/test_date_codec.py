@@ -0,0 +1,139 @@
+'''Test cases for the date_codec.py module.'''
+
+from datetime import datetime
+import unittest
+
+import date_codec
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+# Uncomment to show lower level logging statements.
+# import logging
+# logger = logging.getLogger()
+# logger.setLevel(logging.DEBUG)
+# shandler = logging.StreamHandler()
+# shandler.setLevel(logging.INFO)  # Pick one.
+# shandler.setLevel(logging.DEBUG)  # Pick one.
+# logger.addHandler(shandler)
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+class TestDateCodec(unittest.TestCase):
+    '''Test cases for the date_codec module.'''
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_log_date_to_refdt_offset(self):
+        '''Test converting log dates and Excel serials to offsets.'''
+
+        for log_date, expected in [
+                ('1.02.17', datetime(2017, 1, 2)),
+                (u'01.2.17', datetime(2017, 1, 2)),
+                ('12.31.99', datetime(1999, 12, 31)),
+                ('2.29.16 (2nd)', datetime(2016, 2, 29)),
+                ('1.2.2017', datetime(2020, 1, 2)),
+                (42737.0, datetime(2017, 1, 2)),
+                (42737.75, datetime(2017, 1, 2)),
+                (42737, datetime(2017, 1, 2)),
+                ]:  # pylint: disable=bad-continuation
+            self.assertEqual(
+                date_codec.log_date_to_refdt_offset(log_date),
+                (expected - date_codec.REF_DATETIME).days
+                )
+
+        for log_date in ['', 'TOWED', '1/2/17', '13.1.17', '2.29.17']:
+            with self.assertRaises(ValueError):
+                date_codec.log_date_to_refdt_offset(log_date)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_refdt_offset_to_yyyy_mm_dd(self):
+        '''Test converting offsets to YYYY-MM-DD.'''
+
+        self.assertEqual(
+            date_codec.refdt_offset_to_yyyy_mm_dd(0), '2000-01-01'
+            )
+        self.assertEqual(
+            date_codec.refdt_offset_to_yyyy_mm_dd(6211), '2017-01-02'
+            )
+        self.assertEqual(
+            date_codec.refdt_offset_to_yyyy_mm_dd(-1), '1999-12-31'
+            )
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_memoize(self):
+        '''Test that memoized caches stay bounded.'''
+
+        calls = []
+
+        @date_codec.memoize(max_size=2)
+        def double(value):
+            '''Double value, noting the call.'''
+            calls.append(value)
+            return value * 2
+
+        self.assertEqual([double(x) for x in [1, 2, 1, 2]], [2, 4, 2, 4])
+        self.assertEqual(calls, [1, 2])
+
+        self.assertEqual(double(3), 6)
+        self.assertTrue(len(double.cache) <= 2)
+        self.assertEqual(double(3), 6)
+        self.assertEqual(calls, [1, 2, 3])
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_column_conversions(self):
+        '''Test converting whole columns, with and without numpy.'''
+
+        log_dates_columns = [
+            ['1.02.17', u'1.02.17', '12.31.99'],
+            [42737.0, 42737.75, 36525.0],
+            ['1.02.17', 42737.0],
+            [],
+            ]
+        offsets = [0, 6211, -1]
+
+        numpy = date_codec.numpy
+        try:
+            for date_codec.numpy in set([None, numpy]):
+                for log_dates in log_dates_columns:
+                    self.assertEqual(
+                        date_codec.log_dates_to_refdt_offsets(log_dates),
+                        [
+                            date_codec.log_date_to_refdt_offset(log_date)
+                            for log_date in log_dates
+                            ]
+                        )
+                self.assertEqual(
+                    date_codec.refdt_offsets_to_yyyy_mm_dd(offsets),
+                    ['2000-01-01', '2017-01-02', '1999-12-31']
+                    )
+        finally:
+            date_codec.numpy = numpy
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    @unittest.skipIf(date_codec.numpy is None, 'numpy is not installed')
+    def test_refdt_offsets_to_datetime64(self):
+        '''Test converting offsets to datetime64.'''
+
+        self.assertEqual(
+            date_codec.refdt_offsets_to_datetime64([0, 6211]).tolist(),
+            [datetime(2000, 1, 1).date(), datetime(2017, 1, 2).date()]
+            )
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+# Define test suite.
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+# pylint: disable=invalid-name
+load_case = unittest.TestLoader().loadTestsFromTestCase
+all_suites = {
+    # Lowercase these.
+    'suite_DateCodec': load_case(
+        TestDateCodec
+        ),
+    }
+
+master_suite = unittest.TestSuite(all_suites.values())
+# pylint: enable=invalid-name
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+if __name__ == '__main__':
+    unittest.main()
@@ -3,6 +3,7 @@
 
 import unittest
 
+import log_column_manager
 from log_column_manager import ColumnManager
 
 
@@ -130,6 +131,103 @@ class TestColumnManagerRowAnalysis(unittest.TestCase):
             #     column_manager.determine_column_map(row, version=version)
             #     )
 
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_row_plan(self):
+        '''Test the row plan determine_column_map() compiles.'''
+
+        column_manager = ColumnManager()
+        header_row = self.header_row['CSVPL17.1']
+        column_manager.determine_column_map(header_row)
+
+        row = list(range(len(header_row)))
+        column_indices = column_manager.column_indices
+        self.assertEqual(
+            column_manager.plate_getter(row), column_indices['LIC']
+            )
+        self.assertEqual(
+            column_manager.vehicle_getter(row),
+            tuple(
+                column_indices[name]
+                for name in log_column_manager.VEHICLE_COLUMNS
+                )
+            )
+        self.assertEqual(
+            column_manager.event_getter(row),
+            tuple(column_manager.record_type_columns)
+            )
+        self.assertEqual(
+            column_manager.record_type_plan,
+            [
+                (
+                    column, column_manager.record_type[column],
+                    column_manager.record_class[
+                        column_manager.record_type[column]
+                        ]
+                    )
+                for column in column_manager.record_type_columns
+                ]
+            )
+        self.assertEqual(
+            column_manager.record_type_plan[3], (8, 'warning', 'warning')
+            )
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_count_header_matches(self):
+        '''Test counting header cells, stripped, up to the template width.
+        '''
+
+        # Syntax sugar.
+        count_header_matches = log_column_manager.count_header_matches
+
+        header_row = self.header_row['CSVPL16.1']
+        self.assertEqual(
+            count_header_matches(header_row, header_row), len(header_row)
+            )
+        self.assertEqual(
+            count_header_matches(
+                [u' MAKE ', 2005.0, '', u'LIC#\n'] + header_row[4:] + [
+                    u'MAKE'
+                    ],
+                header_row
+                ),
+            len(header_row) - 2
+            )
+        self.assertEqual(count_header_matches([], header_row), 0)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_find_header_rows(self):
+        '''Basic test cases for ColumnManager.find_header_rows().'''
+
+        column_manager = ColumnManager()
+        header_row = self.header_row['CSVPL17.1']
+        column_manager.determine_column_map(header_row)
+
+        rows = [
+            header_row,
+            ['HONDA', 'CIVIC', 'RED', '7DYB056'] + [''] * 8,
+            # Three matching columns isn't enough, four is.
+            header_row[:3] + [''] * 9,
+            header_row[:4] + [''] * 8,
+            [' MAKE ', 2005.0] + header_row[2:] + ['extra'],
+            ]
+        columns = [list(column) for column in zip(*rows)]
+
+        expected = set(
+            row_num for row_num, row in enumerate(rows)
+            if column_manager.is_header_row(row)
+            )
+        self.assertEqual(expected, {0, 3, 4})
+        self.assertEqual(
+            column_manager.find_header_rows(columns, range(len(rows))),
+            expected
+            )
+        self.assertEqual(
+            column_manager.find_header_rows(columns, [1, 2, 4]), {4}
+            )
+
+        with self.assertRaises(ValueError):
+            ColumnManager().find_header_rows(columns, [0])
+
 
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
 # Define test suite.
@@ -0,0 +1,185 @@
+'''Test cases for the log_corpus.py module.'''
+
+import collections
+import os
+import shutil
+import tempfile
+import unittest
+
+import csv_parking_log
+import log_corpus
+import xlsx_reader
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+# Uncomment to show lower level logging statements.
+# import logging
+# logger = logging.getLogger()
+# logger.setLevel(logging.DEBUG)
+# shandler = logging.StreamHandler()
+# shandler.setLevel(logging.INFO)  # Pick one.
+# shandler.setLevel(logging.DEBUG)  # Pick one.
+# logger.addHandler(shandler)
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+class TestLogCorpus(unittest.TestCase):
+    '''Test cases for LogCorpus.'''
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def setUp(self):
+        '''Test case common fixture setup.'''
+
+        self.tmp_dir = tempfile.mkdtemp()
+
+        # Weekly snapshots: each is the one before plus new rows. The
+        # dates in the names bound the valid dates.
+        rows = list(
+            xlsx_reader.iter_sheet_rows('sample_log_reaL20170202.xlsx')
+            )
+        self.snapshot_paths = []
+        for snapshot_date, row_count in [
+                ('20161201', 3000),
+                ('20170105', 4000),
+                ('20170202', len(rows)),
+                ]:  # pylint: disable=bad-continuation
+            snapshot_path = os.path.join(
+                self.tmp_dir, 'CreeksideParkingLog.%s.xlsx' % snapshot_date
+                )
+            xlsx_reader.write_workbook(
+                snapshot_path, [('Sheet1', rows[:row_count])]
+                )
+            self.snapshot_paths.append(snapshot_path)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def tearDown(self):
+        '''Test case common fixture teardown.'''
+        shutil.rmtree(self.tmp_dir)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_log_corpus_init_errors(self):
+        '''Test LogCorpus initialization errors.'''
+
+        with self.assertRaises(ValueError):
+            log_corpus.LogCorpus([])
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_log_corpus_parse(self):
+        '''Test that merged snapshots match the latest snapshot.'''
+
+        for jobs, parser_options in [
+                (1, {'days': 91}), (2, {'days': 91}), (2, {})
+                ]:  # pylint: disable=bad-continuation
+            latest_parser = csv_parking_log.LogParser(
+                self.snapshot_paths[-1], **parser_options
+                )
+            latest_parser.parse()
+
+            corpus = log_corpus.LogCorpus(
+                self.snapshot_paths, jobs=jobs, **parser_options
+                )
+            corpus.parse()
+
+            self.assertEqual(
+                corpus.dashboard_data(), latest_parser.dashboard_data()
+                )
+            self.assertEqual(
+                corpus.log_parser.end_refdt_offset,
+                latest_parser.end_refdt_offset
+                )
+
+            # Each snapshot holds the ones before, so only the latest
+            # snapshot's records are kept.
+            self.assertEqual(
+                collections.Counter(
+                    log_corpus.record_key(log_record)
+                    for log_record in corpus.log_parser.log_records
+                    ),
+                collections.Counter(
+                    log_corpus.record_key(log_record)
+                    for log_record in latest_parser.log_records
+                    )
+                )
+            self.assertEqual(
+                corpus.records_read - corpus.duplicate_records,
+                corpus.log_parser.records_inprocessed
+                )
+            self.assertEqual(
+                corpus.log_parser.rows_parsed,
+                sum(
+                    len(list(xlsx_reader.iter_sheet_rows(snapshot_path)))
+                    for snapshot_path in self.snapshot_paths
+                    )
+                )
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_log_corpus_parse_one_file(self):
+        '''Test that a corpus of one log file matches parsing the file.
+        '''
+
+        log_parser = csv_parking_log.LogParser('sample_log_reaL20170202.xlsx')
+        log_parser.parse()
+
+        corpus = log_corpus.LogCorpus(['sample_log_reaL20170202.xlsx'])
+        corpus.parse()
+
+        # The log holds duplicates of its own records, which are kept.
+        keys = [
+            log_corpus.record_key(log_record)
+            for log_record in log_parser.log_records
+            ]
+        self.assertTrue(len(set(keys)) < len(keys))
+        self.assertEqual(corpus.duplicate_records, 0)
+
+        self.assertEqual(
+            [r.to_dict() for r in corpus.log_parser.log_records],
+            [r.to_dict() for r in log_parser.log_records]
+            )
+        self.assertEqual(corpus.dashboard_data(), log_parser.dashboard_data())
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_log_corpus_parse_first_copy_kept(self):
+        '''Test that the first copy of a duplicated record is kept.'''
+
+        rows = list(xlsx_reader.iter_sheet_rows('sample_log_one_record.xlsx'))
+        header_row, record_row = rows[0], list(rows[1])
+        make_column = header_row.index(u'MAKE')
+
+        snapshot_paths = []
+        for snapshot_num, make in enumerate([u'FIRST', u'SECOND']):
+            snapshot_path = os.path.join(
+                self.tmp_dir, 'snapshot%d.20170202.xlsx' % snapshot_num
+                )
+            record_row[make_column] = make
+            xlsx_reader.write_workbook(
+                snapshot_path, [('Sheet1', [header_row, record_row])]
+                )
+            snapshot_paths.append(snapshot_path)
+
+        corpus = log_corpus.LogCorpus(snapshot_paths)
+        corpus.parse()
+
+        self.assertEqual(corpus.duplicate_records, corpus.records_read / 2)
+        self.assertEqual(
+            set(r.make for r in corpus.log_parser.log_records), set([u'FIRST'])
+            )
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+# Define test suite.
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+# pylint: disable=invalid-name
+load_case = unittest.TestLoader().loadTestsFromTestCase
+all_suites = {
+    # Lowercase these.
+    'suite_LogCorpus': load_case(
+        TestLogCorpus
+        ),
+    }
+
+master_suite = unittest.TestSuite(all_suites.values())
+# pylint: enable=invalid-name
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,586 @@
+'''Test cases for the matchiness.py module.'''
+
+import os
+import re
+import shutil
+import sys
+import tempfile
+import unittest
+
+import matchiness
+
+CLOSET_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), os.pardir, 'closet'
+    )
+sys.path.insert(0, CLOSET_PATH)
+import test_data  # noqa pylint: disable=wrong-import-position
+import test_data_short  # noqa pylint: disable=wrong-import-position
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+# Uncomment to show lower level logging statements.
+# import logging
+# logger = logging.getLogger()
+# logger.setLevel(logging.DEBUG)
+# shandler = logging.StreamHandler()
+# shandler.setLevel(logging.INFO)  # Pick one.
+# shandler.setLevel(logging.DEBUG)  # Pick one.
+# logger.addHandler(shandler)
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def _all_pairs_equivalence_classes(string_list):
+    '''Reference all-pairs implementation of find_equivalence_classes.'''
+
+    tests = {}
+    for s in string_list:
+        if len(s) < matchiness.MIN_LENGTH:
+            continue
+        tests[s] = [
+            re.compile(r'.*'.join([
+                re.escape(s[0:max(x, 0)]),
+                re.escape(s[x + matchiness.FUZZ_SIZE:])
+                ]))
+            for x in range(-(matchiness.FUZZ_SIZE - 1), len(s))
+            ]
+
+    equivalents = {s: {s} for s in string_list}
+    for s in tests:
+        for t in tests:
+            if abs(len(s) - len(t)) >= matchiness.MAX_SIZE_DIFF:
+                continue
+            score = len([r for r in tests[s] if r.match(t)])
+            if score >= matchiness.MATCH_THRESHOLD:
+                merged_equivalents = equivalents[s] | equivalents[t]
+                for e in merged_equivalents:
+                    equivalents[e] = merged_equivalents
+
+    return set(frozenset(e) for e in equivalents.values())
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def _read_plate_list(filename):
+    '''Return the set of plates in a closet plate list file.'''
+    return matchiness.get_string_list_from_input_file(
+        os.path.join(CLOSET_PATH, filename)
+        )
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+class TestMatchiness(unittest.TestCase):
+    '''Test cases for matchiness equivalence class construction.'''
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def assertSameClasses(self, string_list):
+        '''Compare find_equivalence_classes to the all-pairs reference.'''
+
+        # pylint: disable=invalid-name
+        self.assertEqual(
+            set(
+                frozenset(e)
+                for e in matchiness.find_equivalence_classes(string_list)
+                ),
+            _all_pairs_equivalence_classes(string_list)
+            )
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_find_equivalence_classes_test_data_short(self):
+        '''Test find_equivalence_classes with closet test_data_short.'''
+        self.assertSameClasses(test_data_short.TEST_DATA)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_find_equivalence_classes_test_data(self):
+        '''Test find_equivalence_classes with closet test_data.'''
+        self.assertSameClasses(test_data.TEST_DATA)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_find_equivalence_classes_plate_list(self):
+        '''Test find_equivalence_classes with closet plate_list.'''
+
+        plate_list = _read_plate_list('plate_list')
+        self.assertSameClasses(plate_list)
+
+        classes = matchiness.find_equivalence_classes(plate_list)
+        with open(os.path.join(CLOSET_PATH, 'plate_list.matches')) as fptr:
+            for line in fptr:
+                plates = set(line.split())
+                self.assertIn(plates, [e for e in classes if len(e) > 1])
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_iter_match_edges(self):
+        '''Test iter_match_edges only generates nonzero edges.'''
+
+        edges = list(matchiness.iter_match_edges(
+            ['7DVB056', '7DYB056', '537-ARV', '537ARV', 'X4XPLRN', 'ABC']
+            ))
+
+        self.assertEqual(
+            sorted((key, candidate) for key, candidate, _ in edges),
+            [
+                ('537-ARV', '537ARV'),
+                ('537ARV', '537-ARV'),
+                ('7DVB056', '7DYB056'),
+                ('7DYB056', '7DVB056'),
+                ]
+            )
+        self.assertTrue(all(score > 0 for _, _, score in edges))
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_get_match_score(self):
+        '''Test get_match_score still builds the dense score table.'''
+
+        string_list = ['7DVB056', '7DYB056', '537ARV', 'ABC']
+        match_score = matchiness.get_match_score(string_list)
+
+        self.assertEqual(sorted(match_score), sorted(string_list))
+        for key in string_list:
+            self.assertEqual(sorted(match_score[key]), sorted(string_list))
+        self.assertEqual(match_score['ABC']['ABC'], 0)
+        self.assertEqual(match_score['7DVB056']['537ARV'], 0)
+        self.assertEqual(match_score['7DVB056']['7DVB056'], 8)
+        self.assertTrue(match_score['7DVB056']['7DYB056'] > 0)
+
+        for key, candidate, score in matchiness.iter_match_edges(
+                string_list
+                ):  # pylint: disable=bad-continuation
+            self.assertEqual(match_score[key][candidate], score)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_parallel_scoring(self):
+        '''Test scoring in worker processes matches scoring in process.'''
+
+        self.assertEqual(
+            list(matchiness.get_matching_pairs(test_data.TEST_DATA, jobs=3)),
+            list(matchiness.get_matching_pairs(test_data.TEST_DATA))
+            )
+        string_list = sorted(test_data.TEST_DATA)[::4]
+        known_list = sorted(test_data.TEST_DATA)[1::4]
+        self.assertEqual(
+            list(matchiness.get_matching_pairs(
+                string_list, known_list, jobs=3
+                )),
+            list(matchiness.get_matching_pairs(string_list, known_list))
+            )
+        self.assertEqual(
+            list(matchiness.iter_match_edges(test_data.TEST_DATA, jobs=3)),
+            list(matchiness.iter_match_edges(test_data.TEST_DATA))
+            )
+        self.assertEqual(
+            matchiness.get_match_score(test_data_short.TEST_DATA, jobs=2),
+            matchiness.get_match_score(test_data_short.TEST_DATA)
+            )
+        self.assertEqual(
+            set(
+                frozenset(e) for e in matchiness.find_equivalence_classes(
+                    test_data.TEST_DATA, jobs=2
+                    )
+                ),
+            _all_pairs_equivalence_classes(test_data.TEST_DATA)
+            )
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_get_cross_matching_pairs(self):
+        '''Test matching strings only against a list of known strings.'''
+
+        self.assertEqual(
+            list(matchiness.get_cross_matching_pairs(
+                ['7DYB056', '537ARV', '8M28212', 'ABC', '7DVB056'],
+                ['7DVB056', '537-ARV', '7DVB057', 'ABC', '5TNK801']
+                )),
+            [
+                ('537ARV', '537-ARV'),
+                ('7DVB056', '7DVB056'),
+                ('7DVB056', '7DVB057'),
+                ('7DYB056', '7DVB056'),
+                ]
+            )
+
+        string_list = sorted(test_data.TEST_DATA)[::5]
+        known_list = sorted(test_data.TEST_DATA)[1::5]
+        all_classes = _all_pairs_equivalence_classes(
+            string_list + known_list
+            )
+        pairs = list(
+            matchiness.get_cross_matching_pairs(string_list, known_list)
+            )
+        self.assertEqual(
+            pairs,
+            list(matchiness.get_cross_matching_pairs(
+                string_list, known_list, jobs=2
+                ))
+            )
+        for s, t in pairs:
+            self.assertIn(s, string_list)
+            self.assertIn(t, known_list)
+            self.assertTrue(any(s in e and t in e for e in all_classes))
+
+        self.assertEqual(
+            list(matchiness.get_cross_matching_pairs(
+                ['8mz8212', '537 arv'],
+                ['8M28212', '537-ARV', '537ARV'],
+                normalization=matchiness.NORMALIZATION_RULES
+                )),
+            [
+                ('537 arv', '537-ARV'),
+                ('537 arv', '537ARV'),
+                ('8mz8212', '8M28212'),
+                ]
+            )
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_normalize(self):
+        '''Test plate normalization rules.'''
+
+        self.assertEqual(
+            matchiness.normalize('537-arv', ['separators']), '537arv'
+            )
+        self.assertEqual(matchiness.normalize('537-arv', ['case']), '537-ARV')
+        self.assertEqual(
+            matchiness.normalize('8mz8212', ['case', 'confusables']),
+            '8M28212'
+            )
+        self.assertEqual(matchiness.normalize('B0 I-O.Z'), '80102')
+        self.assertEqual(matchiness.normalize('B0 I-O.Z', []), 'B0 I-O.Z')
+
+        self.assertEqual(
+            matchiness.get_normalization_rules(['confusables', 'separators']),
+            ['separators', 'confusables']
+            )
+        with self.assertRaises(ValueError):
+            matchiness.get_normalization_rules(['soundex'])
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_normalized_equivalence_classes(self):
+        '''Test find_equivalence_classes with normalization rules.'''
+
+        rules = matchiness.NORMALIZATION_RULES
+        string_list = ['537-ARV', '537ARV', '8MZ8212', '8M28212', '7dvb056']
+
+        self.assertEqual(
+            sorted(
+                sorted(e) for e in matchiness.find_equivalence_classes(
+                    string_list + ['7DYB056', '9ZZZ99'],
+                    normalization=rules
+                    )
+                ),
+            [
+                ['537-ARV', '537ARV'],
+                ['7DYB056', '7dvb056'],
+                ['8M28212', '8MZ8212'],
+                ['9ZZZ99'],
+                ]
+            )
+
+        # Equivalent strings differing only by their normalized keys
+        # are paired without being fuzzy matched.
+        self.assertEqual(
+            sorted(matchiness.get_matching_pairs(
+                string_list, normalization=rules
+                )),
+            [('537-ARV', '537ARV'), ('8M28212', '8MZ8212')]
+            )
+        self.assertEqual(
+            list(matchiness.get_matching_pairs(
+                ['8MZ8212'], ['8M28212'], normalization=rules
+                )),
+            [('8M28212', '8MZ8212')]
+            )
+
+        plate_index = matchiness.PlateIndex(
+            test_data.TEST_DATA, normalization=rules
+            )
+        self.assertEqual(
+            set(frozenset(e) for e in plate_index.classes()),
+            set(
+                frozenset(e) for e in matchiness.find_equivalence_classes(
+                    test_data.TEST_DATA, normalization=rules
+                    )
+                )
+            )
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_wildcard_match(self):
+        '''Test wildcard tests behave like the regexes they replace.'''
+
+        self.assertEqual(
+            matchiness.build_wildcard_tests('ABCDE', 2),
+            [
+                ('', 'BCDE'), ('', 'CDE'), ('A', 'DE'), ('AB', 'E'),
+                ('ABC', ''), ('ABCD', '')
+                ]
+            )
+
+        self.assertTrue(matchiness.wildcard_match(('AB', 'E'), 'ABXXE'))
+        self.assertTrue(matchiness.wildcard_match(('AB', 'E'), 'ABEX'))
+        self.assertTrue(matchiness.wildcard_match(('', 'CDE'), 'XCDEX'))
+        self.assertFalse(matchiness.wildcard_match(('AB', 'E'), 'XABE'))
+        self.assertFalse(matchiness.wildcard_match(('AB', 'B'), 'AB'))
+        self.assertFalse(matchiness.wildcard_match(('A.', ''), 'AB'))
+
+        wildcard_tests = matchiness.build_wildcard_tests('7DVB056', 2)
+        self.assertEqual(
+            matchiness.count_wildcard_matches(wildcard_tests, '7DYB056'), 2
+            )
+        self.assertEqual(
+            matchiness.count_wildcard_matches(
+                wildcard_tests, '7DYB056', limit=1
+                ),
+            1
+            )
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+class TestDisjointSet(unittest.TestCase):
+    '''Test cases for matchiness.DisjointSet.'''
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_disjoint_set(self):
+        '''Basic test cases for DisjointSet.'''
+
+        disjoint_set = matchiness.DisjointSet(['a', 'b', 'c', 'd'])
+        self.assertEqual(len(disjoint_set), 4)
+        self.assertIn('a', disjoint_set)
+        self.assertNotIn('e', disjoint_set)
+
+        disjoint_set.union_all([('a', 'b'), ('c', 'e'), ('b', 'a')])
+        self.assertEqual(len(disjoint_set), 5)
+        self.assertEqual(disjoint_set.find('a'), disjoint_set.find('b'))
+        self.assertNotEqual(disjoint_set.find('a'), disjoint_set.find('c'))
+        self.assertEqual(
+            sorted(sorted(e) for e in disjoint_set.classes()),
+            [['a', 'b'], ['c', 'e'], ['d']]
+            )
+
+        disjoint_set.union('e', 'b')
+        self.assertEqual(
+            sorted(sorted(e) for e in disjoint_set.classes()),
+            [['a', 'b', 'c', 'e'], ['d']]
+            )
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+class TestCanonicalPlateStore(unittest.TestCase):
+    '''Test cases for matchiness.CanonicalPlateStore.'''
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def setUp(self):
+        '''Test case common fixture setup.'''
+        self.tempdir = tempfile.mkdtemp()
+        self.store_path = os.path.join(self.tempdir, 'plate_store.json')
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def tearDown(self):
+        '''Test case common fixture cleanup.'''
+        shutil.rmtree(self.tempdir)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_canonical_plate_store(self):
+        '''Test CanonicalPlateStore matching, saving and loading.'''
+
+        plate_store = matchiness.CanonicalPlateStore.load(self.store_path)
+        self.assertEqual(
+            sorted(plate_store.add_plates(['7DVB056', '8M28212'])),
+            ['7DVB056', '8M28212']
+            )
+        for plate_class in plate_store.classes():
+            plate_store.set_canonical_plate(plate_class, min(plate_class))
+        plate_store.save()
+
+        plate_store = matchiness.CanonicalPlateStore.load(self.store_path)
+        self.assertIn('7DVB056', plate_store)
+        self.assertEqual(
+            sorted(plate_store.add_plates(['7DVB056', '7DYB056', '8MZ8212'])),
+            ['7DYB056', '8MZ8212']
+            )
+        self.assertEqual(
+            sorted(sorted(e) for e in plate_store.classes()),
+            [['7DVB056', '7DYB056'], ['8M28212', '8MZ8212']]
+            )
+        self.assertEqual(plate_store.canonical_plate('7DVB056'), '7DVB056')
+        self.assertIsNone(plate_store.canonical_plate('7DYB056'))
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_canonical_plate_store_parameters(self):
+        '''Test a CanonicalPlateStore is discarded if parameters change.'''
+
+        plate_store = matchiness.CanonicalPlateStore(self.store_path)
+        plate_store.add_plates(['7DVB056'])
+        plate_store.save()
+
+        fuzz_size = matchiness.FUZZ_SIZE
+        try:
+            matchiness.FUZZ_SIZE = fuzz_size + 1
+            plate_store = matchiness.CanonicalPlateStore.load(
+                self.store_path
+                )
+        finally:
+            matchiness.FUZZ_SIZE = fuzz_size
+        self.assertNotIn('7DVB056', plate_store)
+
+        plate_store = matchiness.CanonicalPlateStore.load(self.store_path)
+        self.assertIn('7DVB056', plate_store)
+
+        plate_store = matchiness.CanonicalPlateStore.load(
+            self.store_path, ['separators']
+            )
+        self.assertNotIn('7DVB056', plate_store)
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+class TestPlateIndex(unittest.TestCase):
+    '''Test cases for matchiness.PlateIndex.'''
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def setUp(self):
+        '''Test case common fixture setup.'''
+        self.tempdir = tempfile.mkdtemp()
+        self.index_path = os.path.join(self.tempdir, 'plate_index.json')
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def tearDown(self):
+        '''Test case common fixture cleanup.'''
+        shutil.rmtree(self.tempdir)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_plate_index_classes(self):
+        '''Test adding plates one at a time finds the batch classes.'''
+
+        plate_list = _read_plate_list('plate_list')
+        for string_list in [test_data.TEST_DATA, plate_list]:
+            plate_index = matchiness.PlateIndex(string_list)
+            self.assertEqual(
+                set(frozenset(e) for e in plate_index.classes()),
+                set(
+                    frozenset(e)
+                    for e in matchiness.find_equivalence_classes(string_list)
+                    )
+                )
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_plate_index_lookup(self):
+        '''Test PlateIndex lookups and additions.'''
+
+        plate_index = matchiness.PlateIndex(
+            ['7DVB056', '7DVB056', '7DYB056', '8M28212', 'ABC']
+            )
+        self.assertEqual(plate_index.canonical_plate('7DYB056'), '7DVB056')
+        self.assertEqual(plate_index.lookup('ABC'), [])
+        self.assertEqual(plate_index.lookup('5TNK801'), [])
+
+        candidates = plate_index.lookup('7DVB05')
+        self.assertEqual([c[0] for c in candidates], ['7DVB056'])
+        self.assertTrue(candidates[0][1] >= matchiness.MATCH_THRESHOLD)
+        self.assertNotIn('7DVB05', plate_index)
+
+        self.assertEqual(plate_index.add('8MZ8212'), ['8M28212'])
+        self.assertEqual(plate_index.add('8MZ8212'), [])
+        self.assertEqual(plate_index.canonical_plate('8M28212'), '8MZ8212')
+        self.assertEqual(
+            [c[0] for c in plate_index.lookup('8MZ821')], ['8MZ8212']
+            )
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_plate_index_canonicalize(self):
+        '''Test PlateIndex.canonicalize reports class changes.'''
+
+        plate_index = matchiness.PlateIndex()
+
+        self.assertEqual(
+            plate_index.canonicalize('7DVB056'),
+            ('7DVB056', '7DVB056', [])
+            )
+        self.assertEqual(
+            plate_index.canonicalize('8M28212'),
+            ('8M28212', '8M28212', [])
+            )
+        self.assertIsNone(plate_index.canonicalize('7DYB056'))
+        self.assertEqual(
+            plate_index.canonicalize('7DYB056'),
+            ('7DYB056', '7DYB056', ['7DVB056'])
+            )
+
+        # A tie goes to the plate that sorts first.
+        self.assertEqual(
+            plate_index.canonicalize('7DVB056'),
+            ('7DVB056', '7DVB056', ['7DYB056'])
+            )
+        self.assertIsNone(plate_index.canonicalize('7DVB056'))
+
+        plate_index.canonicalize('1KVB099')
+        plate_index.canonicalize('1KVB099')
+        plate_index.canonicalize('1KVB099')
+        self.assertEqual(
+            plate_index.canonicalize('7DVB099'),
+            ('7DVB099', '1KVB099', ['1KVB099', '7DVB056'])
+            )
+        self.assertEqual(plate_index.canonical_plate('7DVB056'), '1KVB099')
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_plate_index_parameters(self):
+        '''Test matching parameters belong to each PlateIndex.'''
+
+        plates = ['7DVB056', '7DYB056', '7DXX056']
+
+        plate_index = matchiness.PlateIndex(plates)
+        self.assertEqual(len(plate_index.classes()), 1)
+
+        plate_index = matchiness.PlateIndex(plates, fuzz_size=1)
+        self.assertEqual(
+            sorted(sorted(e) for e in plate_index.classes()),
+            [['7DVB056', '7DYB056'], ['7DXX056']]
+            )
+        self.assertEqual(matchiness.FUZZ_SIZE, 2)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_plate_index_save_load(self):
+        '''Test a PlateIndex is restored from disk.'''
+
+        plate_index = matchiness.PlateIndex(
+            ['7DVB056', '7DYB056', '7DYB056', '8M28212'], fuzz_size=1
+            )
+        plate_index.save(self.index_path)
+
+        plate_index = matchiness.PlateIndex.load(self.index_path)
+        self.assertEqual(plate_index.fuzz_size, 1)
+        self.assertEqual(plate_index.counts['7DYB056'], 2)
+        self.assertEqual(plate_index.canonical_plate('7DVB056'), '7DYB056')
+        self.assertEqual(
+            [c[0] for c in plate_index.lookup('7DVB05')], ['7DYB056']
+            )
+
+        plate_store = matchiness.CanonicalPlateStore(self.index_path)
+        plate_store.add_plates(['7DVB056', '7DYB056'])
+        plate_store.set_canonical_plate(['7DVB056', '7DYB056'], '7DVB056')
+        plate_store.save()
+
+        plate_index = matchiness.PlateIndex.load(self.index_path)
+        self.assertEqual(plate_index.canonical_plate('7DYB056'), '7DVB056')
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+# Define test suite.
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+# pylint: disable=invalid-name
+load_case = unittest.TestLoader().loadTestsFromTestCase
+all_suites = {
+    # Lowercase these for pylint/flake8.
+    'suite_Matchiness': load_case(
+        TestMatchiness
+        ),
+    'suite_DisjointSet': load_case(
+        TestDisjointSet
+        ),
+    'suite_CanonicalPlateStore': load_case(
+        TestCanonicalPlateStore
+        ),
+    'suite_PlateIndex': load_case(
+        TestPlateIndex
+        ),
+    }
+
+master_suite = unittest.TestSuite(all_suites.values())
+# pylint: enable=invalid-name
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+if __name__ == '__main__':
+    unittest.main()
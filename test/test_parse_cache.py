@@ -0,0 +1,171 @@
+'''Test cases for the parse_cache.py module.'''
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import csv_parking
+import csv_parking_log
+import parse_cache
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+# Uncomment to show lower level logging statements.
+# import logging
+# logger = logging.getLogger()
+# logger.setLevel(logging.DEBUG)
+# shandler = logging.StreamHandler()
+# shandler.setLevel(logging.INFO)  # Pick one.
+# shandler.setLevel(logging.DEBUG)  # Pick one.
+# logger.addHandler(shandler)
+
+LOG_PATH = 'sample_log_reaL20170202.xlsx'
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+class TestParseCache(unittest.TestCase):
+    '''Test cases for ParseCache and cache keys.'''
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def setUp(self):
+        '''Test case common fixture setup.'''
+
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.tmp_dir, 'cache')
+        self.parse = csv_parking_log.LogParser.parse
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def tearDown(self):
+        '''Test case common fixture teardown.'''
+        csv_parking_log.LogParser.parse = self.parse
+        shutil.rmtree(self.tmp_dir)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_cache_key(self):
+        '''Test which files and options change the cache key.'''
+
+        key = parse_cache.cache_key([LOG_PATH], {'days': 91})
+
+        # The same bytes at another path, with no date in the name
+        # either.
+        copy_path = os.path.join(self.tmp_dir, 'upload.xlsx')
+        shutil.copy(LOG_PATH, copy_path)
+        self.assertEqual(
+            parse_cache.cache_key(
+                [copy_path], {'days': 91, 'jobs': 4, 'columnar': True}
+                ),
+            key
+            )
+
+        other_keys = [
+            parse_cache.cache_key([LOG_PATH], {'days': 30}),
+            parse_cache.cache_key(
+                [LOG_PATH], {'days': 91, 'normalization': ['case']}
+                ),
+            parse_cache.cache_key(
+                [LOG_PATH], {'days': 91, 'incremental': True}
+                ),
+            parse_cache.cache_key(
+                [LOG_PATH],
+                {'days': 91, 'windows': csv_parking_log.DEFAULT_WINDOWS[:1]}
+                ),
+            parse_cache.cache_key([LOG_PATH, copy_path], {'days': 91}),
+            parse_cache.cache_key(['sample_log_30_lines.xlsx'], {'days': 91}),
+            ]
+
+        # A date in the name bounds the valid dates.
+        dated_path = os.path.join(self.tmp_dir, 'upload.20170202.xlsx')
+        shutil.copy(LOG_PATH, dated_path)
+        other_keys.append(parse_cache.cache_key([dated_path], {'days': 91}))
+
+        self.assertEqual(len(set(other_keys + [key])), len(other_keys) + 1)
+
+        with self.assertRaises(ValueError):
+            parse_cache.cache_key([LOG_PATH], {'plate_store_path': 'store'})
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_get_put(self):
+        '''Test saving and finding dashboard data and record tables.'''
+
+        log_parser = csv_parking_log.LogParser(
+            LOG_PATH, days=91, record_table=True
+            )
+        log_parser.parse()
+        dashboard_data = log_parser.dashboard_data()
+
+        cache = parse_cache.ParseCache(self.cache_dir)
+        self.assertEqual(cache.get('a'), None)
+
+        cache.put('a', dashboard_data)
+        self.assertEqual(cache.get('a'), (dashboard_data, None))
+        self.assertEqual(cache.get('a', record_table=True), None)
+
+        cache.put('b', dashboard_data, log_parser.record_table)
+        cached_data, table = cache.get('b', record_table=True)
+        self.assertEqual(cached_data, dashboard_data)
+        self.assertEqual(
+            table.decode_column('canonical_plate'),
+            log_parser.record_table.decode_column('canonical_plate')
+            )
+
+        # A damaged entry is a miss.
+        with open(cache.entry_path('a'), 'wb') as fptr:
+            fptr.write('not gzip')
+        self.assertEqual(cache.get('a'), None)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_evict(self):
+        '''Test that least recently used entries are removed first.'''
+
+        dashboard_data = {'plates': range(1000)}
+        cache = parse_cache.ParseCache(self.cache_dir)
+        for age, key in enumerate(['c', 'b', 'a']):
+            cache.put(key, dashboard_data)
+            os.utime(cache.entry_path(key), (1000 - age, 1000 - age))
+        entry_bytes = os.path.getsize(cache.entry_path('a'))
+
+        # Using 'a' makes 'b' the least recently used.
+        cache.get('a')
+        cache.max_bytes = 3 * entry_bytes
+        cache.put('d', dashboard_data)
+
+        self.assertEqual(
+            sorted(os.listdir(self.cache_dir)),
+            [k + parse_cache.ENTRY_SUFFIX for k in ['a', 'c', 'd']]
+            )
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_process_workbook(self):
+        '''Test that a log processed again is found in the cache.'''
+
+        parser = csv_parking.argument_parser()
+        args = parser.parse_args(['-d', '91', '-C', self.cache_dir, LOG_PATH])
+        dashboard_data = csv_parking.process_workbook(args)
+
+        def parse(_):
+            '''Fail, since a cached log shouldn't be parsed.'''
+            self.fail('log parsed again')
+
+        csv_parking_log.LogParser.parse = parse
+        self.assertEqual(csv_parking.process_workbook(args), dashboard_data)
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+# Define test suite.
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+# pylint: disable=invalid-name
+load_case = unittest.TestLoader().loadTestsFromTestCase
+all_suites = {
+    # Lowercase these.
+    'suite_ParseCache': load_case(
+        TestParseCache
+        ),
+    }
+
+master_suite = unittest.TestSuite(all_suites.values())
+# pylint: enable=invalid-name
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,223 @@
+'''Test cases for the parse_checkpoint.py module.'''
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import csv_parking_log
+import csv_reader
+import parse_checkpoint
+import xlsx_reader
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+# Uncomment to show lower level logging statements.
+# import logging
+# logger = logging.getLogger()
+# logger.setLevel(logging.DEBUG)
+# shandler = logging.StreamHandler()
+# shandler.setLevel(logging.INFO)  # Pick one.
+# shandler.setLevel(logging.DEBUG)  # Pick one.
+# logger.addHandler(shandler)
+
+PARSE_ATTRS = [
+    'rows_parsed', 'header_rows_skipped', 'rows_inprocessed',
+    'records_inprocessed', 'records_out_of_date',
+    ]
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+class TestParseCheckpoint(unittest.TestCase):
+    '''Test cases for parsing logs with a ParseCheckpoint.'''
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def setUp(self):
+        '''Test case common fixture setup.'''
+
+        self.tmp_dir = tempfile.mkdtemp()
+        self.checkpoint_path = os.path.join(self.tmp_dir, 'log.checkpoint')
+        self.rows = list(
+            xlsx_reader.iter_sheet_rows('sample_log_reaL20170202.xlsx')
+            )
+
+        # Count the rows records are created from.
+        self.create_row_records = csv_parking_log.LogParser.create_row_records
+        self.rows_created_from = []
+
+        def create_row_records(log_parser, record_row):
+            '''Count the row, and create its records.'''
+            self.rows_created_from.append(record_row)
+            self.create_row_records(log_parser, record_row)
+
+        csv_parking_log.LogParser.create_row_records = create_row_records
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def tearDown(self):
+        '''Test case common fixture teardown.'''
+        csv_parking_log.LogParser.create_row_records = self.create_row_records
+        shutil.rmtree(self.tmp_dir)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def _parse(self, filepath, rows, **parser_options):
+        '''Write rows to filepath, and parse it with and without the
+        checkpoint, checking both give the same results.
+
+        Returns the number of rows records were created from using the
+        checkpoint.
+        '''
+
+        if filepath.endswith('.csv'):
+            csv_reader.write_csv_rows(rows, filepath)
+        else:
+            xlsx_reader.write_workbook(filepath, [('Sheet1', rows)])
+
+        self.rows_created_from = []
+        log_parser = csv_parking_log.LogParser(
+            filepath, checkpoint_path=self.checkpoint_path, **parser_options
+            )
+        log_parser.parse()
+        rows_created_from = len(self.rows_created_from)
+
+        expected_parser = csv_parking_log.LogParser(
+            filepath, **parser_options
+            )
+        expected_parser.parse()
+
+        for attr in PARSE_ATTRS:
+            self.assertEqual(
+                getattr(log_parser, attr), getattr(expected_parser, attr)
+                )
+        self.assertEqual(
+            [r.to_dict() for r in log_parser.log_records],
+            [r.to_dict() for r in expected_parser.log_records]
+            )
+        self.assertEqual(
+            log_parser.dashboard_data(), expected_parser.dashboard_data()
+            )
+
+        return rows_created_from
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_parse_appended_rows(self):
+        '''Test that only rows appended since the checkpoint are parsed.'''
+
+        # Keep the date in the name; it bounds the valid dates.
+        for filename in [
+                'sample_log_reaL20170202.xlsx', 'sample_log_reaL20170202.csv'
+                ]:  # pylint: disable=bad-continuation
+            filepath = os.path.join(self.tmp_dir, filename)
+            first_count = self._parse(filepath, self.rows[:3000], days=91)
+            appended_count = self._parse(
+                filepath, self.rows[:4000], days=91
+                )
+            self.assertTrue(0 < appended_count <= 1000)
+            self.assertEqual(self._parse(filepath, self.rows[:4000]), 0)
+
+            os.remove(self.checkpoint_path)
+            self.assertEqual(
+                self._parse(filepath, self.rows[:4000], days=91),
+                first_count + appended_count
+                )
+
+            # The checkpoint covers all the rows parsed, and says where
+            # rows added to them will start.
+            with open(self.checkpoint_path) as fptr:
+                saved = json.load(fptr)
+            self.assertEqual(saved['row_count'], 4000)
+            self.assertTrue(saved['position'])
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_parse_appended_non_ascii_row(self):
+        '''Test that a non-ASCII row appended to an ASCII CSV log leaves
+        the parsed rows' hashes unchanged.
+        '''
+
+        rows = list(xlsx_reader.iter_sheet_rows('sample_log_30_lines.xlsx'))
+        filepath = os.path.join(self.tmp_dir, 'sample_log_30_lines.csv')
+
+        self.assertTrue(self._parse(filepath, rows[:28]) > 1)
+
+        # The ASCII file's values are read as str, and all of them are
+        # read as unicode once it holds a non-ASCII value.
+        self.assertTrue(isinstance(
+            next(csv_reader.iter_csv_rows(filepath))[0], str
+            ))
+        appended_row = (u'CAF\xc9',) + rows[28][1:]
+        self.assertEqual(self._parse(filepath, rows[:28] + [appended_row]), 1)
+        self.assertTrue(isinstance(
+            next(csv_reader.iter_csv_rows(filepath))[0], unicode
+            ))
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_parse_appended_rows_columnar(self):
+        '''Test reading appended rows a column at a time.'''
+
+        filepath = os.path.join(self.tmp_dir, 'sample_log_reaL20170202.xlsx')
+        self._parse(filepath, self.rows[:3000], columnar=True)
+        self._parse(filepath, self.rows, columnar=True, days=91)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_parse_edited_rows(self):
+        '''Test that editing parsed rows makes the whole log parsed again.
+        '''
+
+        filepath = os.path.join(self.tmp_dir, 'sample_log_reaL20170202.xlsx')
+        full_count = self._parse(filepath, self.rows, days=91)
+
+        # An edit in the tail of the rows, one before it, and rows
+        # taken away.
+        for row_num in [
+                len(self.rows) - 1, 10
+                ]:  # pylint: disable=bad-continuation
+            rows = list(self.rows)
+            rows[row_num] = (u'EDITED',) + rows[row_num][1:]
+            self.assertEqual(self._parse(filepath, rows, days=91), full_count)
+            self.assertEqual(self._parse(filepath, rows, days=91), 0)
+
+        shrunk_count = self._parse(filepath, self.rows[:-5], days=91)
+        os.remove(self.checkpoint_path)
+        self.assertEqual(
+            self._parse(filepath, self.rows[:-5], days=91), shrunk_count
+            )
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_load_other_parameters(self):
+        '''Test that checkpoints saved with other parameters are discarded.
+        '''
+
+        filepath = os.path.join(self.tmp_dir, 'sample_log_reaL20170202.xlsx')
+        full_count = self._parse(filepath, self.rows)
+
+        with open(self.checkpoint_path) as fptr:
+            saved = json.load(fptr)
+        saved['parameters']['version'] = -1
+        with open(self.checkpoint_path, 'w') as fptr:
+            json.dump(saved, fptr)
+
+        checkpoint = parse_checkpoint.ParseCheckpoint.load(
+            self.checkpoint_path
+            )
+        self.assertEqual((checkpoint.row_count, checkpoint.records), (0, []))
+        self.assertEqual(self._parse(filepath, self.rows), full_count)
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+# Define test suite.
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+# pylint: disable=invalid-name
+load_case = unittest.TestLoader().loadTestsFromTestCase
+all_suites = {
+    # Lowercase these.
+    'suite_ParseCheckpoint': load_case(
+        TestParseCheckpoint
+        ),
+    }
+
+master_suite = unittest.TestSuite(all_suites.values())
+# pylint: enable=invalid-name
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+if __name__ == '__main__':
+    unittest.main()
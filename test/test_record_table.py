@@ -0,0 +1,331 @@
+'''Test cases for the record_table.py module.'''
+
+import json
+import unittest
+
+import csv_parking_log
+import record_table
+from record_table import RecordTable
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+# Uncomment to show lower level logging statements.
+# import logging
+# logger = logging.getLogger()
+# logger.setLevel(logging.DEBUG)
+# shandler = logging.StreamHandler()
+# shandler.setLevel(logging.INFO)  # Pick one.
+# shandler.setLevel(logging.DEBUG)  # Pick one.
+# logger.addHandler(shandler)
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def _log_records():
+    '''Return a few log records, with canonical plates set.'''
+
+    log_records = [
+        csv_parking_log.LogRecord(plate, log_date, record_type, make='Audi')
+        for plate, log_date, record_type in [
+            ('7DYB056', '1.02.17', 'first'),
+            ('7DYB056', '1.02.17', 'tow'),
+            ('7DYBO56', '1.04.17', 'second'),
+            ('ABC123', '1.03.17', 'first'),
+            ('7DYB056', '1.01.17', 'first'),
+            ]
+        ]
+    for log_record in log_records:
+        log_record.canonical_plate = log_record.plate.replace('O', '0')
+    return log_records
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+class TestRecordTable(unittest.TestCase):
+    '''Test cases for RecordTable, with and without numpy.'''
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def setUp(self):
+        '''Test case common fixture setup.'''
+        self.numpy = record_table.numpy
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def tearDown(self):
+        '''Test case common fixture teardown.'''
+        record_table.numpy = self.numpy
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_text_dictionary(self):
+        '''Test encoding and decoding text.'''
+
+        dictionary = record_table.TextDictionary()
+        self.assertEqual(
+            [dictionary.encode(v) for v in [u'a', u'b', u'a', None]],
+            [0, 1, 0, record_table.NO_CODE]
+            )
+        self.assertEqual(len(dictionary), 2)
+        self.assertEqual(
+            [dictionary.decode(c) for c in [1, 0, record_table.NO_CODE]],
+            [u'b', u'a', None]
+            )
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_columns(self):
+        '''Test filling the table and reading its columns.'''
+
+        log_records = _log_records()
+
+        for record_table.numpy in set([None, self.numpy]):
+            table = RecordTable()
+            table.extend([])
+            self.assertEqual(len(table), 0)
+            self.assertEqual(list(table.column('plate')), [])
+
+            # Add records a few at a time, so the arrays grow.
+            for start in range(0, len(log_records), 2):
+                table.extend(log_records[start:start + 2])
+
+            self.assertEqual(len(table), len(log_records))
+            self.assertEqual(
+                list(table.column('refdt_offset')),
+                [r.refdt_offset for r in log_records]
+                )
+            for name in ['plate', 'canonical_plate', 'record_type', 'color']:
+                self.assertEqual(
+                    table.decode_column(name),
+                    [getattr(r, name) for r in log_records]
+                    )
+
+            # Plates and canonical plates share codes.
+            plate_code = table.column('plate')[0]
+            self.assertEqual(
+                list(table.column('canonical_plate'))[:3], [plate_code] * 3
+                )
+            self.assertNotEqual(table.column('plate')[2], plate_code)
+            self.assertEqual(list(table.column('make')), [0] * 5)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_append(self):
+        '''Test adding records one at a time, and setting their
+        canonical plates afterwards.
+        '''
+
+        log_records = _log_records()
+
+        for record_table.numpy in set([None, self.numpy]):
+            table = RecordTable()
+            table.set_canonical_plates({})
+            for log_record in log_records:
+                table.append(log_record)
+
+            expected = RecordTable(log_records)
+            self.assertEqual(len(table), len(expected))
+            self.assertEqual(
+                list(table.column('refdt_offset')),
+                list(expected.column('refdt_offset'))
+                )
+            for name in ['plate', 'canonical_plate', 'record_type', 'make']:
+                self.assertEqual(
+                    table.decode_column(name), expected.decode_column(name)
+                    )
+
+            table.set_canonical_plates(
+                {'7DYB056': u'7DYB056', '7DYBO56': u'7DYB056', 'X': u'Y'}
+                )
+            self.assertEqual(
+                table.decode_column('canonical_plate'),
+                [u'7DYB056', u'7DYB056', u'7DYB056', None, u'7DYB056']
+                )
+            self.assertEqual(
+                list(table.column('canonical_plate'))[:3],
+                [table.column('plate')[0]] * 3
+                )
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_to_dict(self):
+        '''Test that a table made from its dictionary is the same.'''
+
+        for record_table.numpy in set([None, self.numpy]):
+            for log_records in [[], _log_records()]:
+                table = RecordTable(log_records)
+                table_dict = json.loads(json.dumps(table.to_dict()))
+                copy = RecordTable.from_dict(table_dict)
+
+                self.assertEqual(len(copy), len(table))
+                for name in record_table.COLUMNS:
+                    self.assertEqual(
+                        list(copy.column(name)), list(table.column(name))
+                        )
+                self.assertEqual(
+                    copy.decode_column('plate'), table.decode_column('plate')
+                    )
+                self.assertEqual(
+                    map(list, copy.plate_days()), map(list, table.plate_days())
+                    )
+
+                # New records reuse the codes.
+                copy.extend(_log_records()[:1])
+                self.assertEqual(
+                    len(copy.dictionaries['plate']),
+                    max(len(table.dictionaries['plate']), 1)
+                    )
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_plate_days(self):
+        '''Test finding the distinct days plates were logged.'''
+
+        table_offsets = {}
+        for record_table.numpy in set([None, self.numpy]):
+            table = RecordTable(_log_records())
+            codes = table.dictionaries['plate'].codes
+            base = min(table.column('refdt_offset'))
+
+            plates, offsets = table.plate_days()
+            self.assertEqual(
+                zip(list(plates), [o - base for o in offsets]),
+                [(codes['7DYB056'], 0), (codes['7DYB056'], 1),
+                 (codes['7DYB056'], 3), (codes['ABC123'], 2)]
+                )
+            table_offsets[record_table.numpy] = list(offsets)
+
+            plates, offsets = table.plate_days(['second', 'tow', 'nope'])
+            self.assertEqual(
+                zip(list(plates), [o - base for o in offsets]),
+                [(codes['7DYB056'], 1), (codes['7DYB056'], 3)]
+                )
+
+            plates, offsets = table.plate_days(['nope'])
+            self.assertEqual((list(plates), list(offsets)), ([], []))
+
+        self.assertEqual(len(set(map(tuple, table_offsets.values()))), 1)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_plate_day_counts(self):
+        '''Test counting the days plates were logged in trailing windows.
+        '''
+
+        for record_table.numpy in set([None, self.numpy]):
+            table = RecordTable(_log_records())
+            codes = table.dictionaries['plate'].codes
+
+            plates, offsets, counts = table.plate_day_counts(2)
+            self.assertEqual(
+                (list(plates), list(offsets)),
+                tuple(map(list, table.plate_days()))
+                )
+            # 7DYB056 on days 0, 1 and 3; ABC123 on day 2, just after
+            # the other plate's day 1, which isn't counted.
+            self.assertEqual(
+                zip(list(plates), list(counts)),
+                [(codes['7DYB056'], 1), (codes['7DYB056'], 2),
+                 (codes['7DYB056'], 1), (codes['ABC123'], 1)]
+                )
+            self.assertEqual(list(table.plate_day_counts(4)[2]), [1, 2, 3, 1])
+            self.assertEqual(
+                list(table.plate_day_counts(4, ['second'])[2]), [1]
+                )
+            self.assertEqual(
+                list(table.plate_day_counts(4, ['nope'])[2]), []
+                )
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    @unittest.skipIf(record_table.numpy is None, 'numpy is not installed')
+    def test_to_numpy(self):
+        '''Test that NumPy arrays share the table's memory.'''
+
+        table = RecordTable(_log_records())
+        arrays = table.to_numpy()
+        self.assertEqual(sorted(arrays), sorted(record_table.COLUMNS))
+        for name, values in arrays.items():
+            self.assertTrue(record_table.numpy.shares_memory(
+                values, table.column(name)
+                ))
+            self.assertEqual(list(values), list(table.column(name)))
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    @unittest.skipIf(record_table.pandas is None, 'pandas is not installed')
+    def test_to_dataframe(self):
+        '''Test that a DataFrame shares the table's memory.'''
+
+        table = RecordTable(_log_records())
+        dataframe = table.to_dataframe()
+        self.assertEqual(list(dataframe.columns), list(record_table.COLUMNS))
+        self.assertTrue(record_table.numpy.shares_memory(
+            dataframe['plate'].values, table.column('plate')
+            ))
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_log_parser_record_table(self):
+        '''Test that LogParser fills a table with its retained records.'''
+        # pylint: disable=protected-access
+
+        log_parser = csv_parking_log.LogParser(
+            filepath='sample_log_reaL20170202.xlsx', days=91,
+            record_table=True
+            )
+        log_parser.parse()
+        table = log_parser.record_table
+
+        self.assertEqual(len(table), len(log_parser.log_records))
+        self.assertEqual(
+            table.decode_column('canonical_plate'),
+            [r.canonical_plate for r in log_parser.log_records]
+            )
+
+        plates, _ = table.plate_days()
+        self.assertEqual(
+            len(plates),
+            sum(
+                len(v) for v in log_parser._plate_record_set_index.values()
+                )
+            )
+
+        self.assertTrue(
+            csv_parking_log.LogParser(
+                filepath='sample_log_30_lines.xlsx'
+                ).record_table is None
+            )
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_log_parser_table_window_totals(self):
+        '''Test that window totals from the table match the record sets'.
+        '''
+
+        for record_table.numpy in set([None, self.numpy]):
+            log_parser = csv_parking_log.LogParser(
+                filepath='sample_log_reaL20170202.xlsx',
+                start_date='2016-10-01', end_date='2016-12-15'
+                )
+            log_parser.parse()
+            table_parser = csv_parking_log.LogParser(
+                filepath='sample_log_reaL20170202.xlsx',
+                start_date='2016-10-01', end_date='2016-12-15',
+                record_table=True
+                )
+            table_parser.parse()
+
+            dashboard_data = log_parser.dashboard_data()
+            self.assertTrue(any(
+                window_total['value']
+                for plate_data in dashboard_data['records_by_lic'].values()
+                for window_total in plate_data['window_total']
+                ))
+            self.assertEqual(table_parser.dashboard_data(), dashboard_data)
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+# Define test suite.
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+# pylint: disable=invalid-name
+load_case = unittest.TestLoader().loadTestsFromTestCase
+all_suites = {
+    # Lowercase these.
+    'suite_RecordTable': load_case(
+        TestRecordTable
+        ),
+    }
+
+master_suite = unittest.TestSuite(all_suites.values())
+# pylint: enable=invalid-name
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+if __name__ == '__main__':
+    unittest.main()
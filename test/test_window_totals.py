@@ -0,0 +1,197 @@
+'''Test cases for the window_totals.py module.'''
+
+import random
+import unittest
+
+import csv_parking_log
+import window_totals
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+# Uncomment to show lower level logging statements.
+# import logging
+# logger = logging.getLogger()
+# logger.setLevel(logging.DEBUG)
+# shandler = logging.StreamHandler()
+# shandler.setLevel(logging.INFO)  # Pick one.
+# shandler.setLevel(logging.DEBUG)  # Pick one.
+# logger.addHandler(shandler)
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+class TestTrailingWindowCounts(unittest.TestCase):
+    '''Test cases for window_totals.trailing_window_counts().'''
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_trailing_window_counts(self):
+        '''Test counting over windows of five days.'''
+
+        offsets = [10, 11, 14, 15, 16, 30]
+        self.assertEqual(
+            window_totals.trailing_window_counts(offsets, [True] * 6, 5),
+            [1, 2, 3, 3, 3, 1]
+            )
+        self.assertEqual(
+            window_totals.trailing_window_counts(
+                offsets, [True, False, True, False, True, True], 5
+                ),
+            [1, 1, 2, 1, 2, 1]
+            )
+        self.assertEqual(
+            window_totals.trailing_window_counts([], [], 5), []
+            )
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_trailing_window_counts_brute_force(self):
+        '''Test that counts match counting each window separately.'''
+
+        rand = random.Random(17)
+        offsets = sorted(rand.sample(range(400), 150))
+        selected = [rand.random() < 0.6 for _ in offsets]
+
+        for days in [1, 3, 5, 14, 30, 1000]:
+            self.assertEqual(
+                window_totals.trailing_window_counts(offsets, selected, days),
+                [
+                    sum(
+                        1 for i in range(end + 1)
+                        if selected[i] and offsets[i] > offsets[end] - days
+                        )
+                    for end in range(len(offsets))
+                    ]
+                )
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+class TestWindowTotals(unittest.TestCase):
+    '''Test cases for window_totals.window_totals(), with and without numpy.
+    '''
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def setUp(self):
+        '''Test case common fixture setup.'''
+        self.numpy = window_totals.numpy
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def tearDown(self):
+        '''Test case common fixture teardown.'''
+        window_totals.numpy = self.numpy
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_parse_window(self):
+        '''Test parsing window definitions.'''
+
+        self.assertEqual(
+            window_totals.parse_window('log1-short:30'),
+            window_totals.Window('log1-short', 30, 0)
+            )
+        self.assertEqual(
+            window_totals.parse_window('log5-week:7:3'),
+            window_totals.Window('log5-week', 7, 3)
+            )
+        for text in ['log1', ':30', 'log1:x', 'log1:30:3:1']:
+            with self.assertRaises(ValueError):
+                window_totals.parse_window(text)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_window_totals(self):
+        '''Test totals against counting each window separately.'''
+
+        rand = random.Random(19)
+        num_plates = 20
+        entries = [
+            (
+                rand.randrange(num_plates),
+                rand.randrange(-2, 200),
+                rand.randrange(1, 6)
+                )
+            for _ in range(500)
+            ]
+        windows = [
+            window_totals.Window('a', 30, 0),
+            window_totals.Window('b', 90, 3),
+            window_totals.Window('c', 0, 0),
+            window_totals.Window('d', 14, 3),
+            window_totals.Window('e', -1, 0),
+            ]
+
+        expected = [
+            [
+                sum(
+                    1 for code, days, total in entries
+                    if code == plate_code and max(days, 0) <= window.days
+                    and total >= window.min_five_day_total
+                    )
+                for window in windows
+                ]
+            for plate_code in range(num_plates)
+            ]
+
+        for window_totals.numpy in set([None, self.numpy]):
+            self.assertEqual(
+                window_totals.window_totals(
+                    *(zip(*entries) + [windows, num_plates])
+                    ),
+                expected
+                )
+            self.assertEqual(
+                window_totals.window_totals([], [], [], windows, 2),
+                [[0] * len(windows)] * 2
+                )
+            self.assertEqual(
+                window_totals.window_totals([0], [1], [1], [], 1), [[]]
+                )
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_log_parser_windows(self):
+        '''Test configuring the dashboard's window totals.'''
+
+        # Without days, the end date is far off, so cover all of it.
+        all_days = csv_parking_log.DEFAULT_END_REFDT_OFFSET
+        windows = [
+            window_totals.Window('all', all_days, 0),
+            window_totals.Window('log5-all', all_days, 3),
+            ]
+        log_parser = csv_parking_log.LogParser(
+            filepath='sample_log_reaL20170202.xlsx', windows=windows
+            )
+        log_parser.parse()
+        records_by_lic = log_parser.dashboard_data()['records_by_lic']
+
+        for plate_data in records_by_lic.values():
+            guest_parking = [
+                record_set for record_set in plate_data['records']
+                if record_set['record_class']['guest_parking']
+                ]
+            self.assertEqual(
+                plate_data['window_total'],
+                [
+                    {'key': 'all', 'value': len(guest_parking)},
+                    {'key': 'log5-all', 'value': len([
+                        s for s in guest_parking if s['five_day_total'] >= 3
+                        ])},
+                    ]
+                )
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+# Define test suite.
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+# pylint: disable=invalid-name
+load_case = unittest.TestLoader().loadTestsFromTestCase
+all_suites = {
+    # Lowercase these.
+    'suite_TrailingWindowCounts': load_case(
+        TestTrailingWindowCounts
+        ),
+    'suite_WindowTotals': load_case(
+        TestWindowTotals
+        ),
+    }
+
+master_suite = unittest.TestSuite(all_suites.values())
+# pylint: enable=invalid-name
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+if __name__ == '__main__':
+    unittest.main()
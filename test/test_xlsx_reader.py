@@ -0,0 +1,264 @@
+'''Test cases for the xlsx_reader.py module.'''
+
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+import xlrd
+from xlrd import XLRDError
+
+import xlsx_reader
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+# Uncomment to show lower level logging statements.
+# import logging
+# logger = logging.getLogger()
+# logger.setLevel(logging.DEBUG)
+# shandler = logging.StreamHandler()
+# shandler.setLevel(logging.INFO)  # Pick one.
+# shandler.setLevel(logging.DEBUG)  # Pick one.
+# logger.addHandler(shandler)
+
+WORKBOOK_XML = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+ xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<sheets>
+<sheet name="Other" sheetId="1" r:id="rId1"/>
+<sheet name="Sheet1" sheetId="2" r:id="rId2"/>
+</sheets>
+</workbook>
+'''
+
+WORKBOOK_RELS_XML = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships
+ xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Target="worksheets/sheet1.xml"
+ Type="%(rel_type)s/worksheet"/>
+<Relationship Id="rId2" Target="worksheets/sheet2.xml"
+ Type="%(rel_type)s/worksheet"/>
+<Relationship Id="rId3" Target="sharedStrings.xml"
+ Type="%(rel_type)s/sharedStrings"/>
+</Relationships>
+''' % {'rel_type': xlsx_reader.REL_NAMESPACE}
+
+SHARED_STRINGS_XML = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">
+<si><t>LIC#</t></si>
+<si><r><t>7DYB</t></r><r><t xml:space="preserve">056 </t></r></si>
+</sst>
+'''
+
+OTHER_SHEET_XML = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">
+<sheetData><row r="1"><c r="A1"><v>99</v></c></row></sheetData>
+</worksheet>
+'''
+
+SHEET_XML = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">
+<sheetData>
+<row r="1"><c r="B1" t="s"><v>0</v></c></row>
+<row r="2"><c r="A2" s="3"/><c r="B2" s="3"/></row>
+<row r="4"><c r="A4"><v>42736</v></c><c r="B4" t="s"><v>1</v></c>
+<c r="C4" t="b"><v>1</v></c><c r="E4" t="inlineStr"><is><t>x</t></is></c>
+<c r="F4"/></row>
+<row r="5"><c r="A5" s="3"/></row>
+</sheetData>
+</worksheet>
+'''
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+class TestXlsxReader(unittest.TestCase):
+    '''Test cases for xlsx_reader.iter_sheet_rows().'''
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def setUp(self):
+        '''Test case common fixture setup.'''
+
+        self.tmp_dir = tempfile.mkdtemp()
+        self.workbook_path = os.path.join(self.tmp_dir, 'workbook.xlsx')
+
+        with zipfile.ZipFile(self.workbook_path, 'w') as zip_file:
+            zip_file.writestr('xl/workbook.xml', WORKBOOK_XML)
+            zip_file.writestr('xl/_rels/workbook.xml.rels', WORKBOOK_RELS_XML)
+            zip_file.writestr('xl/sharedStrings.xml', SHARED_STRINGS_XML)
+            zip_file.writestr('xl/worksheets/sheet1.xml', OTHER_SHEET_XML)
+            zip_file.writestr('xl/worksheets/sheet2.xml', SHEET_XML)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def tearDown(self):
+        '''Test case common fixture teardown.'''
+        shutil.rmtree(self.tmp_dir)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_iter_sheet_rows(self):
+        '''Test reading values, gaps and ragged rows.'''
+
+        rows = list(xlsx_reader.iter_sheet_rows(self.workbook_path))
+
+        self.assertEqual(
+            rows,
+            [
+                (u'', u'LIC#'),
+                (),
+                (),
+                (42736.0, u'7DYB056 ', 1, u'', u'x'),
+                ]
+            )
+        self.assertTrue(isinstance(rows[3][1], unicode))
+
+        self.assertEqual(
+            list(xlsx_reader.iter_sheet_rows(self.workbook_path, columns=[1])),
+            [(u'', u'LIC#'), (), (), (u'', u'7DYB056 ')]
+            )
+
+        self.assertEqual(
+            list(xlsx_reader.iter_sheet_rows(self.workbook_path, 'Other')),
+            [(99.0,)]
+            )
+
+        with self.assertRaises(XLRDError):
+            list(xlsx_reader.iter_sheet_rows(self.workbook_path, 'Nope'))
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_iter_sheet_rows_matches_xlrd(self):
+        '''Test that sample log rows match the values xlrd reads.'''
+
+        for filepath in [
+                'sample_log_30_lines.xlsx',
+                'sample_log_typemix.xlsx',
+                'sample_log_reaL20170202.xlsx',
+                ]:  # pylint: disable=bad-continuation
+
+            sheet = xlrd.open_workbook(filepath).sheet_by_name('Sheet1')
+            expected = []
+            for row_num in range(sheet.nrows):
+                values = sheet.row_values(row_num)
+                while values and values[-1] == u'':
+                    values.pop()
+                expected.append(tuple(values))
+
+            self.assertEqual(
+                list(xlsx_reader.iter_sheet_rows(filepath)), expected
+                )
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_sheet_names(self):
+        '''Test listing worksheets, with and without xlrd.'''
+
+        self.assertEqual(
+            xlsx_reader.sheet_names(self.workbook_path), ['Other', 'Sheet1']
+            )
+        self.assertEqual(
+            xlsx_reader.sheet_names('sample_log_30_lines.xlsx'),
+            xlrd.open_workbook('sample_log_30_lines.xlsx').sheet_names()
+            )
+        with self.assertRaises(XLRDError):
+            xlsx_reader.sheet_names('sample_log_empty.txt')
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_write_workbook(self):
+        '''Test that written rows read back the same, here and in xlrd.'''
+
+        rows = list(xlsx_reader.iter_sheet_rows('sample_log_typemix.xlsx'))
+        sheets = [
+            (u'Log & <notes>', rows),
+            (u'Empty', []),
+            (u'Gaps', [(), (u'', 1.5, u' a\xe9 '), (), (u'x',)]),
+            ]
+        filepath = os.path.join(self.tmp_dir, 'written.xlsx')
+        xlsx_reader.write_workbook(filepath, sheets)
+
+        self.assertEqual(
+            xlsx_reader.sheet_names(filepath), [name for name, _ in sheets]
+            )
+        workbook = xlrd.open_workbook(filepath)
+        for name, sheet_rows in sheets:
+            self.assertEqual(
+                list(xlsx_reader.iter_sheet_rows(filepath, name)),
+                [tuple(row) for row in sheet_rows]
+                )
+            self.assertEqual(
+                workbook.sheet_by_name(name).nrows, len(sheet_rows)
+                )
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_iter_sheet_rows_after(self):
+        '''Test reading only the rows after a row position.'''
+
+        # Rows with gaps, and a log whose last rows have no values.
+        for filepath, sheet_name in [
+                (self.workbook_path, 'Sheet1'),
+                ('sample_log_reaL20170202.xlsx', 'Sheet1'),
+                ]:  # pylint: disable=bad-continuation
+            rows = list(xlsx_reader.iter_sheet_rows(filepath, sheet_name))
+            for row_count in [1, len(rows)]:
+                position = xlsx_reader.sheet_row_position(
+                    filepath, sheet_name, row_count
+                    )
+                self.assertEqual(
+                    list(xlsx_reader.iter_sheet_rows_after(
+                        filepath, sheet_name, position
+                        )),
+                    rows[row_count:]
+                    )
+
+        # Rows are only found by number up to a row with values.
+        self.assertIsNone(
+            xlsx_reader.sheet_row_position(self.workbook_path, 'Sheet1', 3)
+            )
+
+        # Appended rows follow on; edited ones don't.
+        rows = list(xlsx_reader.iter_sheet_rows('sample_log_30_lines.xlsx'))
+        filepath = os.path.join(self.tmp_dir, 'written.xlsx')
+        xlsx_reader.write_workbook(filepath, [('Sheet1', rows[:20])])
+        position = xlsx_reader.sheet_row_position(filepath, 'Sheet1', 20)
+        xlsx_reader.write_workbook(filepath, [('Sheet1', rows)])
+        self.assertEqual(
+            list(xlsx_reader.iter_sheet_rows_after(
+                filepath, 'Sheet1', position
+                )),
+            rows[20:]
+            )
+        xlsx_reader.write_workbook(filepath, [('Sheet1', rows[1:])])
+        self.assertIsNone(
+            xlsx_reader.iter_sheet_rows_after(filepath, 'Sheet1', position)
+            )
+
+        self.assertIsNone(
+            xlsx_reader.sheet_row_position(filepath, 'Sheet1', len(rows))
+            )
+        self.assertIsNone(
+            xlsx_reader.sheet_row_position('sample_log_empty.txt', 'Sheet1', 1)
+            )
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def test_iter_sheet_rows_not_xlsx(self):
+        '''Test that files which aren't zip archives go to xlrd.'''
+
+        with self.assertRaises(XLRDError):
+            list(xlsx_reader.iter_sheet_rows('sample_log_empty.txt'))
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+# Define test suite.
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+# pylint: disable=invalid-name
+load_case = unittest.TestLoader().loadTestsFromTestCase
+all_suites = {
+    # Lowercase these.
+    'suite_XlsxReader': load_case(
+        TestXlsxReader
+        ),
+    }
+
+master_suite = unittest.TestSuite(all_suites.values())
+# pylint: enable=invalid-name
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,159 @@
+'''Count parking log entries over windows of days.
+
+Trailing window counts are taken for a plate's plate record sets, or
+anything else with a refdt offset, in refdt offset order. Each count
+is taken in a single pass, with a running count over a sliding window,
+so it costs the same however long the window is.
+
+Dashboard window totals are taken for all plates at once: with NumPy
+installed, each plate's entries are binned into a histogram by days
+before the end date, and each window total is read from the histogram's
+prefix sums.
+'''
+
+import collections
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# A dashboard window total: key names it in the dashboard's
+# window_total list, which counts entries from the last days days
+# before the end date that have a five day total of at least
+# min_five_day_total.
+Window = collections.namedtuple(
+    'Window', ['key', 'days', 'min_five_day_total']
+    )
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def trailing_window_counts(refdt_offsets, selected, days):
+    '''Count selected entries in the trailing window ending at each entry.
+
+    Arguments:
+
+        refdt_offsets (sequence):
+            The entries' refdt offsets, in ascending order.
+
+        selected (sequence):
+            For each entry, whether it is counted.
+
+        days (int):
+            The length of the window. The window for an entry on
+            offset d covers offsets d - days + 1 through d.
+
+    Returns a list with, for each entry, the number of selected
+    entries in its window, up to and including the entry itself.
+    '''
+
+    counts = []
+    count = 0
+    start = 0
+
+    for end, refdt_offset in enumerate(refdt_offsets):
+        if selected[end]:
+            count += 1
+
+        # Drop the entries that have fallen out of the window.
+        while refdt_offsets[start] <= refdt_offset - days:
+            if selected[start]:
+                count -= 1
+            start += 1
+
+        counts.append(count)
+
+    return counts
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def parse_window(text):
+    '''Parse a Window from KEY:DAYS or KEY:DAYS:MIN_FIVE_DAY_TOTAL text.
+
+    Raises ValueError if the text isn't in either form.
+    '''
+
+    fields = text.split(':')
+    if len(fields) not in (2, 3) or not fields[0]:
+        raise ValueError('not a window: %s' % text)
+
+    min_five_day_total = int(fields[2]) if len(fields) == 3 else 0
+    return Window(fields[0], int(fields[1]), min_five_day_total)
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def window_totals(
+        plate_codes, days_before_end, five_day_totals, windows, num_plates
+        ):  # pylint: disable=bad-continuation
+    '''Total entries over windows before the end date, for every plate.
+
+    Arguments:
+
+        plate_codes (sequence):
+            For each entry, the code of its plate, from 0 up to
+            num_plates.
+
+        days_before_end (sequence):
+            For each entry, the number of days from its date to the
+            end date. An entry is in a window if this is no more than
+            the window's days.
+
+        five_day_totals (sequence):
+            For each entry, its five day total.
+
+        windows (list):
+            The ``Window`` definitions to total.
+
+        num_plates (int):
+            The number of plates.
+
+    Returns a list with, for each plate code, a list of the plate's
+    totals for each window, in windows order.
+    '''
+
+    # Entries on or after the end date are in every window.
+    if numpy is None:
+        totals = [[0] * len(windows) for _ in range(num_plates)]
+        for plate_code, days, five_day_total in zip(
+                plate_codes, days_before_end, five_day_totals
+                ):  # pylint: disable=bad-continuation
+            for window_num, window in enumerate(windows):
+                if (
+                        max(days, 0) <= window.days and
+                        five_day_total >= window.min_five_day_total
+                        ):  # pylint: disable=bad-continuation
+                    totals[plate_code][window_num] += 1
+        return totals
+
+    totals = numpy.zeros((num_plates, len(windows)), dtype=int)
+    if not windows or not len(plate_codes):
+        return totals.tolist()
+
+    plate_codes = numpy.asarray(plate_codes, dtype=int)
+    five_day_totals = numpy.asarray(five_day_totals, dtype=int)
+
+    # So entries on or after the end date go in the first bin, and
+    # entries older than every window go in none.
+    max_days = max(max(window.days for window in windows), 0)
+    days_before_end = numpy.maximum(
+        numpy.asarray(days_before_end, dtype=int), 0
+        )
+    in_range = days_before_end <= max_days
+
+    # Windows with the same minimum five day total share a histogram.
+    for min_five_day_total in set(w.min_five_day_total for w in windows):
+        selected = in_range & (five_day_totals >= min_five_day_total)
+        histograms = numpy.bincount(
+            plate_codes[selected] * (max_days + 1) +
+            days_before_end[selected],
+            minlength=num_plates * (max_days + 1)
+            ).reshape(num_plates, max_days + 1)
+        prefix_sums = histograms.cumsum(axis=1)
+
+        for window_num, window in enumerate(windows):
+            if window.min_five_day_total != min_five_day_total:
+                continue
+            if window.days >= 0:
+                totals[:, window_num] = prefix_sums[:, window.days]
+
+    return totals.tolist()
@@ -0,0 +1,684 @@
+'''Stream worksheet rows out of an xlsx workbook.
+
+xlrd.open_workbook() decodes every sheet of a workbook, with a Cell
+instance per cell, before we can look at the first row. For the large
+archive logs that is most of our memory use, so here we read a single
+worksheet straight out of the xlsx zip with an incremental XML parser,
+yielding a tuple of plain cell values per row and discarding each row
+element once it has been read. Only the shared strings table is held in
+memory.
+
+Values follow xlrd's conventions: text is unicode, numbers (including
+Excel dates) are floats, booleans are ints, error cells are xlrd error
+codes and empty cells are u''. Rows are ragged: each tuple stops at the
+last cell in the row with a value, and rows with no values at all are
+yielded as empty tuples, so row positions match the spreadsheet.
+
+Files that aren't zip archives (e.g. legacy .xls workbooks, or empty
+and damaged files) are handed to xlrd, so they are read, or fail, just
+as they did before.
+
+write_workbook() writes rows back out as a minimal xlsx workbook, for
+tests and benchmarks that need logs of a particular shape.
+'''
+
+import logging
+# Set default logging handler to avoid "No handler found" warnings.
+try:  # Python 2.7+
+    from logging import NullHandler
+except ImportError:
+    class NullHandler(logging.Handler):
+        '''Placeholder handler.'''
+        def emit(self, record):
+            pass
+import hashlib
+import posixpath
+import re
+try:
+    import xml.etree.cElementTree as ElementTree
+except ImportError:
+    import xml.etree.ElementTree as ElementTree
+from xml.sax.saxutils import escape
+import zipfile
+
+import xlrd
+from xlrd.xlsx import error_code_from_text
+
+logging.getLogger(__name__).addHandler(NullHandler())
+
+DEFAULT_SHEET_NAME = 'Sheet1'
+
+MAIN_NAMESPACE = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+REL_NAMESPACE = (
+    'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+    )
+PACKAGE_REL_NAMESPACE = (
+    'http://schemas.openxmlformats.org/package/2006/relationships'
+    )
+
+WORKBOOK_PATH = 'xl/workbook.xml'
+WORKBOOK_RELS_PATH = 'xl/_rels/workbook.xml.rels'
+DEFAULT_SHARED_STRINGS_PATH = 'xl/sharedStrings.xml'
+
+_SHEET_TAG = '{%s}sheet' % MAIN_NAMESPACE
+_SHEET_DATA_TAG = '{%s}sheetData' % MAIN_NAMESPACE
+_ROW_TAG = '{%s}row' % MAIN_NAMESPACE
+_CELL_TAG = '{%s}c' % MAIN_NAMESPACE
+_VALUE_TAG = '{%s}v' % MAIN_NAMESPACE
+_INLINE_STRING_TAG = '{%s}is' % MAIN_NAMESPACE
+_SHARED_STRING_TAG = '{%s}si' % MAIN_NAMESPACE
+_RUN_TAG = '{%s}r' % MAIN_NAMESPACE
+_TEXT_TAG = '{%s}t' % MAIN_NAMESPACE
+_RELATIONSHIP_TAG = '{%s}Relationship' % PACKAGE_REL_NAMESPACE
+_REL_ID_ATTR = '{%s}id' % REL_NAMESPACE
+_XML_SPACE_ATTR = '{http://www.w3.org/XML/1998/namespace}space'
+
+_XML_WHITESPACE = '\t\n \r'
+_SHEET_DATA_START_RE = re.compile(r'<sheetData\s*>')
+_ROW_END = '</row>'
+_ESCAPE_RE = re.compile(r'_x[0-9A-Fa-f]{4}_', re.UNICODE)
+_CELL_REF_DIGITS = '$0123456789'
+
+# Column letters seen so far, and their 0-based column indices.
+_COLUMN_INDEX_CACHE = {}
+
+EMPTY_VALUE = u''
+
+# The parts write_workbook() writes, besides the worksheets.
+CONTENT_TYPES_PATH = '[Content_Types].xml'
+ROOT_RELS_PATH = '_rels/.rels'
+
+_XML_DECLARATION = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    )
+_OFFICE_DOC_TYPE = (
+    'http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+    'officeDocument'
+    )
+_WORKSHEET_TYPE = '%s/worksheet' % REL_NAMESPACE
+_SPREADSHEET_CONTENT_TYPE = (
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.%s+xml'
+    )
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def _column_index(cell_ref):
+    '''Convert a cell reference like 'AB12' to a 0-based column index.
+
+    The letters are cached, since every row repeats the same ones.
+    '''
+    letters = cell_ref.rstrip(_CELL_REF_DIGITS).replace('$', '')
+    try:
+        return _COLUMN_INDEX_CACHE[letters]
+    except KeyError:
+        index = 0
+        for letter in letters:
+            index = index * 26 + ord(letter) - ord('A') + 1
+        _COLUMN_INDEX_CACHE[letters] = index - 1
+        return index - 1
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def _column_letters(index):
+    '''Convert a 0-based column index to column letters, like 'AB'.'''
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def _element_text(elem):
+    '''Return the unicode text of a <t> or <v> element, as xlrd does.'''
+    text = elem.text
+    if text is None:
+        return EMPTY_VALUE
+    if elem.get(_XML_SPACE_ATTR) != 'preserve':
+        text = text.strip(_XML_WHITESPACE)
+    if '_' in text:
+        text = _ESCAPE_RE.sub(
+            lambda mobj: unichr(int(mobj.group(0)[2:6], 16)), text
+            )
+    return unicode(text)
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def _rich_text(elem):
+    '''Join the text runs of a shared (<si>) or inline (<is>) string.'''
+    pieces = []
+    for child in elem:
+        if child.tag == _TEXT_TAG:
+            pieces.append(_element_text(child))
+        elif child.tag == _RUN_TAG:
+            pieces.extend(
+                _element_text(t) for t in child if t.tag == _TEXT_TAG
+                )
+    return EMPTY_VALUE.join(pieces)
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def _child_text(elem, tag):
+    '''Return the raw text of the first child of elem with this tag.'''
+    for child in elem:
+        if child.tag == tag:
+            return child.text
+    return None
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def _cell_value(cell, shared_strings):
+    '''Convert a <c> element to the value xlrd would give it.'''
+
+    cell_type = cell.get('t', 'n')
+
+    if cell_type == 'n':
+        value = _child_text(cell, _VALUE_TAG)
+        return float(value) if value else EMPTY_VALUE
+
+    if cell_type == 's':
+        value = _child_text(cell, _VALUE_TAG)
+        return shared_strings[int(value)] if value else EMPTY_VALUE
+
+    if cell_type == 'str':
+        for child in cell:
+            if child.tag == _VALUE_TAG:
+                return _element_text(child)
+        return EMPTY_VALUE
+
+    if cell_type == 'b':
+        value = _child_text(cell, _VALUE_TAG)
+        return 1 if value in ('1', 'true', 'on') else 0
+
+    if cell_type == 'e':
+        value = _child_text(cell, _VALUE_TAG) or '#N/A'
+        return error_code_from_text[value]
+
+    if cell_type == 'inlineStr':
+        for child in cell:
+            if child.tag == _INLINE_STRING_TAG:
+                return _rich_text(child)
+            if child.tag == _VALUE_TAG and child.text:
+                return unicode(child.text)
+        return EMPTY_VALUE
+
+    raise ValueError('unknown cell type %r in cell %s' % (
+        cell_type, cell.get('r')
+        ))
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def _resolve_part(target):
+    '''Convert a workbook relationship target to a zip member name.'''
+    if target.startswith('/'):
+        return target[1:]
+    return posixpath.normpath(posixpath.join('xl', target))
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def _find_parts(zip_file, sheet_name):
+    '''Find the zip members for a named worksheet and shared strings.
+
+    Returns a (worksheet part, shared strings part) tuple; the shared
+    strings part is None if the workbook doesn't have one.
+    '''
+
+    relationships = {}
+    shared_strings_part = None
+    for elem in ElementTree.fromstring(zip_file.read(WORKBOOK_RELS_PATH)):
+        if elem.tag != _RELATIONSHIP_TAG:
+            continue
+        part = _resolve_part(elem.get('Target'))
+        relationships[elem.get('Id')] = part
+        if elem.get('Type', '').endswith('/sharedStrings'):
+            shared_strings_part = part
+
+    if (
+            shared_strings_part is None and
+            DEFAULT_SHARED_STRINGS_PATH in zip_file.namelist()
+            ):  # pylint: disable=bad-continuation
+        shared_strings_part = DEFAULT_SHARED_STRINGS_PATH
+
+    workbook = ElementTree.fromstring(zip_file.read(WORKBOOK_PATH))
+    for elem in workbook.iter(_SHEET_TAG):
+        if elem.get('name') == sheet_name:
+            return relationships[elem.get(_REL_ID_ATTR)], shared_strings_part
+
+    raise xlrd.XLRDError('No sheet named <%r>' % sheet_name)
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def sheet_names(filepath):
+    '''Return the names of a workbook's worksheets, in workbook order.'''
+
+    if not zipfile.is_zipfile(filepath):
+        workbook = xlrd.open_workbook(filepath, on_demand=True)
+        names = workbook.sheet_names()
+        workbook.release_resources()
+        return names
+
+    zip_file = zipfile.ZipFile(filepath)
+    try:
+        workbook = ElementTree.fromstring(zip_file.read(WORKBOOK_PATH))
+    finally:
+        zip_file.close()
+    return [elem.get('name') for elem in workbook.iter(_SHEET_TAG)]
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def read_shared_strings(zip_file, part):
+    '''Read a shared strings table into a list of unicode strings.'''
+
+    shared_strings = []
+    if part is None:
+        return shared_strings
+
+    with zip_file.open(part) as fptr:
+        for _, elem in ElementTree.iterparse(fptr):
+            if elem.tag == _SHARED_STRING_TAG:
+                shared_strings.append(_rich_text(elem))
+                elem.clear()
+
+    return shared_strings
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def _iter_worksheet_rows(
+        fptr, shared_strings, columns=None, first_row_index=0
+        ):  # pylint: disable=bad-continuation
+    '''Yield value tuples for the rows of an open worksheet part.
+
+    If columns is a set of column indices, only those cells' values are
+    read; the others are left empty. first_row_index is the index of
+    the first row the part holds, for a part whose earlier rows have
+    been left out.
+    '''
+
+    next_row_index = first_row_index
+    row_index = first_row_index - 1
+    sheet_data = None
+
+    for event, elem in ElementTree.iterparse(fptr, events=('start', 'end')):
+
+        if event == 'start':
+            if elem.tag == _SHEET_DATA_TAG:
+                sheet_data = elem
+            continue
+
+        if elem.tag != _ROW_TAG:
+            continue
+
+        row_number = elem.get('r')
+        row_index = int(row_number) - 1 if row_number else row_index + 1
+
+        values = []
+        column_index = -1
+        for cell in elem.iter(_CELL_TAG):
+            cell_ref = cell.get('r')
+            column_index = (
+                _column_index(cell_ref) if cell_ref else column_index + 1
+                )
+            if columns is not None and column_index not in columns:
+                continue
+            value = _cell_value(cell, shared_strings)
+            if value == EMPTY_VALUE:
+                continue
+            if column_index > len(values):
+                values.extend([EMPTY_VALUE] * (column_index - len(values)))
+            values.append(value)
+
+        # Drop the row we've just read so the tree doesn't grow.
+        if sheet_data is not None:
+            sheet_data.clear()
+        else:
+            elem.clear()
+
+        # Rows without values only count once a later row has some.
+        if not values:
+            continue
+
+        while next_row_index < row_index:
+            yield ()
+            next_row_index += 1
+
+        yield tuple(values)
+        next_row_index = row_index + 1
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def _iter_xlrd_rows(filepath, sheet_name, columns=None):
+    '''Yield value tuples for a worksheet using xlrd.'''
+
+    workbook = xlrd.open_workbook(filepath, on_demand=True)
+    sheet = workbook.sheet_by_name(sheet_name)
+    for row_num in range(sheet.nrows):
+        values = sheet.row_values(row_num)
+        if columns is not None:
+            values = [
+                value if column_index in columns else EMPTY_VALUE
+                for column_index, value in enumerate(values)
+                ]
+        while values and values[-1] == EMPTY_VALUE:
+            values.pop()
+        yield tuple(values)
+    workbook.release_resources()
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def iter_sheet_rows(filepath, sheet_name=DEFAULT_SHEET_NAME, columns=None):
+    '''Yield the rows of a workbook's worksheet as tuples of values.
+
+    Arguments:
+
+        filepath (str):
+            The path to the workbook.
+
+        sheet_name (str):
+            The name of the worksheet to read.
+
+        columns (iterable, optional):
+            The indices of the columns to read; the other columns'
+            values are left empty, and aren't converted. By default,
+            every column is read.
+
+    '''
+
+    logger = logging.getLogger(__name__)
+
+    if columns is not None:
+        columns = frozenset(columns)
+
+    if not zipfile.is_zipfile(filepath):
+        logger.debug('%s is not an xlsx file, using xlrd', filepath)
+        for row in _iter_xlrd_rows(filepath, sheet_name, columns):
+            yield row
+        return
+
+    zip_file = zipfile.ZipFile(filepath)
+    try:
+        sheet_part, shared_strings_part = _find_parts(zip_file, sheet_name)
+        logger.debug('streaming %s from %s', sheet_part, filepath)
+        shared_strings = read_shared_strings(zip_file, shared_strings_part)
+
+        with zip_file.open(sheet_part) as fptr:
+            for row in _iter_worksheet_rows(fptr, shared_strings, columns):
+                yield row
+    finally:
+        zip_file.close()
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+class _PrefixedFile(object):
+    '''A file-like object reading some bytes, then the rest of a file.'''
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def __init__(self, prefix, fptr):
+        '''Initialize one _PrefixedFile instance.'''
+        self._prefix = prefix
+        self._fptr = fptr
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def read(self, size=-1):
+        '''Read up to size bytes, or all that are left.'''
+
+        if not self._prefix:
+            return self._fptr.read(size)
+
+        if size < 0:
+            data, self._prefix = self._prefix + self._fptr.read(), ''
+        else:
+            data, self._prefix = self._prefix[:size], self._prefix[size:]
+        return data
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def _strings_digest(shared_strings):
+    '''Return a hex digest of a list of shared strings.'''
+    return hashlib.sha256(
+        u'\0'.join(shared_strings).encode('utf-8')
+        ).hexdigest()
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def _read_sheet_data_start(fptr):
+    '''Read an open worksheet part up to the end of its sheetData start
+    tag.
+
+    Returns the bytes up to there and the bytes read after them, or
+    (None, None) if the part has no rows.
+    '''
+
+    data = ''
+    while True:
+        chunk = fptr.read(16384)
+        data += chunk
+        match = _SHEET_DATA_START_RE.search(data)
+        if match is not None:
+            return data[:match.end()], data[match.end():]
+        if not chunk:
+            return None, None
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def sheet_row_position(filepath, sheet_name, row_count):
+    '''Return the position just after the first row_count rows of a
+    worksheet, for iter_sheet_rows_after().
+
+    The position is where the XML of the rows ends in the worksheet
+    part, with digests of the XML and of the shared strings table. It
+    is None if the workbook isn't an xlsx file, or the rows can't be
+    found by their row numbers.
+    '''
+
+    if not zipfile.is_zipfile(filepath):
+        return None
+
+    zip_file = zipfile.ZipFile(filepath)
+    try:
+        sheet_part, shared_strings_part = _find_parts(zip_file, sheet_name)
+        data = zip_file.read(sheet_part)
+        shared_strings = read_shared_strings(zip_file, shared_strings_part)
+    finally:
+        zip_file.close()
+
+    # Rows are yielded up to the last one with values, so that's the
+    # row numbered row_count.
+    data_start = _SHEET_DATA_START_RE.search(data)
+    row_start = data_start and re.compile(
+        r'<row r="%d"[\s>]' % row_count
+        ).search(data, data_start.end())
+    if row_start is None:
+        return None
+    row_end = data.find(_ROW_END, row_start.end())
+    if row_end == -1:
+        return None
+    row_end += len(_ROW_END)
+
+    return {
+        'row_count': row_count,
+        'size': row_end - data_start.end(),
+        'digest': hashlib.sha256(
+            data[data_start.end():row_end]
+            ).hexdigest(),
+        'strings': len(shared_strings),
+        'strings_digest': _strings_digest(shared_strings),
+        }
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def iter_sheet_rows_after(filepath, sheet_name, position):
+    '''Return an iterator over the rows of a worksheet after a
+    sheet_row_position() position.
+
+    Only the XML after the position is parsed; the XML before it is
+    just checked against the position's digest. None is returned if it,
+    or the shared strings it refers to, have changed, e.g. if parsed
+    rows were edited, so the rows after it may not follow on from them.
+    '''
+
+    if not zipfile.is_zipfile(filepath):
+        return None
+
+    zip_file = zipfile.ZipFile(filepath)
+    fptr = rows = None
+    try:
+        sheet_part, shared_strings_part = _find_parts(zip_file, sheet_name)
+        shared_strings = read_shared_strings(zip_file, shared_strings_part)
+
+        fptr = zip_file.open(sheet_part)
+        head, data = _read_sheet_data_start(fptr)
+        size = position['size']
+        if head is not None and len(data) < size:
+            data += fptr.read(size - len(data))
+
+        if (
+                head is not None and
+                hashlib.sha256(data[:size]).hexdigest() ==
+                position['digest'] and
+                _strings_digest(shared_strings[:position['strings']]) ==
+                position['strings_digest']
+                ):  # pylint: disable=bad-continuation
+            # Parse the start of the part, up to its sheetData start
+            # tag, then the XML after the position.
+            rows = _iter_rows_after(
+                zip_file, fptr, _PrefixedFile(head + data[size:], fptr),
+                shared_strings, position['row_count']
+                )
+        return rows
+    finally:
+        # Otherwise the rows close them once they've been read.
+        if rows is None:
+            if fptr is not None:
+                fptr.close()
+            zip_file.close()
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def _iter_rows_after(zip_file, fptr, rows_xml, shared_strings, row_count):
+    '''Yield the rows of worksheet XML following row_count rows, then
+    close the part and workbook it's read from.
+    '''
+
+    try:
+        for row in _iter_worksheet_rows(
+                rows_xml, shared_strings, first_row_index=row_count
+                ):  # pylint: disable=bad-continuation
+            yield row
+    finally:
+        fptr.close()
+        zip_file.close()
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def _worksheet_xml(rows):
+    '''Return the XML of a worksheet holding rows of values.'''
+
+    pieces = [
+        _XML_DECLARATION,
+        '<worksheet xmlns="%s"><sheetData>' % MAIN_NAMESPACE,
+        ]
+    for row_num, row in enumerate(rows, 1):
+        cells = []
+        for column_index, value in enumerate(row):
+            cell_ref = '%s%d' % (_column_letters(column_index), row_num)
+            if isinstance(value, basestring):
+                if value == EMPTY_VALUE:
+                    continue
+                cells.append(
+                    '<c r="%s" t="inlineStr"><is>'
+                    '<t xml:space="preserve">%s</t></is></c>' % (
+                        cell_ref, escape(value).encode('utf-8')
+                        )
+                    )
+            else:
+                cells.append(
+                    '<c r="%s"><v>%r</v></c>' % (cell_ref, float(value))
+                    )
+        if cells:
+            pieces.append('<row r="%d">%s</row>' % (row_num, ''.join(cells)))
+    pieces.append('</sheetData></worksheet>')
+    return ''.join(pieces)
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+def write_workbook(filepath, sheets):
+    '''Write rows of values to a minimal xlsx workbook.
+
+    Text is written as inline strings and numbers as numbers, so the
+    rows read back as they were written, with trailing empty values
+    dropped.
+
+    Arguments:
+
+        filepath (str):
+            The path to write the workbook to.
+
+        sheets (list):
+            A (sheet name, rows) pair for each worksheet, in order;
+            rows are sequences of values.
+
+    '''
+
+    sheet_parts = [
+        'worksheets/sheet%d.xml' % sheet_num
+        for sheet_num in range(1, len(sheets) + 1)
+        ]
+
+    content_types = [
+        _XML_DECLARATION,
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/'
+        'content-types">',
+        '<Default Extension="rels" ContentType="application/'
+        'vnd.openxmlformats-package.relationships+xml"/>',
+        '<Default Extension="xml" ContentType="application/xml"/>',
+        '<Override PartName="/%s" ContentType="%s"/>' % (
+            WORKBOOK_PATH, _SPREADSHEET_CONTENT_TYPE % 'sheet.main'
+            ),
+        ]
+    workbook = [
+        _XML_DECLARATION,
+        '<workbook xmlns="%s" xmlns:r="%s"><sheets>' % (
+            MAIN_NAMESPACE, REL_NAMESPACE
+            ),
+        ]
+    workbook_rels = [
+        _XML_DECLARATION,
+        '<Relationships xmlns="%s">' % PACKAGE_REL_NAMESPACE,
+        ]
+    for sheet_num, (name, _) in enumerate(sheets, 1):
+        content_types.append(
+            '<Override PartName="/xl/%s" ContentType="%s"/>' % (
+                sheet_parts[sheet_num - 1],
+                _SPREADSHEET_CONTENT_TYPE % 'worksheet'
+                )
+            )
+        workbook.append(
+            '<sheet name="%s" sheetId="%d" r:id="rId%d"/>' % (
+                escape(name, {'"': '&quot;'}).encode('utf-8'),
+                sheet_num, sheet_num
+                )
+            )
+        workbook_rels.append(
+            '<Relationship Id="rId%d" Type="%s" Target="%s"/>' % (
+                sheet_num, _WORKSHEET_TYPE, sheet_parts[sheet_num - 1]
+                )
+            )
+    content_types.append('</Types>')
+    workbook.append('</sheets></workbook>')
+    workbook_rels.append('</Relationships>')
+
+    with zipfile.ZipFile(filepath, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        zip_file.writestr(CONTENT_TYPES_PATH, ''.join(content_types))
+        zip_file.writestr(
+            ROOT_RELS_PATH,
+            _XML_DECLARATION +
+            '<Relationships xmlns="%s"><Relationship Id="rId1" Type="%s" '
+            'Target="%s"/></Relationships>' % (
+                PACKAGE_REL_NAMESPACE, _OFFICE_DOC_TYPE, WORKBOOK_PATH
+                )
+            )
+        zip_file.writestr(WORKBOOK_PATH, ''.join(workbook))
+        zip_file.writestr(WORKBOOK_RELS_PATH, ''.join(workbook_rels))
+        for sheet_part, (_, rows) in zip(sheet_parts, sheets):
+            zip_file.writestr('xl/' + sheet_part, _worksheet_xml(rows))